@@ -0,0 +1,440 @@
+import numpy as np
+
+COLUMNS = ['Image', 'Object Name', 'Object Index', 'bx', 'by', 'bw', 'bh']
+
+
+class AnnotationStore:
+    """
+    Columnar bounding box storage with categorical image / label columns and
+    a per-image row index. Each box is identified by its row, which stays
+    valid until the store is cleared or replaced. Boxes proposed by a
+    detector keep their confidence score and are marked as proposed until
+    they are accepted, drawn boxes have a NaN score.
+    """
+
+    def __init__(self, capacity=1024):
+        """
+        Initialize empty columns.
+        Args:
+            capacity: Initial number of preallocated rows.
+        """
+        self.size = 0
+        self.count = 0
+        self.alive = np.empty(capacity, np.bool_)
+        self.image_codes = np.empty(capacity, np.int32)
+        self.label_codes = np.empty(capacity, np.int32)
+        self.object_indexes = np.empty(capacity, np.int32)
+        self.ratios = np.empty((capacity, 4), np.float64)
+        self.scores = np.empty(capacity, np.float64)
+        self.proposed = np.empty(capacity, np.bool_)
+        self.image_names = []
+        self.image_lookup = {}
+        self.label_names = []
+        self.label_lookup = {}
+        self.image_rows = {}
+        self.frame_cache = None
+        self.journal = None
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def get_code(value, names, lookup):
+        """
+        Get the category code of a value, adding a new category if necessary.
+        Args:
+            value: Category value (image or label name).
+            names: List of category values.
+            lookup: dict of category value -> code.
+
+        Return:
+            Category code.
+        """
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(names)
+            names.append(value)
+        return code
+
+    def reserve(self, count):
+        """
+        Grow the columns geometrically to fit count more rows.
+        Args:
+            count: Number of rows to be added.
+
+        Return:
+            None
+        """
+        required = self.size + count
+        capacity = len(self.image_codes)
+        if required <= capacity:
+            return
+        while capacity < required:
+            capacity *= 2
+        for name in (
+            'alive',
+            'image_codes',
+            'label_codes',
+            'object_indexes',
+            'ratios',
+            'scores',
+            'proposed',
+        ):
+            column = getattr(self, name)
+            grown = np.empty((capacity, *column.shape[1:]), column.dtype)
+            grown[: self.size] = column[: self.size]
+            setattr(self, name, grown)
+
+    def modified(self):
+        """
+        Invalidate the cached DataFrame view.
+
+        Return:
+            None
+        """
+        self.frame_cache = None
+
+    def append(
+        self,
+        image,
+        object_name,
+        object_index,
+        bx,
+        by,
+        bw,
+        bh,
+        score=float('nan'),
+        proposed=False,
+    ):
+        """
+        Add a bounding box.
+        Args:
+            image: Image name.
+            object_name: Label name.
+            object_index: Label index.
+            bx: Relative center x coordinate.
+            by: Relative center y coordinate.
+            bw: Relative box width.
+            bh: Relative box height.
+            score: Detector confidence of a proposed box, NaN if drawn.
+            proposed: True if the box is a proposal that was not accepted.
+
+        Return:
+            Row of the added box.
+        """
+        self.reserve(1)
+        row = self.size
+        self.alive[row] = True
+        image_code = self.get_code(image, self.image_names, self.image_lookup)
+        self.image_codes[row] = image_code
+        self.label_codes[row] = self.get_code(
+            object_name, self.label_names, self.label_lookup
+        )
+        self.object_indexes[row] = object_index
+        self.ratios[row] = bx, by, bw, bh
+        self.scores[row] = score
+        self.proposed[row] = proposed
+        self.image_rows.setdefault(image_code, []).append(row)
+        self.size += 1
+        self.count += 1
+        self.modified()
+        if self.journal:
+            values = [bx, by, bw, bh]
+            if not np.isnan(score) or proposed:
+                values += [score, bool(proposed)]
+            self.journal.record(
+                ['add', row, image, object_name, int(object_index), *values]
+            )
+        return row
+
+    def encode(self, values, names, lookup):
+        """
+        Convert an array of category values to codes.
+        Args:
+            values: Array of category values.
+            names: List of category values.
+            lookup: dict of category value -> code.
+
+        Return:
+            numpy array of codes.
+        """
+        import pandas as pd
+
+        inverse, uniques = pd.factorize(values)
+        codes = np.array(
+            [self.get_code(value, names, lookup) for value in uniques], np.int32
+        )
+        return codes[inverse]
+
+    def extend(self, data):
+        """
+        Add bounding boxes in bulk.
+        Args:
+            data: pandas DataFrame with COLUMNS and optional Score and
+                Proposed columns, boxes with a Score are proposed if there
+                is no Proposed column.
+
+        Return:
+            numpy array of added rows.
+        """
+        count = len(data)
+        rows = np.arange(self.size, self.size + count)
+        if not count:
+            return rows
+        self.reserve(count)
+        self.alive[rows] = True
+        image_codes = self.encode(
+            data['Image'].values, self.image_names, self.image_lookup
+        )
+        self.image_codes[rows] = image_codes
+        self.label_codes[rows] = self.encode(
+            data['Object Name'].values, self.label_names, self.label_lookup
+        )
+        self.object_indexes[rows] = data['Object Index'].values
+        self.ratios[rows] = data[['bx', 'by', 'bw', 'bh']].values
+        self.scores[rows] = data['Score'].values if 'Score' in data else np.nan
+        self.proposed[rows] = (
+            data['Proposed'].values
+            if 'Proposed' in data
+            else ~np.isnan(self.scores[rows])
+        )
+        self.index_rows(rows, image_codes)
+        self.size += count
+        self.count += count
+        self.modified()
+        if self.journal:
+            self.journal.record(
+                [
+                    'extend',
+                    int(rows[0]),
+                    data['Image'].values,
+                    data['Object Name'].values,
+                    self.object_indexes[rows],
+                    self.ratios[rows],
+                    self.scores[rows],
+                    self.proposed[rows],
+                ]
+            )
+        return rows
+
+    def delete(self, rows):
+        """
+        Delete bounding boxes in bulk.
+        Args:
+            rows: Sequence of rows to delete.
+
+        Return:
+            Number of deleted boxes.
+        """
+        rows = np.unique(np.asarray(rows, np.int64))
+        rows = rows[(rows >= 0) & (rows < self.size)]
+        rows = rows[self.alive[rows]]
+        if not len(rows):
+            return 0
+        self.alive[rows] = False
+        for code in np.unique(self.image_codes[rows]).tolist():
+            remaining = np.array(self.image_rows[code], np.int64)
+            remaining = remaining[self.alive[remaining]]
+            if len(remaining):
+                self.image_rows[code] = remaining.tolist()
+            else:
+                del self.image_rows[code]
+        self.count -= len(rows)
+        self.modified()
+        if self.journal:
+            self.journal.record(['delete', rows.tolist()])
+        return len(rows)
+
+    def accept(self, rows):
+        """
+        Mark proposed bounding boxes as reviewed, their scores are kept.
+        Args:
+            rows: Sequence of rows to accept.
+
+        Return:
+            Number of accepted boxes.
+        """
+        rows = np.unique(np.asarray(rows, np.int64))
+        rows = rows[(rows >= 0) & (rows < self.size)]
+        rows = rows[self.alive[rows] & self.proposed[rows]]
+        if not len(rows):
+            return 0
+        self.proposed[rows] = False
+        self.modified()
+        if self.journal:
+            self.journal.record(['accept', rows.tolist()])
+        return len(rows)
+
+    def index_rows(self, rows, image_codes):
+        """
+        Add rows to the per-image index.
+        Args:
+            rows: numpy array of rows.
+            image_codes: numpy array of image codes of the rows.
+
+        Return:
+            None
+        """
+        if not len(rows):
+            return
+        order = np.argsort(image_codes, kind='stable')
+        sorted_codes = image_codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        for code, group in zip(sorted_codes[starts], np.split(rows[order], starts[1:])):
+            self.image_rows.setdefault(int(code), []).extend(group.tolist())
+
+    def clear(self):
+        """
+        Delete all bounding boxes.
+
+        Return:
+            None
+        """
+        self.size = 0
+        self.count = 0
+        self.image_rows.clear()
+        self.modified()
+        if self.journal:
+            self.journal.record(['clear'])
+
+    def replace(self, data):
+        """
+        Replace all bounding boxes with the given ones.
+        Args:
+            data: pandas DataFrame with COLUMNS.
+
+        Return:
+            None
+        """
+        self.clear()
+        self.extend(data)
+
+    def snapshot(self):
+        """
+        Get the store contents as arrays, rows are preserved.
+
+        Return:
+            dict of name -> numpy array.
+        """
+        size = self.size
+        return {
+            'alive': self.alive[:size],
+            'image_codes': self.image_codes[:size],
+            'label_codes': self.label_codes[:size],
+            'object_indexes': self.object_indexes[:size],
+            'ratios': self.ratios[:size],
+            'scores': self.scores[:size],
+            'proposed': self.proposed[:size],
+            'image_names': np.array(self.image_names, str),
+            'label_names': np.array(self.label_names, str),
+        }
+
+    def restore(self, snapshot):
+        """
+        Replace the store contents with a snapshot.
+        Args:
+            snapshot: dict of name -> numpy array returned by self.snapshot()
+
+        Return:
+            None
+        """
+        journal = self.journal
+        self.__init__(max(1024, len(snapshot['alive'])))
+        self.journal = journal
+        self.size = len(snapshot['alive'])
+        for name in ('alive', 'image_codes', 'label_codes', 'object_indexes', 'ratios'):
+            getattr(self, name)[: self.size] = snapshot[name]
+        self.scores[: self.size] = (
+            snapshot['scores'] if 'scores' in snapshot else np.nan
+        )
+        self.proposed[: self.size] = (
+            snapshot['proposed']
+            if 'proposed' in snapshot
+            else ~np.isnan(self.scores[: self.size])
+        )
+        self.count = int(np.count_nonzero(self.alive[: self.size]))
+        for names, lookup, values in (
+            (self.image_names, self.image_lookup, snapshot['image_names']),
+            (self.label_names, self.label_lookup, snapshot['label_names']),
+        ):
+            for value in values.tolist():
+                self.get_code(value, names, lookup)
+        rows = np.flatnonzero(self.alive[: self.size])
+        self.index_rows(rows, self.image_codes[rows])
+
+    def rows(self, image):
+        """
+        Get rows that belong to an image.
+        Args:
+            image: Image name.
+
+        Return:
+            numpy array of rows.
+        """
+        code = self.image_lookup.get(image)
+        return np.array(self.image_rows.get(code, ()), np.int64)
+
+    def records(self, rows):
+        """
+        Get bounding boxes as lists of column values.
+        Args:
+            rows: Sequence of rows.
+
+        Return:
+            [[image, object name, object index, bx, by, bw, bh], ...]
+        """
+        return [
+            [
+                self.image_names[self.image_codes[row]],
+                self.label_names[self.label_codes[row]],
+                int(self.object_indexes[row]),
+                *self.ratios[row].tolist(),
+            ]
+            for row in rows
+        ]
+
+    def to_frame(self, categorical=False):
+        """
+        Export bounding boxes to a DataFrame.
+        Args:
+            categorical: If True, Image and Object Name columns are returned as
+                pandas Categorical instead of strings.
+
+        Return:
+            pandas DataFrame with COLUMNS indexed by row, and Score (NaN for
+            drawn boxes) and Proposed (False for drawn and accepted boxes)
+            if any box has a detector score.
+        """
+        if self.frame_cache is not None and not categorical:
+            return self.frame_cache
+        import pandas as pd
+
+        rows = np.flatnonzero(self.alive[: self.size])
+        columns = []
+        for codes, names in (
+            (self.image_codes[rows], self.image_names),
+            (self.label_codes[rows], self.label_names),
+        ):
+            if categorical:
+                column = pd.Categorical.from_codes(codes, names)
+                columns.append(column.remove_unused_categories())
+            else:
+                columns.append(np.array(names, object)[codes])
+        values = {
+            'Image': columns[0],
+            'Object Name': columns[1],
+            'Object Index': self.object_indexes[rows],
+            'bx': self.ratios[rows, 0],
+            'by': self.ratios[rows, 1],
+            'bw': self.ratios[rows, 2],
+            'bh': self.ratios[rows, 3],
+        }
+        scores = self.scores[rows]
+        proposed = self.proposed[rows]
+        if not np.isnan(scores).all() or proposed.any():
+            values['Score'] = scores
+            values['Proposed'] = proposed
+        data = pd.DataFrame(values, index=rows)
+        if not categorical:
+            self.frame_cache = data
+        return data
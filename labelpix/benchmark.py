@@ -0,0 +1,494 @@
+from unittest import mock
+import numpy as np
+import statistics
+import argparse
+import platform
+import tempfile
+import json
+import time
+import sys
+import os
+
+LABELS = ['car', 'person', 'bicycle', 'dog', 'traffic light', 'bus', 'truck', 'cat']
+
+
+def generate_dataset(
+    directory,
+    images=200,
+    boxes_per_image=5,
+    labels=5,
+    size=(640, 480),
+    image_format='.jpg',
+    seed=0,
+):
+    """
+    Write synthetic images and a session csv with random bounding boxes.
+    Args:
+        directory: Output folder.
+        images: Number of images.
+        boxes_per_image: Number of bounding boxes per image.
+        labels: Number of distinct labels.
+        size: (width, height) of the images.
+        image_format: Image file extension.
+        seed: Random seed.
+
+    Return:
+        (list of image paths, path to session csv)
+    """
+    import pandas as pd
+    import cv2
+
+    from annotations import COLUMNS
+    from geometry import corners_to_ratios
+
+    generator = np.random.default_rng(seed)
+    width, height = size
+    image_dir = os.path.join(directory, 'images')
+    os.makedirs(image_dir, exist_ok=True)
+    background = generator.integers(0, 256, (height, width, 3), np.uint8)
+    paths = []
+    for i in range(images):
+        path = os.path.join(image_dir, f'image-{i:06d}{image_format}')
+        cv2.imwrite(path, np.roll(background, i * 7, 1))
+        paths.append(path)
+    count = images * boxes_per_image
+    corners = generator.uniform(0, 1, (count, 4)) * [width, height, width, height]
+    label_indexes = generator.integers(0, labels, count)
+    names = [LABELS[i] if i < len(LABELS) else f'label-{i}' for i in range(labels)]
+    ratios = corners_to_ratios(corners, width, height)
+    session = pd.DataFrame(
+        {
+            'Image': np.repeat(
+                [os.path.basename(path) for path in paths], boxes_per_image
+            ),
+            'Object Name': np.array(names, object)[label_indexes],
+            'Object Index': label_indexes,
+            'bx': ratios[:, 0],
+            'by': ratios[:, 1],
+            'bw': ratios[:, 2],
+            'bh': ratios[:, 3],
+        },
+        columns=COLUMNS,
+    )
+    session_file = os.path.join(directory, 'session.csv')
+    session.to_csv(session_file, index=False)
+    return paths, session_file
+
+
+class BenchmarkSuite:
+    """
+    Time labelpix operations on a synthetic dataset with the offscreen Qt
+    platform.
+    """
+
+    def __init__(
+        self, directory, images=200, boxes_per_image=5, labels=5, repeats=3, seed=0
+    ):
+        """
+        Initialize the suite.
+        Args:
+            directory: Folder of the synthetic dataset and exported files.
+            images: Number of images.
+            boxes_per_image: Number of bounding boxes per image.
+            labels: Number of distinct labels.
+            repeats: Number of measurements per operation.
+            seed: Random seed.
+        """
+        self.directory = directory
+        self.config = {
+            'images': images,
+            'boxes_per_image': boxes_per_image,
+            'labels': labels,
+            'repeats': repeats,
+            'seed': seed,
+        }
+        self.repeats = repeats
+        self.generator = np.random.default_rng(seed)
+        self.results = {}
+        self.application = None
+        self.window = None
+        self.paths = []
+        self.session_file = None
+
+    def measure(self, name, run, items=1, setup=None):
+        """
+        Time an operation.
+        Args:
+            name: Operation name.
+            run: Function to time.
+            items: Number of items processed per run.
+            setup: Function called before each run, not timed.
+
+        Return:
+            None
+        """
+        seconds = []
+        for _ in range(self.repeats):
+            if setup:
+                setup()
+            start_time = time.perf_counter()
+            run()
+            self.application.processEvents()
+            seconds.append(time.perf_counter() - start_time)
+        median = statistics.median(seconds)
+        self.results[name] = {
+            'seconds': median,
+            'min_seconds': min(seconds),
+            'items': items,
+            'items_per_second': items / median if median else 0.0,
+        }
+        print(
+            f'{name:<24} {median * 1000:10.2f} ms  '
+            f'{self.results[name]["items_per_second"]:12.0f} items/s',
+            file=sys.stderr,
+        )
+
+    def start(self):
+        """
+        Generate the dataset and open an ImageLabeler window.
+
+        Return:
+            None
+        """
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5.QtWidgets import QApplication
+        from labelpix import ImageLabeler
+
+        self.paths, self.session_file = generate_dataset(
+            self.directory,
+            self.config['images'],
+            self.config['boxes_per_image'],
+            self.config['labels'],
+            seed=self.config['seed'],
+        )
+        self.application = QApplication.instance() or QApplication(sys.argv[:1])
+        self.window = ImageLabeler(journal_dir=None, catalog_location=':memory:')
+        self.window.resize(1200, 800)
+        self.window.thumbnails.directory = os.path.join(self.directory, 'thumbnails')
+        self.window.tile_loader.tile_dir = os.path.join(self.directory, 'tiles')
+        self.window.add_images(self.paths)
+        for label in LABELS[: self.config['labels']]:
+            self.window.add_session_label(label)
+        self.application.processEvents()
+
+    def select_image(self, index):
+        """
+        Make an image current, which calls display_selection.
+        Args:
+            index: Photo List row.
+
+        Return:
+            None
+        """
+        view = self.window.right_widgets['Photo List']
+        view.setCurrentIndex(view.model().index(index))
+
+    def insert_boxes(self, count=500):
+        """
+        Time box insertion through ImageEditorArea.update_session_data.
+        Args:
+            count: Number of boxes per run.
+
+        Return:
+            None
+        """
+        from labelpix import ImageEditorArea
+
+        self.window.switch_editor(ImageEditorArea)
+        self.select_image(0)
+        self.window.right_widgets['Session Labels'].setCurrentRow(0)
+        area = self.window.left_widgets['Image']
+        width, height = area.width(), area.height()
+        points = self.generator.uniform(0, 1, (count, 4)) * [
+            width,
+            height,
+            width,
+            height,
+        ]
+        points = points.astype(int).tolist()
+
+        def run():
+            for x1, y1, x2, y2 in points:
+                area.update_session_data(x1, y1, x2, y2)
+
+        self.measure('insert_boxes', run, count, self.window.annotations.clear)
+        self.window.annotations.clear()
+
+    def drag_box(self, frames=120, size=(6000, 4000)):
+        """
+        Time rubber-band frames while a box is dragged over a large image.
+        Args:
+            frames: Number of mouse moves per run.
+            size: (width, height) of the image.
+
+        Return:
+            None
+        """
+        from PyQt5.QtCore import QEvent, QPoint, Qt
+        from PyQt5.QtGui import QMouseEvent
+        import cv2
+
+        from labelpix import ImageEditorArea
+
+        width, height = size
+        path = os.path.join(self.directory, 'images', 'large.jpg')
+        gradient = np.linspace(0, 255, width, dtype=np.uint8)
+        cv2.imwrite(path, np.dstack([np.tile(gradient, (height, 1))] * 3))
+        self.window.add_images([path])
+        self.window.switch_editor(ImageEditorArea)
+        self.select_image(len(self.window.images) - 1)
+        area = self.window.left_widgets['Image']
+        positions = np.linspace(
+            [10, 10], [area.width() - 10, area.height() - 10], frames
+        ).astype(int)
+
+        def send(event_type, x, y, buttons):
+            event = QMouseEvent(
+                event_type, QPoint(x, y), Qt.LeftButton, buttons, Qt.NoModifier
+            )
+            self.application.sendEvent(area, event)
+            self.application.processEvents()
+
+        def run():
+            send(QEvent.MouseButtonPress, 5, 5, Qt.LeftButton)
+            for x, y in positions.tolist():
+                send(QEvent.MouseMove, x, y, Qt.LeftButton)
+
+        self.measure(
+            'drag_box',
+            run,
+            frames,
+            setup=lambda: send(QEvent.MouseMove, 5, 5, Qt.NoButton),
+        )
+        send(QEvent.MouseButtonRelease, 5, 5, Qt.NoButton)
+        self.window.delete_list_selections(
+            [len(self.window.images) - 1], self.window.right_widgets['Photo List']
+        )
+
+    def switch_images(self, count=100):
+        """
+        Time image switches through display_selection.
+        Args:
+            count: Number of switches per run.
+
+        Return:
+            None
+        """
+        indexes = self.generator.integers(0, len(self.paths), count).tolist()
+
+        def run():
+            for index in indexes:
+                self.select_image(index)
+
+        self.measure('switch_images', run, count)
+
+    def upload_labels(self):
+        """
+        Time upload_labels of the session csv into an empty session.
+
+        Return:
+            None
+        """
+        from PyQt5.QtWidgets import QFileDialog
+
+        def run():
+            with mock.patch.object(
+                QFileDialog, 'getOpenFileName', return_value=(self.session_file, '')
+            ):
+                self.window.upload_labels()
+
+        self.measure(
+            'upload_labels',
+            run,
+            self.config['images'] * self.config['boxes_per_image'],
+            self.window.annotations.clear,
+        )
+
+    def delete_boxes(self, fraction=0.1):
+        """
+        Time bulk deletes of random boxes and of the checked labels of the
+        current image.
+        Args:
+            fraction: Fraction of boxes deleted per run.
+
+        Return:
+            None
+        """
+        from PyQt5.QtCore import Qt
+
+        annotations = self.window.annotations
+        snapshot = annotations.snapshot()
+        rows = np.flatnonzero(snapshot['alive'])
+        selected = self.generator.choice(
+            rows, max(1, int(len(rows) * fraction)), replace=False
+        ).tolist()
+
+        def restore():
+            annotations.restore(snapshot)
+            self.select_image(0)
+
+        self.measure(
+            'delete_boxes', lambda: annotations.delete(selected), len(selected), restore
+        )
+        label_list = self.window.right_widgets['Image Label List']
+
+        def check_labels():
+            restore()
+            model = label_list.model()
+            for row in range(model.rowCount()):
+                model.setData(model.index(row), Qt.Checked, Qt.CheckStateRole)
+
+        self.measure(
+            'delete_selections',
+            self.window.delete_selections,
+            self.config['boxes_per_image'],
+            check_labels,
+        )
+        annotations.restore(snapshot)
+
+    def export(self):
+        """
+        Time every exporter.
+
+        Return:
+            None
+        """
+        from PyQt5.QtWidgets import QFileDialog
+
+        boxes = len(self.window.annotations)
+        self.measure('export_yolo', self.window.save_changes_yolo, boxes)
+        self.measure('export_voc', self.window.save_changes_voc, boxes)
+        self.measure(
+            'export_coco',
+            lambda: self.window.save_changes_coco(
+                os.path.join(self.directory, 'session.json')
+            ),
+            boxes,
+        )
+        for suffix in ('.csv', '.h5', '.parquet', '.feather'):
+            location = os.path.join(self.directory, f'export{suffix}')
+
+            def run():
+                with mock.patch.object(
+                    QFileDialog, 'getSaveFileName', return_value=(location, '')
+                ):
+                    self.window.save_changes_table()
+
+            try:
+                self.measure(f'export_{suffix[1:]}', run, boxes)
+            except ImportError as error:
+                print(f'export_{suffix[1:]} skipped: {error}', file=sys.stderr)
+
+    def geometry(self):
+        """
+        Record box conversion times per million boxes.
+
+        Return:
+            None
+        """
+        from geometry import benchmark
+
+        for conversion, milliseconds in benchmark(repeats=self.repeats).items():
+            self.results[f'geometry_{conversion}'] = {
+                'seconds': milliseconds / 1000,
+                'min_seconds': milliseconds / 1000,
+                'items': 1_000_000,
+                'items_per_second': 1_000_000_000 / milliseconds,
+            }
+            print(
+                f'{"geometry_" + conversion:<24} {milliseconds:10.2f} ms / 1M boxes',
+                file=sys.stderr,
+            )
+
+    def run(self):
+        """
+        Run all benchmarks.
+
+        Return:
+            dict of run metadata and results.
+        """
+        self.start()
+        self.insert_boxes()
+        self.drag_box()
+        self.upload_labels()
+        self.switch_images()
+        self.delete_boxes()
+        self.export()
+        self.geometry()
+        self.window.close()
+        return {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': self.config,
+            'results': self.results,
+        }
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Find operations that got slower than a baseline run.
+    Args:
+        results: Results of benchmark runs.
+        baseline: Results of a previous run.
+        threshold: Allowed relative slowdown.
+
+    Return:
+        dict of operation -> slowdown ratio of the regressed operations.
+    """
+    regressions = {}
+    for name, result in results['results'].items():
+        previous = baseline['results'].get(name)
+        if not previous or not previous['seconds']:
+            continue
+        ratio = result['seconds'] / previous['seconds']
+        if ratio > 1 + threshold:
+            regressions[name] = ratio
+    return regressions
+
+
+def main(argv=None):
+    """
+    Run the benchmark suite from the command line.
+    Args:
+        argv: Command line arguments, defaults to sys.argv[1:]
+
+    Return:
+        Exit code, 1 if regressions were found.
+    """
+    parser = argparse.ArgumentParser(description='labelpix benchmark suite')
+    parser.add_argument('-i', '--images', type=int, default=200)
+    parser.add_argument('-b', '--boxes-per-image', type=int, default=5)
+    parser.add_argument('-l', '--labels', type=int, default=5)
+    parser.add_argument('-r', '--repeats', type=int, default=3)
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='Path to results json')
+    parser.add_argument('-c', '--compare', help='Path to baseline results json')
+    parser.add_argument(
+        '-t', '--threshold', type=float, default=0.2, help='Allowed relative slowdown'
+    )
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix='labelpix-benchmark-') as directory:
+        results = BenchmarkSuite(
+            directory,
+            args.images,
+            args.boxes_per_image,
+            args.labels,
+            args.repeats,
+            args.seed,
+        ).run()
+    output = args.output or f'benchmark-{time.strftime("%Y%m%d-%H%M%S")}.json'
+    with open(output, 'w') as result_file:
+        json.dump(results, result_file, indent=2)
+    print(f'Results saved to {output}', file=sys.stderr)
+    if not args.compare:
+        return 0
+    with open(args.compare) as baseline_file:
+        regressions = compare(results, json.load(baseline_file), args.threshold)
+    for name, ratio in regressions.items():
+        print(f'REGRESSION {name}: {ratio:.2f}x slower', file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
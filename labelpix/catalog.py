@@ -0,0 +1,219 @@
+from settings import DATA_DIR
+import threading
+import hashlib
+import sqlite3
+import os
+
+CATALOG_FILE = os.path.join(DATA_DIR, 'catalog.sqlite3')
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    hash TEXT,
+    dhash INTEGER
+);
+CREATE INDEX IF NOT EXISTS images_name ON images (name);
+"""
+
+
+def file_hash(path, block_size=1 << 20):
+    """
+    Calculate the content hash of a file.
+    Args:
+        path: Path to file.
+        block_size: Read size in bytes.
+
+    Return:
+        sha1 hex digest.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Catalog:
+    """
+    Persistent SQLite catalog of image paths, file sizes, modification
+    times, dimensions and optional content and perceptual hashes.
+    """
+
+    def __init__(self, location=CATALOG_FILE):
+        """
+        Open or create the catalog.
+        Args:
+            location: Path to the catalog database.
+        """
+        if location != ':memory:':
+            os.makedirs(os.path.dirname(location) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(location, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.executescript(SCHEMA)
+            columns = [
+                row[1] for row in self.connection.execute('PRAGMA table_info(images)')
+            ]
+            if 'dhash' not in columns:
+                self.connection.execute('ALTER TABLE images ADD COLUMN dhash INTEGER')
+
+    def query(self, columns, paths, batch_size=900):
+        """
+        Get catalog rows of the given paths.
+        Args:
+            columns: Selected columns, path is always selected first.
+            paths: A list of image paths.
+            batch_size: Number of paths per SQL statement.
+
+        Return:
+            dict of path -> tuple of column values.
+        """
+        rows = {}
+        with self.lock:
+            for i in range(0, len(paths), batch_size):
+                batch = paths[i : i + batch_size]
+                statement = (
+                    f'SELECT path, {", ".join(columns)} FROM images '
+                    f'WHERE path IN ({", ".join("?" * len(batch))})'
+                )
+                for path, *values in self.connection.execute(statement, batch):
+                    rows[path] = tuple(values)
+        return rows
+
+    def refresh(self, paths, hashes=False):
+        """
+        Add new images and update the ones whose size or mtime changed,
+        unchanged images are only stat'ed.
+        Args:
+            paths: A list of image paths.
+            hashes: If True, content hashes are calculated as well.
+
+        Return:
+            Number of added or updated images.
+        """
+        import imagesize
+
+        paths = list(paths)
+        known = self.query(['size', 'mtime_ns', 'hash', 'dhash'], paths)
+        updates, missing = [], []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                if path in known:
+                    missing.append((path,))
+                continue
+            size, mtime_ns, content_hash, perceptual_hash = known.get(
+                path, (None, None, None, None)
+            )
+            if size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+                if content_hash or not hashes:
+                    continue
+            else:
+                content_hash = perceptual_hash = None
+            width, height = imagesize.get(path)
+            if hashes:
+                content_hash = file_hash(path)
+            folder, name = os.path.split(path)
+            updates.append(
+                (
+                    path,
+                    name,
+                    folder,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    width,
+                    height,
+                    content_hash,
+                    perceptual_hash,
+                )
+            )
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                updates,
+            )
+            self.connection.executemany('DELETE FROM images WHERE path = ?', missing)
+        return len(updates)
+
+    def dimensions(self, paths):
+        """
+        Get validated image dimensions.
+        Args:
+            paths: A list of image paths.
+
+        Return:
+            dict of path -> (width, height)
+        """
+        paths = list(paths)
+        self.refresh(paths)
+        return self.query(['width', 'height'], paths)
+
+    def perceptual_hashes(self, paths):
+        """
+        Get cached perceptual hashes of images that did not change since
+        they were hashed.
+        Args:
+            paths: A list of image paths.
+
+        Return:
+            dict of path -> 64 bit hash.
+        """
+        paths = list(paths)
+        self.refresh(paths)
+        return {
+            path: value % (1 << 64)
+            for path, (value,) in self.query(['dhash'], paths).items()
+            if value is not None
+        }
+
+    def set_perceptual_hashes(self, hashes):
+        """
+        Cache perceptual hashes, hashes of images modified since they were
+        read are ignored.
+        Args:
+            hashes: A list of (64 bit hash, path, mtime_ns) of the hashed image.
+
+        Return:
+            None
+        """
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'UPDATE images SET dhash = ? WHERE path = ? AND mtime_ns = ?',
+                [
+                    (value - (1 << 64) if value >= 1 << 63 else value, path, mtime_ns)
+                    for value, path, mtime_ns in hashes
+                ],
+            )
+
+    def find(self, name):
+        """
+        Get catalogued paths of images with the given name.
+        Args:
+            name: Image name.
+
+        Return:
+            A list of paths.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT path FROM images WHERE name = ? ORDER BY path', (name,)
+            )
+            return [path for path, in rows]
+
+    def close(self):
+        """
+        Close the catalog.
+
+        Return:
+            None
+        """
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,300 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from exporters import export_yolo, export_voc, group_images
+from coco import export_coco
+from session_io import (
+    SESSION_FORMATS,
+    convert_legacy_centers,
+    read_session,
+    save_session,
+    session_version,
+    unreviewed,
+)
+from scanner import scan_images
+from catalog import Catalog
+import pandas as pd
+import argparse
+import time
+import sys
+import os
+
+LABEL_FORMATS = {'yolo': export_yolo, 'voc': export_voc}
+
+
+def get_parser():
+    """
+    Return:
+        argparse.ArgumentParser of the command line interface.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m labelpix',
+        description='Convert labelpix sessions without a display.',
+    )
+    parser.add_argument(
+        'session', help='Session file (csv, h5, parquet, feather, COCO json)'
+    )
+    parser.add_argument(
+        '-t',
+        '--to',
+        required=True,
+        choices=[*LABEL_FORMATS, 'coco', *[suffix[1:] for suffix in SESSION_FORMATS]],
+        help='Output format',
+    )
+    parser.add_argument(
+        '-o',
+        '--output',
+        help='Output session / json file, or folder of label files (defaults to '
+        'the image folders)',
+    )
+    parser.add_argument(
+        '-i',
+        '--images',
+        nargs='+',
+        default=[],
+        help='Image folders, images not found there are looked up in the catalog',
+    )
+    parser.add_argument(
+        '-r', '--recursive', action='store_true', help='Scan image subfolders'
+    )
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=os.cpu_count(), help='Worker processes'
+    )
+    parser.add_argument(
+        '-c', '--chunk-size', type=int, default=1000, help='Images per chunk'
+    )
+    parser.add_argument(
+        '--legacy-centers',
+        action='store_true',
+        help='The session was saved before bx / by held box centers, convert '
+        'them (hdf, parquet and feather sessions are detected)',
+    )
+    return parser
+
+
+def find_images(names, folders, recursive=False):
+    """
+    Locate session images by name.
+    Args:
+        names: Image names.
+        folders: Folders to scan.
+        recursive: If True, subfolders are scanned as well.
+
+    Return:
+        dict of image name -> image folder.
+    """
+    names = set(names)
+    image_paths = {}
+    for folder in folders:
+        for path in scan_images(folder, recursive, extensions=None):
+            image_dir, name = os.path.split(path)
+            if name in names:
+                image_paths.setdefault(name, image_dir)
+    missing = names - set(image_paths)
+    if missing:
+        catalog = Catalog()
+        for name in missing:
+            paths = catalog.find(name)
+            if paths:
+                image_paths[name] = os.path.dirname(paths[0])
+        catalog.close()
+    return image_paths
+
+
+def export_chunk(label_format, data, image_paths, label_dir):
+    """
+    Export a chunk of session data (process pool worker).
+    Args:
+        label_format: yolo or voc.
+        data: pandas DataFrame with session data columns.
+        image_paths: dict of image name -> image folder.
+        label_dir: Folder of the label files or None.
+
+    Return:
+        A dictionary of export statistics.
+    """
+    return LABEL_FORMATS[label_format](data, image_paths, jobs=1, label_dir=label_dir)
+
+
+def get_chunks(data, chunk_size):
+    """
+    Split session data into chunks of whole images.
+    Args:
+        data: pandas DataFrame with session data columns.
+        chunk_size: Number of images per chunk.
+
+    Yield:
+        pandas DataFrame chunks, categorical columns keep only the
+        categories used in the chunk.
+    """
+    images, order, starts = group_images(data['Image'].values)
+    for i in range(0, len(images), chunk_size):
+        end = min(i + chunk_size, len(images))
+        chunk = data.iloc[order[starts[i] : starts[end]]]
+        for column in ('Image', 'Object Name'):
+            if isinstance(chunk[column].dtype, pd.CategoricalDtype):
+                chunk = chunk.assign(
+                    **{column: chunk[column].cat.remove_unused_categories()}
+                )
+        yield chunk
+
+
+def drop_proposals(data):
+    """
+    Drop proposed boxes that were not accepted, they are not ground truth.
+    Args:
+        data: pandas DataFrame with session data columns.
+
+    Return:
+        pandas DataFrame.
+    """
+    proposed = unreviewed(data)
+    if proposed.any():
+        print(
+            f'Skipping {proposed.sum()} proposed boxes that were not accepted',
+            file=sys.stderr,
+        )
+        data = data[~proposed]
+    return data
+
+
+def locate_images(data, args):
+    """
+    Drop session data of images that are not found.
+    Args:
+        data: pandas DataFrame with session data columns.
+        args: Parsed command line arguments.
+
+    Return:
+        (data, dict of image name -> image folder)
+    """
+    image_paths = find_images(data['Image'].unique(), args.images, args.recursive)
+    found = data['Image'].isin(list(image_paths)).values
+    if not found.all():
+        missing = data['Image'][~found].nunique()
+        print(f'Skipping {missing} images that were not found', file=sys.stderr)
+        data = data[found]
+    return data, image_paths
+
+
+def report_skipped(stats):
+    """
+    Print the images left out of an export.
+    Args:
+        stats: A dictionary of export statistics.
+
+    Return:
+        None
+    """
+    for path in stats['skipped']:
+        print(f'\rSkipping {path}, image size is unknown', file=sys.stderr)
+
+
+def add_stats(futures, files, boxes):
+    """
+    Add export statistics of finished chunks and report progress.
+    Args:
+        futures: Futures of export_chunk() calls.
+        files: Number of files written so far.
+        boxes: Number of boxes written so far.
+
+    Return:
+        (files, boxes) written.
+    """
+    for future in futures:
+        stats = future.result()
+        files += stats['files']
+        boxes += stats['boxes']
+        report_skipped(stats)
+        print(f'\r{files} files, {boxes} boxes', end='', file=sys.stderr)
+    return files, boxes
+
+
+def convert_labels(data, args):
+    """
+    Export session data to label files in chunks across a process pool.
+    Args:
+        data: pandas DataFrame with session data columns.
+        args: Parsed command line arguments.
+
+    Return:
+        (files, boxes) written.
+    """
+    data, image_paths = locate_images(drop_proposals(data), args)
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    files = boxes = 0
+    pending = set()
+    with ProcessPoolExecutor(args.jobs) as executor:
+        for chunk in get_chunks(data, args.chunk_size):
+            # Bound the chunks in flight to keep memory flat on large sessions.
+            if len(pending) >= 2 * args.jobs:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                files, boxes = add_stats(done, files, boxes)
+            chunk_paths = {name: image_paths[name] for name in chunk['Image'].unique()}
+            pending.add(
+                executor.submit(export_chunk, args.to, chunk, chunk_paths, args.output)
+            )
+        files, boxes = add_stats(pending, files, boxes)
+    print(file=sys.stderr)
+    return files, boxes
+
+
+def convert_coco(data, args):
+    """
+    Export session data to a streamed COCO json file.
+    Args:
+        data: pandas DataFrame with session data columns.
+        args: Parsed command line arguments.
+
+    Return:
+        (files, boxes) written.
+    """
+    data, image_paths = locate_images(drop_proposals(data), args)
+    output = args.output or f'{os.path.splitext(args.session)[0]}.json'
+    stats = export_coco(data, image_paths, output)
+    report_skipped(stats)
+    return stats['files'], stats['boxes']
+
+
+def main(argv=None):
+    """
+    Run the command line interface.
+    Args:
+        argv: Command line arguments, defaults to sys.argv[1:]
+
+    Return:
+        Exit code.
+    """
+    args = get_parser().parse_args(argv)
+    start_time = time.perf_counter()
+    data = read_session(args.session)
+    if data is None:
+        print(f'Unsupported session file {args.session}', file=sys.stderr)
+        return 1
+    legacy = session_version(args.session) == 1
+    if args.legacy_centers or legacy:
+        print(
+            f'Converting bx / by of {args.session} from corner - size / 2 to '
+            f'box centers',
+            file=sys.stderr,
+        )
+        data = convert_legacy_centers(data)
+    loaded = time.perf_counter()
+    if args.to in LABEL_FORMATS:
+        files, boxes = convert_labels(data, args)
+    elif args.to == 'coco':
+        files, boxes = convert_coco(data, args)
+    else:
+        output = args.output or f'{os.path.splitext(args.session)[0]}.{args.to}'
+        save_session(data, output)
+        files, boxes = 1, len(data)
+    seconds = time.perf_counter() - start_time
+    print(
+        f'Loaded {len(data)} boxes in {loaded - start_time:.2f}s, wrote {files} '
+        f'files in {seconds:.2f}s ({files / seconds:.0f} files/s, '
+        f'{boxes / seconds:.0f} boxes/s)'
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,312 @@
+from exporters import atomic_output, get_stats, read_size
+from geometry import ratios_to_xywh, xywh_to_ratios
+from annotations import COLUMNS
+from array import array
+import pandas as pd
+import numpy as np
+import json
+import time
+import os
+
+
+class JSONStream:
+    """
+    Incremental JSON reader that decodes one array item at a time from a
+    text file, so documents larger than memory can be consumed.
+    """
+
+    def __init__(self, source, block_size=1 << 20):
+        """
+        Initialize the reader.
+        Args:
+            source: Text file object.
+            block_size: Number of characters read at a time.
+        """
+        self.source = source
+        self.block_size = block_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def read_more(self):
+        """
+        Append the next block of the file to the buffer and drop the consumed
+        part.
+
+        Return:
+            False if the end of the file is reached.
+        """
+        block = self.source.read(self.block_size)
+        self.buffer = self.buffer[self.position :] + block
+        self.position = 0
+        self.eof = not block
+        return not self.eof
+
+    def peek(self):
+        """
+        Skip whitespace.
+
+        Return:
+            The next character or '' at the end of the file.
+        """
+        while True:
+            while self.position < len(self.buffer):
+                if not self.buffer[self.position].isspace():
+                    return self.buffer[self.position]
+                self.position += 1
+            if not self.read_more():
+                return ''
+
+    def expect(self, characters):
+        """
+        Consume the next character.
+        Args:
+            characters: Allowed characters.
+
+        Return:
+            The consumed character.
+        """
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(
+                f'Expected one of {characters!r}, got {character!r} in JSON stream'
+            )
+        self.position += 1
+        return character
+
+    def decode(self):
+        """
+        Decode the next complete JSON value.
+
+        Return:
+            Decoded value.
+        """
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.buffer[self.position : self.position + 1].isspace():
+                    self.peek()
+                    continue
+                if self.eof:
+                    raise
+            self.read_more()
+
+    def items(self):
+        """
+        Decode the items of the next JSON array.
+
+        Yield:
+            Decoded array items.
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+        while True:
+            yield self.decode()
+            if self.buffer[self.position : self.position + 1] == ',':
+                self.position += 1
+            elif self.expect(',]') == ']':
+                return
+
+    def members(self, arrays):
+        """
+        Read the top level JSON object, array members are streamed to
+        callbacks and the other members are skipped.
+        Args:
+            arrays: dict of member name -> callback called with every item.
+
+        Return:
+            None
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            return
+        while True:
+            key = self.decode()
+            self.expect(':')
+            if self.peek() == '[':
+                callback = arrays.get(key)
+                for item in self.items():
+                    if callback:
+                        callback(item)
+            else:
+                self.decode()
+            if self.expect(',}') == '}':
+                return
+
+
+def write_coco_images(output, images, image_paths, image_sizes):
+    """
+    Write the images array of a COCO document.
+    Args:
+        output: Text file object.
+        images: A list of image names, image ids are list positions + 1.
+        image_paths: dict of image name -> image folder.
+        image_sizes: dict of image path -> (width, height), missing images
+            are measured from their headers.
+
+    Return:
+        (numpy array of (width, height) of every image, NaN for images whose
+        size cannot be determined, paths of these skipped images)
+    """
+    sizes = np.full((len(images), 2), np.nan)
+    skipped = []
+    output.write('"images": [')
+    for i, image in enumerate(images):
+        full_path = f'{image_paths[image]}/{image}'
+        image_size = read_size(full_path, image_sizes)
+        if image_size is None:
+            skipped.append(full_path)
+            continue
+        width, height = image_size
+        sizes[i] = width, height
+        entry = {'id': i + 1, 'file_name': image, 'width': width, 'height': height}
+        output.write(f'{"," if i > len(skipped) else ""}\n{json.dumps(entry)}')
+    output.write('\n],\n')
+    return sizes, skipped
+
+
+def export_coco(data, image_paths, location, image_sizes=None, chunk_size=1 << 16):
+    """
+    Save bounding boxes to a COCO json file, annotations are formatted and
+    written in chunks so memory does not grow with the number of boxes.
+    Category ids are Object Index + 1.
+    Args:
+        data: pandas DataFrame with session data columns.
+        image_paths: dict of image name -> image folder.
+        location: Path to json file.
+        image_sizes: dict of image path -> (width, height), missing images
+            are measured from their headers.
+        chunk_size: Number of annotations formatted at a time.
+
+    Return:
+        A dictionary of export statistics.
+    """
+    start_time = time.perf_counter()
+    image_codes, images = pd.factorize(data['Image'].values)
+    categories = (
+        data[['Object Index', 'Object Name']]
+        .drop_duplicates('Object Index')
+        .sort_values('Object Index')
+        .values.tolist()
+    )
+    ratios = data[['bx', 'by', 'bw', 'bh']].values.astype(np.float64)
+    category_ids = data['Object Index'].values.astype(np.int64) + 1
+    with atomic_output(location) as output:
+        output.write('{\n')
+        sizes, skipped = write_coco_images(
+            output, images, image_paths, image_sizes or {}
+        )
+        kept = np.flatnonzero(~np.isnan(sizes[image_codes, 0]))
+        output.write('"annotations": [')
+        for start in range(0, len(kept), chunk_size):
+            rows = kept[start : start + chunk_size]
+            codes = image_codes[rows]
+            x, y, w, h = ratios_to_xywh(
+                ratios[rows], sizes[codes, 0], sizes[codes, 1]
+            ).T
+            entries = zip(
+                range(start + 1, start + len(codes) + 1),
+                (codes + 1).tolist(),
+                category_ids[rows].tolist(),
+                x.tolist(),
+                y.tolist(),
+                w.tolist(),
+                h.tolist(),
+                (w * h).tolist(),
+            )
+            output.write(
+                ','.join(
+                    f'\n{{"id": {i}, "image_id": {image_id}, '
+                    f'"category_id": {category_id}, '
+                    f'"bbox": [{x}, {y}, {w}, {h}], "area": {area}, "iscrowd": 0}}'
+                    for i, image_id, category_id, x, y, w, h, area in entries
+                )
+            )
+            if start + chunk_size < len(kept):
+                output.write(',')
+        output.write('\n],\n"categories": [')
+        output.write(
+            ','.join(
+                f'\n{json.dumps({"id": int(index) + 1, "name": f"{name}"})}'
+                for index, name in categories
+            )
+        )
+        output.write('\n]\n}\n')
+    return get_stats(1, len(kept), start_time, skipped)
+
+
+def read_coco(location, block_size=1 << 20):
+    """
+    Read bounding boxes from a COCO json file incrementally, only the
+    parsed image, category and box values are kept in memory.
+    Args:
+        location: Path to json file.
+        block_size: Number of characters read at a time.
+
+    Return:
+        pandas DataFrame with session data columns, Object Index is the
+        position of the category in the categories list (categories that
+        are only used by annotations follow in id order).
+    """
+    image_ids, image_names, widths, heights = [], [], [], []
+    category_names = {}
+    annotation_images, annotation_categories = array('q'), array('q')
+    boxes = array('d')
+
+    def add_image(image):
+        image_ids.append(image['id'])
+        image_names.append(os.path.basename(image['file_name']))
+        widths.append(image['width'])
+        heights.append(image['height'])
+
+    def add_annotation(annotation):
+        annotation_images.append(annotation['image_id'])
+        annotation_categories.append(annotation['category_id'])
+        boxes.extend(annotation['bbox'])
+
+    def add_category(category):
+        category_names[category['id']] = category['name']
+
+    with open(location) as source:
+        JSONStream(source, block_size).members(
+            {
+                'images': add_image,
+                'annotations': add_annotation,
+                'categories': add_category,
+            }
+        )
+    image_index = pd.Index(image_ids).get_indexer(
+        np.frombuffer(annotation_images, np.int64)
+    )
+    found = image_index >= 0
+    image_index = image_index[found]
+    category_ids = np.frombuffer(annotation_categories, np.int64)[found]
+    ratios = xywh_to_ratios(
+        np.frombuffer(boxes, np.float64).reshape(-1, 4)[found],
+        np.array(widths, np.float64)[image_index],
+        np.array(heights, np.float64)[image_index],
+    )
+    image_codes, images = pd.factorize(np.array(image_names, object))
+    unlisted = np.setdiff1d(category_ids, list(category_names)).tolist()
+    categories = [*category_names, *unlisted]
+    names = [category_names.get(category, f'{category}') for category in categories]
+    category_codes = pd.Index(categories).get_indexer(category_ids)
+    return pd.DataFrame(
+        {
+            'Image': pd.Categorical.from_codes(image_codes[image_index], images),
+            'Object Name': pd.Categorical(np.array(names, object)[category_codes]),
+            'Object Index': category_codes,
+            'bx': ratios[:, 0],
+            'by': ratios[:, 1],
+            'bw': ratios[:, 2],
+            'bh': ratios[:, 3],
+        },
+        columns=COLUMNS,
+    )
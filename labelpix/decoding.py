@@ -0,0 +1,25 @@
+def read_reduced(path, size, grayscale=False, side=min):
+    """
+    Decode an image at the lowest of 1/8, 1/4, 1/2 or full resolution that
+    keeps it at least size pixels wide, jpeg images are scaled while being
+    decoded.
+    Args:
+        path: Path to image.
+        size: Minimum decoded size of the measured side.
+        grayscale: If True, the image is decoded to grayscale.
+        side: min to measure the shorter side, max for the longer one.
+
+    Return:
+        Image array or None if the image cannot be read.
+    """
+    import imagesize
+    import cv2
+
+    mode = 'GRAYSCALE' if grayscale else 'COLOR'
+    flag = getattr(cv2, f'IMREAD_{mode}')
+    length = side(imagesize.get(path))
+    for factor in (8, 4, 2):
+        if length >= size * factor:
+            flag = getattr(cv2, f'IMREAD_REDUCED_{mode}_{factor}')
+            break
+    return cv2.imread(path, flag)
@@ -0,0 +1,415 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from concurrent.futures import ProcessPoolExecutor
+from decoding import read_reduced
+import multiprocessing
+import numpy as np
+import threading
+import os
+
+HASH_BITS = 64
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], np.uint8)
+
+
+def dhash(path, hash_size=8):
+    """
+    Calculate the difference hash of an image: the sign of horizontal
+    gradients of a (hash_size + 1) x hash_size grayscale thumbnail, decoded
+    at the lowest sufficient resolution.
+    Args:
+        path: Path to image.
+        hash_size: Number of rows and bits per row.
+
+    Return:
+        Hash as int or None if the image cannot be read.
+    """
+    import cv2
+
+    image = read_reduced(path, hash_size * 4, grayscale=True)
+    if image is None:
+        return
+    image = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (image[:, 1:] > image[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def dhash_batch(tasks):
+    """
+    Hash a batch of images (process pool worker).
+    Args:
+        tasks: A list of (path, mtime_ns)
+
+    Return:
+        A list of (hash or None, path, mtime_ns)
+    """
+    import cv2
+
+    results = []
+    for path, mtime_ns in tasks:
+        try:
+            results.append((dhash(path), path, mtime_ns))
+        except (OSError, ValueError, cv2.error):
+            results.append((None, path, mtime_ns))
+    return results
+
+
+def hamming(first, second):
+    """
+    Count differing bits of 64 bit hashes.
+    Args:
+        first: uint64 array.
+        second: uint64 array of the same shape.
+
+    Return:
+        uint8 array of distances.
+    """
+    difference = np.bitwise_xor(first, second)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(difference)
+    return POPCOUNT[difference.view(np.uint8)].reshape(*difference.shape, 8).sum(-1)
+
+
+def leader_clusters(order, count, first, second):
+    """
+    Cluster nodes around leaders: in the given order, each node that is not
+    yet in a cluster leads a new one and takes its unclustered neighbors, so
+    every member is adjacent to its leader and clusters cannot chain.
+    Args:
+        order: int array of nodes in the order they may become leaders.
+        count: Number of nodes.
+        first: int array of edge sources.
+        second: int array of edge targets.
+
+    Return:
+        int array of the leader of each node.
+    """
+    leaders = np.arange(count)
+    nodes = np.concatenate([first, second])
+    neighbors = np.concatenate([second, first])
+    by_node = np.argsort(nodes, kind='stable')
+    nodes, neighbors = nodes[by_node], neighbors[by_node]
+    bounds = np.searchsorted(nodes, np.arange(count + 1))
+    clustered = np.zeros(count, np.bool_)
+    # Nodes without neighbors lead their own cluster.
+    for node in order[np.isin(order, nodes)].tolist():
+        if clustered[node]:
+            continue
+        members = neighbors[bounds[node] : bounds[node + 1]]
+        members = members[~clustered[members]]
+        leaders[members] = node
+        clustered[members] = True
+        clustered[node] = True
+    return leaders
+
+
+def band_values(hashes, max_distance):
+    """
+    Split hashes into max_distance + 1 bit bands, any two hashes within
+    max_distance bits are equal in at least one band.
+    Args:
+        hashes: uint64 array.
+        max_distance: Maximum number of differing bits of near-duplicates.
+
+    Return:
+        A list of uint64 arrays of band values, one per band.
+    """
+    bounds = np.linspace(0, HASH_BITS, max_distance + 2).astype(np.uint64)
+    return [
+        (hashes >> start) & np.uint64((1 << int(stop - start)) - 1)
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def close_pairs(hashes, bands, max_distance):
+    """
+    Find all pairs of hashes within a Hamming distance by comparing the
+    hashes that share a band value, used on small batches since a dense
+    set of n near-duplicates has n^2 pairs.
+    Args:
+        hashes: uint64 array.
+        bands: A list of band value arrays of the hashes.
+        max_distance: Maximum number of differing bits of near-duplicates.
+
+    Return:
+        (int array of first indexes, int array of second indexes)
+    """
+    sources, targets = [np.array([], np.int64)], [np.array([], np.int64)]
+    for band in bands:
+        order = np.argsort(band, kind='stable')
+        sorted_bands, sorted_hashes = band[order], hashes[order]
+        offset = 1
+        while offset < len(order):
+            same = np.flatnonzero(sorted_bands[:-offset] == sorted_bands[offset:])
+            if not len(same):
+                break
+            close = (
+                hamming(sorted_hashes[same], sorted_hashes[same + offset])
+                <= max_distance
+            )
+            sources.append(order[same[close]])
+            targets.append(order[same[close] + offset])
+            offset += 1
+    return np.concatenate(sources), np.concatenate(targets)
+
+
+class LeaderIndex:
+    """
+    Band buckets of cluster leaders. Leaders are added in batches to sorted
+    levels that are merged when a level grows to the size of the one below,
+    so adding n leaders sorts O(n log n) values in total.
+    """
+
+    def __init__(self, bands):
+        """
+        Initialize an empty index.
+        Args:
+            bands: A list of band value arrays of all nodes.
+        """
+        self.bands = bands
+        self.levels = []
+
+    def build(self, leaders):
+        """
+        Sort leaders by their band values.
+        Args:
+            leaders: int array of leader nodes.
+
+        Return:
+            (leaders, [(sorted band values, leaders in that order), ...])
+        """
+        buckets = []
+        for band in self.bands:
+            values = band[leaders]
+            order = np.argsort(values, kind='stable')
+            buckets.append((values[order], leaders[order]))
+        return leaders, buckets
+
+    def add(self, leaders):
+        """
+        Add leaders.
+        Args:
+            leaders: int array of leader nodes.
+
+        Return:
+            None
+        """
+        if not len(leaders):
+            return
+        self.levels.append(self.build(leaders))
+        while len(self.levels) > 1 and len(self.levels[-2][0]) <= len(
+            self.levels[-1][0]
+        ):
+            top, below = self.levels.pop(), self.levels.pop()
+            self.levels.append(self.build(np.concatenate([below[0], top[0]])))
+
+    def candidates(self, nodes):
+        """
+        Get the leaders that share a band value with nodes.
+        Args:
+            nodes: int array of nodes.
+
+        Return:
+            (int array of positions in nodes, int array of leaders)
+        """
+        positions, leaders = [np.array([], np.int64)], [np.array([], np.int64)]
+        for _, buckets in self.levels:
+            for band, (values, members) in zip(self.bands, buckets):
+                keys = band[nodes]
+                starts = np.searchsorted(values, keys, 'left')
+                counts = np.searchsorted(values, keys, 'right') - starts
+                total = int(counts.sum())
+                if not total:
+                    continue
+                offsets = np.repeat(np.cumsum(counts) - counts - starts, counts)
+                positions.append(np.repeat(np.arange(len(nodes)), counts))
+                leaders.append(members[np.arange(total) - offsets])
+        return np.concatenate(positions), np.concatenate(leaders)
+
+
+def may_have_duplicates(hashes, bands, max_distance, max_bucket=1024):
+    """
+    Flag hashes that can have another hash within max_distance bits. Hashes
+    in band buckets of up to max_bucket hashes are compared, the ones in
+    larger buckets (dense near-duplicate sets) are flagged without
+    comparing.
+    Args:
+        hashes: uint64 array.
+        bands: A list of band value arrays of the hashes.
+        max_distance: Maximum number of differing bits of near-duplicates.
+        max_bucket: Maximum size of compared band buckets.
+
+    Return:
+        Boolean numpy array.
+    """
+    flagged = np.zeros(len(hashes), np.bool_)
+    for band in bands:
+        order = np.argsort(band, kind='stable')
+        sorted_bands = band[order]
+        starts = np.flatnonzero(np.r_[True, sorted_bands[1:] != sorted_bands[:-1]])
+        sizes = np.diff(np.r_[starts, len(order)])
+        large = np.repeat(sizes > max_bucket, sizes)
+        flagged[order[large]] = True
+        compared = np.repeat((sizes > 1) & (sizes <= max_bucket), sizes)
+        order, sorted_bands = order[compared], sorted_bands[compared]
+        sorted_hashes = hashes[order]
+        offset = 1
+        while offset < len(order):
+            same = np.flatnonzero(sorted_bands[:-offset] == sorted_bands[offset:])
+            if not len(same):
+                break
+            close = same[
+                hamming(sorted_hashes[same], sorted_hashes[same + offset])
+                <= max_distance
+            ]
+            flagged[order[close]] = True
+            flagged[order[close + offset]] = True
+            offset += 1
+    return flagged
+
+
+def near_duplicates(hashes, max_distance=4, batch_size=4096):
+    """
+    Cluster hashes around leaders: in list order, each hash joins the
+    earliest leader within max_distance bits or becomes a leader itself, so
+    every member is within max_distance of its cluster's first hash and
+    drifting sequences cannot chain. Hashes are compared only with leaders
+    sharing a band value, and with each other within a batch, so dense
+    near-duplicate sets are never expanded to all their pairs.
+    Args:
+        hashes: uint64 array.
+        max_distance: Maximum number of differing bits of near-duplicates.
+        batch_size: Number of hashes clustered at a time.
+
+    Return:
+        int array of the first index in the cluster of each hash.
+    """
+    hashes = np.asarray(hashes, np.uint64)
+    unique, first_index, inverse = np.unique(
+        hashes, return_index=True, return_inverse=True
+    )
+    # Nodes are unique hashes in list order, a leader is the smallest node.
+    order = np.argsort(first_index, kind='stable')
+    nodes_hashes = unique[order]
+    count = len(nodes_hashes)
+    bands = band_values(nodes_hashes, max_distance)
+    index = LeaderIndex(bands)
+    leaders = np.arange(count)
+    # Hashes without near-duplicates lead their own cluster.
+    candidates = np.flatnonzero(may_have_duplicates(nodes_hashes, bands, max_distance))
+    for start in range(0, len(candidates), batch_size):
+        nodes = candidates[start : start + batch_size]
+        positions, known = index.candidates(nodes)
+        close = (
+            hamming(nodes_hashes[nodes[positions]], nodes_hashes[known]) <= max_distance
+        )
+        matched = np.full(len(nodes), count)
+        np.minimum.at(matched, positions[close], known[close])
+        found = matched < count
+        leaders[nodes[found]] = matched[found]
+        rest = nodes[~found]
+        first, second = close_pairs(
+            nodes_hashes[rest], [band[rest] for band in bands], max_distance
+        )
+        local = leader_clusters(np.arange(len(rest)), len(rest), first, second)
+        leaders[rest] = rest[local]
+        index.add(rest[local == np.arange(len(rest))])
+    cluster_first = np.empty(count, np.int64)
+    cluster_first[order] = first_index[order[leaders]]
+    return cluster_first[inverse.ravel()]
+
+
+class DuplicateFinder(QObject):
+    """
+    Find near-duplicate images in a background thread, missing hashes are
+    calculated in a process pool and cached in the catalog.
+    """
+
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(list)
+
+    def __init__(self, paths, catalog, max_distance=4, workers=None, batch_size=256):
+        """
+        Initialize search settings.
+        Args:
+            paths: A list of image paths.
+            catalog: Catalog object where hashes are cached.
+            max_distance: Maximum number of differing hash bits of
+                near-duplicates.
+            workers: Number of worker processes, defaults to the number of
+                CPUs.
+            batch_size: Number of images hashed per task.
+        """
+        super().__init__()
+        self.paths = list(paths)
+        self.catalog = catalog
+        self.max_distance = max_distance
+        self.workers = workers or os.cpu_count()
+        self.batch_size = batch_size
+        self.stop = threading.Event()
+
+    def start(self):
+        """
+        Start searching in a background thread.
+
+        Return:
+            None
+        """
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def cancel(self):
+        """
+        Stop searching.
+
+        Return:
+            None
+        """
+        self.stop.set()
+
+    def hash_images(self):
+        """
+        Get cached hashes and calculate the missing ones.
+
+        Return:
+            dict of path -> hash.
+        """
+        hashes = self.catalog.perceptual_hashes(self.paths)
+        missing = self.catalog.query(
+            ['mtime_ns'], [path for path in self.paths if path not in hashes]
+        )
+        tasks = [(path, mtime_ns) for path, (mtime_ns,) in missing.items()]
+        done, total = len(hashes), len(hashes) + len(tasks)
+        self.progress.emit(done, total)
+        if not tasks:
+            return hashes
+        with ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context('spawn')
+        ) as executor:
+            batches = [
+                tasks[i : i + self.batch_size]
+                for i in range(0, len(tasks), self.batch_size)
+            ]
+            for results in executor.map(dhash_batch, batches):
+                if self.stop.is_set():
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    break
+                results = [result for result in results if result[0] is not None]
+                self.catalog.set_perceptual_hashes(results)
+                hashes.update((path, value) for value, path, _ in results)
+                done += self.batch_size
+                self.progress.emit(min(done, total), total)
+        return hashes
+
+    def run(self):
+        """
+        Emit the paths of near-duplicates of earlier images in the list.
+
+        Return:
+            None
+        """
+        hashes = self.hash_images()
+        if self.stop.is_set():
+            self.finished.emit([])
+            return
+        paths = [path for path in self.paths if path in hashes]
+        clusters = near_duplicates([hashes[path] for path in paths], self.max_distance)
+        redundant = np.flatnonzero(clusters != np.arange(len(paths)))
+        self.finished.emit([paths[i] for i in redundant.tolist()])
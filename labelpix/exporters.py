@@ -0,0 +1,333 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from xml.sax.saxutils import escape
+from contextlib import contextmanager
+from geometry import ratios_to_corners
+import multiprocessing
+import pandas as pd
+import numpy as np
+import imagesize
+import tempfile
+import time
+import os
+
+UMASK = os.umask(0)
+os.umask(UMASK)
+VOC_HEADER = (
+    '<annotation>\n'
+    '\t<folder>{folder}</folder>\n'
+    '\t<filename>{file_name}</filename>\n'
+    '\t<path>{path}</path>\n'
+    '\t<size>\n'
+    '\t\t<width>{width}</width>\n'
+    '\t\t<height>{height}</height>\n'
+    '\t\t<depth>3</depth>\n'
+    '\t</size>\n'
+)
+VOC_OBJECT = (
+    '\t<object>\n'
+    '\t\t<name>{name}</name>\n'
+    '\t\t<bndbox>\n'
+    '\t\t\t<xmin>{x_min}</xmin>\n'
+    '\t\t\t<ymin>{y_min}</ymin>\n'
+    '\t\t\t<xmax>{x_max}</xmax>\n'
+    '\t\t\t<ymax>{y_max}</ymax>\n'
+    '\t\t</bndbox>\n'
+    '\t</object>\n'
+)
+
+
+@contextmanager
+def atomic_output(path, mode='w'):
+    """
+    Open a temporary file in the same folder as path, which replaces path
+    when the block exits without errors, so readers never see a partially
+    written file.
+    Args:
+        path: Path to output file.
+        mode: 'w' for text or 'wb' for bytes.
+
+    Yield:
+        File object.
+    """
+    directory, name = os.path.split(path)
+    descriptor, temp = tempfile.mkstemp(prefix=f'.{name}-', dir=directory or '.')
+    try:
+        os.fchmod(descriptor, 0o666 & ~UMASK)
+        with os.fdopen(descriptor, mode) as output:
+            yield output
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+
+def write_atomic(path, content):
+    """
+    Write a file atomically.
+    Args:
+        path: Path to output file.
+        content: str or bytes to write.
+
+    Return:
+        None
+    """
+    with atomic_output(path, 'wb' if isinstance(content, bytes) else 'w') as output:
+        output.write(content)
+
+
+def group_images(images):
+    """
+    Group rows by image.
+    Args:
+        images: Array of image names, one per box.
+
+    Return:
+        (image names, row order, group start offsets) where the rows of
+        image i are order[starts[i]: starts[i + 1]].
+    """
+    codes, names = pd.factorize(images)
+    order = np.argsort(codes, kind='stable')
+    starts = np.searchsorted(codes[order], np.arange(len(names) + 1))
+    return list(names), order, starts
+
+
+def label_path(image_dir, image, extension):
+    """
+    Get the label file path of an image.
+    Args:
+        image_dir: Folder of the image.
+        image: Image name.
+        extension: Label file extension (ex: .txt)
+
+    Return:
+        Path to label file.
+    """
+    return f'{image_dir}/{image.split(".")[0]}{extension}'
+
+
+def write_files(files, jobs=None):
+    """
+    Write files atomically, optionally in parallel.
+    Args:
+        files: A list of (path, content) pairs.
+        jobs: Number of writer threads, 1 or None writes serially.
+
+    Return:
+        None
+    """
+    if jobs and jobs > 1:
+        with ThreadPoolExecutor(jobs) as executor:
+            list(executor.map(lambda item: write_atomic(*item), files))
+    else:
+        for path, content in files:
+            write_atomic(path, content)
+
+
+def export_yolo(data, image_paths, jobs=None, label_dir=None):
+    """
+    Save bounding boxes to txt files in yolo format, one file per image.
+    Args:
+        data: pandas DataFrame with session data columns.
+        image_paths: dict of image name -> image folder.
+        jobs: Number of writer threads.
+        label_dir: Folder of the txt files, defaults to the image folders.
+
+    Return:
+        A dictionary of export statistics.
+    """
+    start_time = time.perf_counter()
+    lines = data['Object Index'].values.astype(str)
+    for column in ('bx', 'by', 'bw', 'bh'):
+        lines = np.char.add(np.char.add(lines, ' '), data[column].values.astype(str))
+    lines = np.char.add(lines, '\n')
+    images, order, starts = group_images(data['Image'].values)
+    files = [
+        (
+            label_path(label_dir or image_paths[image], image, '.txt'),
+            ''.join(lines[order[starts[i] : starts[i + 1]]]),
+        )
+        for i, image in enumerate(images)
+    ]
+    write_files(files, jobs)
+    return get_stats(len(files), len(data), start_time)
+
+
+def generate_voc_xml(full_path, image_size, obj_data):
+    """
+    Generate a Pascal VOC XML document.
+    Args:
+        full_path: Path to image.
+        image_size: (width, height) of the image.
+        obj_data: [[x_min, y_min, x_max, y_max, object_name], ...]
+
+    Return:
+        XML document as str.
+    """
+    folder, file_name = os.path.split(full_path)
+    width, height = image_size
+    parts = [
+        VOC_HEADER.format(
+            folder=escape(folder),
+            file_name=escape(file_name),
+            path=escape(full_path),
+            width=width,
+            height=height,
+        )
+    ]
+    for x_min, y_min, x_max, y_max, object_name in obj_data:
+        parts.append(
+            VOC_OBJECT.format(
+                name=escape(f'{object_name}'),
+                x_min=x_min,
+                y_min=y_min,
+                x_max=x_max,
+                y_max=y_max,
+            )
+        )
+    parts.append('</annotation>\n')
+    return ''.join(parts)
+
+
+def read_size(full_path, image_sizes):
+    """
+    Get the size of an image.
+    Args:
+        full_path: Path to image.
+        image_sizes: dict of image path -> (width, height), missing images
+            are measured from their headers.
+
+    Return:
+        (width, height) or None if the size cannot be determined.
+    """
+    try:
+        width, height = image_sizes.get(full_path) or imagesize.get(full_path)
+    except (OSError, ValueError):
+        return
+    if width <= 0 or height <= 0:
+        return
+    return width, height
+
+
+def write_voc_files(images):
+    """
+    Write VOC XML files of a chunk of images (process pool worker).
+    Args:
+        images: A list of (image path, output path, image size, object names,
+            ratios) where image size is (width, height) or None to read it
+            from the image header, and ratios is an array of
+            [[bx, by, bw, bh], ...]
+
+    Return:
+        (number of written files, number of written boxes, paths of skipped
+        images whose size cannot be determined)
+    """
+    files = boxes = 0
+    skipped = []
+    for full_path, out_file, image_size, object_names, ratios in images:
+        image_size = read_size(full_path, {full_path: image_size})
+        if image_size is None:
+            skipped.append(full_path)
+            continue
+        corners = ratios_to_corners(ratios, *image_size).tolist()
+        obj_data = [
+            [*corner, object_name] for corner, object_name in zip(corners, object_names)
+        ]
+        write_atomic(out_file, generate_voc_xml(full_path, image_size, obj_data))
+        files += 1
+        boxes += len(obj_data)
+    return files, boxes, skipped
+
+
+def export_voc(
+    data, image_paths, jobs=None, chunk_size=256, image_sizes=None, label_dir=None
+):
+    """
+    Save bounding boxes to xml files in Pascal VOC format, one file per image.
+    Args:
+        data: pandas DataFrame with session data columns.
+        image_paths: dict of image name -> image folder.
+        jobs: Number of worker processes, defaults to the number of CPUs.
+        chunk_size: Number of images processed per task.
+        image_sizes: dict of image path -> (width, height), missing images
+            are measured from their headers.
+        label_dir: Folder of the xml files, defaults to the image folders.
+
+    Return:
+        A dictionary of export statistics.
+    """
+    start_time = time.perf_counter()
+    images, order, starts = group_images(data['Image'].values)
+    object_names = data['Object Name'].values
+    ratios = data[['bx', 'by', 'bw', 'bh']].values.astype(np.float64)
+    image_sizes = image_sizes or {}
+    tasks = []
+    for i, image in enumerate(images):
+        rows = order[starts[i] : starts[i + 1]]
+        full_path = f'{image_paths[image]}/{image}'
+        tasks.append(
+            (
+                full_path,
+                label_path(label_dir or image_paths[image], image, '.xml'),
+                image_sizes.get(full_path),
+                object_names[rows].tolist(),
+                ratios[rows],
+            )
+        )
+    chunks = [tasks[i : i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+    if len(chunks) > 1 and jobs != 1:
+        # spawn, forking the threaded GUI process can deadlock the workers.
+        with ProcessPoolExecutor(
+            jobs, mp_context=multiprocessing.get_context('spawn')
+        ) as executor:
+            results = list(executor.map(write_voc_files, chunks))
+    else:
+        results = list(map(write_voc_files, chunks))
+    files = sum(result[0] for result in results)
+    boxes = sum(result[1] for result in results)
+    skipped = [path for result in results for path in result[2]]
+    return get_stats(files, boxes, start_time, skipped)
+
+
+def remove_labels(images, labeled, extension):
+    """
+    Remove label files of images that no longer have bounding boxes.
+    Args:
+        images: A list of image paths.
+        labeled: A set of image names that have bounding boxes.
+        extension: Label file extension (ex: .txt)
+
+    Return:
+        Number of removed files.
+    """
+    removed = 0
+    for image in images:
+        image_dir, image_name = '/'.join(image.split('/')[:-1]), image.split('/')[-1]
+        if image_name not in labeled:
+            try:
+                os.remove(label_path(image_dir, image_name, extension))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def get_stats(files, boxes, start_time, skipped=()):
+    """
+    Calculate export statistics.
+    Args:
+        files: Number of written files.
+        boxes: Number of exported bounding boxes.
+        start_time: time.perf_counter() at the start of the export.
+        skipped: Paths of images that were not exported.
+
+    Return:
+        A dictionary of export statistics.
+    """
+    seconds = time.perf_counter() - start_time
+    return {
+        'files': files,
+        'boxes': boxes,
+        'seconds': seconds,
+        'files_per_second': files / seconds if seconds else 0.0,
+        'skipped': list(skipped),
+    }
@@ -0,0 +1,220 @@
+import numpy as np
+import time
+
+
+def as_boxes(boxes):
+    """
+    Convert boxes to a float64 array.
+    Args:
+        boxes: Array-like of 4 values per box, a single box is also accepted.
+
+    Return:
+        numpy array of shape (n, 4)
+    """
+    boxes = np.asarray(boxes, np.float64)
+    if boxes.size == 0:
+        return boxes.reshape(0, 4)
+    if boxes.ndim == 1:
+        boxes = boxes[None]
+    if boxes.ndim != 2 or boxes.shape[1] != 4:
+        raise ValueError(f'Expected boxes of shape (n, 4), got {boxes.shape}')
+    return boxes
+
+
+def get_scale(width, height):
+    """
+    Get the multiplier of box values.
+    Args:
+        width: Image width, a number or an array with one value per box.
+        height: Image height, a number or an array with one value per box.
+
+    Return:
+        numpy array of [width, height, width, height] of shape (4,) or (n, 4)
+    """
+    width, height = np.broadcast_arrays(
+        np.asarray(width, np.float64), np.asarray(height, np.float64)
+    )
+    if (width <= 0).any() or (height <= 0).any():
+        raise ValueError('Image width and height must be positive')
+    return np.stack([width, height, width, height], -1)
+
+
+def clip_corners(corners, width, height):
+    """
+    Clip corner boxes to the image.
+    Args:
+        corners: Array of [[x_min, y_min, x_max, y_max], ...]
+        width: Image width, a number or an array with one value per box.
+        height: Image height, a number or an array with one value per box.
+
+    Return:
+        numpy array of clipped corners.
+    """
+    corners = as_boxes(corners)
+    return np.clip(corners, 0, get_scale(width, height))
+
+
+def corners_to_ratios(corners, width, height, clip=True):
+    """
+    Convert absolute corners (voc) to relative centers and sizes (yolo).
+    Args:
+        corners: Array of [[x1, y1, x2, y2], ...] in any corner order.
+        width: Image width, a number or an array with one value per box.
+        height: Image height, a number or an array with one value per box.
+        clip: If True, boxes are clipped to the image.
+
+    Return:
+        numpy array of [[bx, by, bw, bh], ...]
+    """
+    corners = as_boxes(corners)
+    corners = np.concatenate(
+        [
+            np.minimum(corners[:, :2], corners[:, 2:]),
+            np.maximum(corners[:, :2], corners[:, 2:]),
+        ],
+        1,
+    )
+    if clip:
+        corners = clip_corners(corners, width, height)
+    ratios = corners / get_scale(width, height)
+    return np.concatenate(
+        [(ratios[:, :2] + ratios[:, 2:]) / 2, ratios[:, 2:] - ratios[:, :2]], 1
+    )
+
+
+def ratios_to_corners(ratios, width, height, clip=True):
+    """
+    Convert relative centers and sizes (yolo) to absolute corners (voc).
+    Args:
+        ratios: Array of [[bx, by, bw, bh], ...]
+        width: Image width, a number or an array with one value per box.
+        height: Image height, a number or an array with one value per box.
+        clip: If True, boxes are clipped to the image.
+
+    Return:
+        numpy array of [[x_min, y_min, x_max, y_max], ...]
+    """
+    ratios = as_boxes(ratios)
+    half_sizes = ratios[:, 2:] / 2
+    corners = np.concatenate(
+        [ratios[:, :2] - half_sizes, ratios[:, :2] + half_sizes], 1
+    ) * get_scale(width, height)
+    if clip:
+        corners = clip_corners(corners, width, height)
+    return corners
+
+
+def corners_to_xywh(corners):
+    """
+    Convert corners to top left corners and sizes.
+    Args:
+        corners: Array of [[x_min, y_min, x_max, y_max], ...]
+
+    Return:
+        numpy array of [[x, y, w, h], ...]
+    """
+    corners = as_boxes(corners)
+    return np.concatenate([corners[:, :2], corners[:, 2:] - corners[:, :2]], 1)
+
+
+def xywh_to_corners(xywh):
+    """
+    Convert top left corners and sizes to corners.
+    Args:
+        xywh: Array of [[x, y, w, h], ...]
+
+    Return:
+        numpy array of [[x_min, y_min, x_max, y_max], ...]
+    """
+    xywh = as_boxes(xywh)
+    return np.concatenate([xywh[:, :2], xywh[:, :2] + xywh[:, 2:]], 1)
+
+
+def ratios_to_xywh(ratios, width, height, clip=True):
+    """
+    Convert relative centers and sizes (yolo) to absolute top left corners
+    and sizes (coco, Qt rectangles).
+    Args:
+        ratios: Array of [[bx, by, bw, bh], ...]
+        width: Image width, a number or an array with one value per box.
+        height: Image height, a number or an array with one value per box.
+        clip: If True, boxes are clipped to the image.
+
+    Return:
+        numpy array of [[x, y, w, h], ...]
+    """
+    return corners_to_xywh(ratios_to_corners(ratios, width, height, clip))
+
+
+def xywh_to_ratios(xywh, width, height, clip=True):
+    """
+    Convert absolute top left corners and sizes (coco) to relative centers
+    and sizes (yolo).
+    Args:
+        xywh: Array of [[x, y, w, h], ...]
+        width: Image width, a number or an array with one value per box.
+        height: Image height, a number or an array with one value per box.
+        clip: If True, boxes are clipped to the image.
+
+    Return:
+        numpy array of [[bx, by, bw, bh], ...]
+    """
+    return corners_to_ratios(xywh_to_corners(xywh), width, height, clip)
+
+
+def valid_ratios(ratios, min_size=0.0):
+    """
+    Check relative boxes.
+    Args:
+        ratios: Array of [[bx, by, bw, bh], ...]
+        min_size: Minimum relative width and height.
+
+    Return:
+        Boolean numpy array, True for finite boxes with a size above
+        min_size whose corners are inside the image.
+    """
+    ratios = as_boxes(ratios)
+    half_sizes = ratios[:, 2:] / 2
+    return (
+        np.isfinite(ratios).all(1)
+        & (ratios[:, 2:] > min_size).all(1)
+        & (ratios[:, :2] - half_sizes >= -1e-9).all(1)
+        & (ratios[:, :2] + half_sizes <= 1 + 1e-9).all(1)
+    )
+
+
+def benchmark(boxes=1_000_000, repeats=5):
+    """
+    Measure conversion times.
+    Args:
+        boxes: Number of boxes per conversion.
+        repeats: Number of measurements, the best one is reported.
+
+    Return:
+        dict of conversion -> milliseconds per million boxes.
+    """
+    generator = np.random.default_rng(0)
+    ratios = generator.uniform(0.1, 0.3, (boxes, 4))
+    width = generator.integers(100, 5000, boxes)
+    height = generator.integers(100, 5000, boxes)
+    corners = ratios_to_corners(ratios, width, height)
+    conversions = {
+        'ratios_to_corners': lambda: ratios_to_corners(ratios, width, height),
+        'corners_to_ratios': lambda: corners_to_ratios(corners, width, height),
+        'ratios_to_xywh': lambda: ratios_to_xywh(ratios, width, height),
+        'valid_ratios': lambda: valid_ratios(ratios),
+    }
+    results = {}
+    for name, conversion in conversions.items():
+        seconds = []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            conversion()
+            seconds.append(time.perf_counter() - start_time)
+        results[name] = min(seconds) * 1000 * 1_000_000 / boxes
+    return results
+
+
+if __name__ == '__main__':
+    for conversion, milliseconds in benchmark().items():
+        print(f'{conversion}: {milliseconds:.1f} ms per million boxes')
@@ -0,0 +1,268 @@
+from settings import DATA_DIR
+from queue import Queue, Empty
+import numpy as np
+import threading
+import json
+import os
+
+JOURNAL_DIR = os.path.join(DATA_DIR, 'recovery')
+
+
+def to_list(value):
+    """
+    Convert numpy arrays and pandas Categoricals of journal operations to
+    lists (json.dumps default).
+    Args:
+        value: Array-like object.
+
+    Return:
+        list.
+    """
+    return value.tolist()
+
+
+def extend_frame(images, object_names, object_indexes, ratios, scores, proposed=None):
+    """
+    Rebuild the DataFrame of a journaled bulk addition.
+    Args:
+        images: A list of image names.
+        object_names: A list of label names.
+        object_indexes: A list of label indexes.
+        ratios: [[bx, by, bw, bh], ...]
+        scores: A list of detector confidences (NaN for drawn boxes).
+        proposed: A list of booleans, True for proposals not accepted yet,
+            boxes with a score are proposed if None.
+
+    Return:
+        pandas DataFrame with session data columns, Score and Proposed.
+    """
+    import pandas as pd
+
+    ratios = np.array(ratios, np.float64).reshape(-1, 4)
+    data = pd.DataFrame(
+        {
+            'Image': images,
+            'Object Name': object_names,
+            'Object Index': object_indexes,
+            'bx': ratios[:, 0],
+            'by': ratios[:, 1],
+            'bw': ratios[:, 2],
+            'bh': ratios[:, 3],
+            'Score': np.array(scores, np.float64),
+        }
+    )
+    if proposed is not None:
+        data['Proposed'] = np.array(proposed, np.bool_)
+    return data
+
+
+class AnnotationJournal:
+    """
+    Append-only journal of bounding box additions / deletions, written and
+    fsync'd in small batches by a background thread and periodically
+    compacted into a snapshot of the whole session. The snapshot is a
+    private npz file rather than the session file, which may not exist yet
+    or be in a format that does not keep rows and scores.
+    """
+
+    def __init__(self, directory=JOURNAL_DIR, batch_size=256, interval=0.5):
+        """
+        Initialize journal locations.
+        Args:
+            directory: Folder of the journal, snapshot and lock files.
+            batch_size: Maximum number of operations written per fsync.
+            interval: Maximum delay in seconds before queued operations are
+                written.
+        """
+        self.directory = directory
+        self.journal_file = os.path.join(directory, 'journal.jsonl')
+        self.snapshot_file = os.path.join(directory, 'snapshot.npz')
+        self.lock_file = os.path.join(directory, 'session.lock')
+        self.batch_size = batch_size
+        self.interval = interval
+        self.operations = Queue()
+        self.sequence = 0
+        self.pending = 0
+        self.writer = None
+
+    def locked_by_other(self):
+        """
+        Return:
+            True if another running process uses this journal.
+        """
+        try:
+            with open(self.lock_file) as lock:
+                pid = int(lock.read() or 0)
+        except (OSError, ValueError):
+            return False
+        if pid in (0, os.getpid()):
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def needs_recovery(self):
+        """
+        Return:
+            True if the previous session did not exit cleanly.
+        """
+        return os.path.exists(self.lock_file) and not self.locked_by_other()
+
+    def recover(self, store):
+        """
+        Load the last snapshot into a store and replay the journal after it.
+        Args:
+            store: AnnotationStore instance.
+
+        Return:
+            Number of replayed operations.
+        """
+        sequence = 0
+        if os.path.exists(self.snapshot_file):
+            with np.load(self.snapshot_file) as snapshot:
+                sequence = int(snapshot['sequence'])
+                store.restore({key: snapshot[key] for key in snapshot.files})
+        replayed = 0
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file) as journal:
+                for line in journal:
+                    try:
+                        operation_sequence, operation = json.loads(line)
+                    except ValueError:
+                        break
+                    if operation_sequence <= sequence:
+                        continue
+                    if operation[0] == 'add':
+                        store.append(*operation[2:])
+                    if operation[0] == 'extend':
+                        store.extend(extend_frame(*operation[2:]))
+                    if operation[0] == 'delete':
+                        store.delete(operation[1])
+                    if operation[0] == 'accept':
+                        store.accept(operation[1])
+                    if operation[0] == 'clear':
+                        store.clear()
+                    sequence = operation_sequence
+                    replayed += 1
+        self.sequence = sequence
+        return replayed
+
+    def start(self):
+        """
+        Mark the session as running and start the writer thread.
+
+        Return:
+            None
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.lock_file, 'w') as lock:
+            lock.write(f'{os.getpid()}')
+        self.writer = threading.Thread(target=self.write_operations, daemon=True)
+        self.writer.start()
+
+    def record(self, operation):
+        """
+        Queue an operation for writing, it is serialized by the writer
+        thread.
+        Args:
+            operation: ['add', row, *values], ['extend', first row, images,
+                object names, object indexes, ratios, scores, proposed] where
+                columns
+                are numpy arrays, ['delete', rows], ['accept', rows] or
+                ['clear']
+
+        Return:
+            None
+        """
+        self.sequence += 1
+        self.pending += 1
+        self.operations.put([self.sequence, operation])
+
+    def compact(self, store):
+        """
+        Queue a snapshot of the store, the writer thread saves it and then
+        truncates the journal.
+        Args:
+            store: AnnotationStore instance.
+
+        Return:
+            None
+        """
+        snapshot = {name: array.copy() for name, array in store.snapshot().items()}
+        self.pending = 0
+        self.operations.put({'sequence': self.sequence, 'snapshot': snapshot})
+
+    def write_snapshot(self, sequence, snapshot):
+        """
+        Save a snapshot atomically (writer thread).
+        Args:
+            sequence: Sequence of the last operation in the snapshot.
+            snapshot: dict of name -> numpy array returned by
+                AnnotationStore.snapshot()
+
+        Return:
+            None
+        """
+        temp = f'{self.snapshot_file}.tmp'
+        with open(temp, 'wb') as output:
+            np.savez(output, sequence=sequence, **snapshot)
+            output.flush()
+            os.fsync(output.fileno())
+        os.replace(temp, self.snapshot_file)
+
+    def write_operations(self):
+        """
+        Append queued operations to the journal (writer thread).
+
+        Return:
+            None
+        """
+        with open(self.journal_file, 'a') as journal:
+            while True:
+                try:
+                    batch = [self.operations.get(timeout=self.interval)]
+                except Empty:
+                    continue
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.operations.get_nowait())
+                    except Empty:
+                        break
+                stop = False
+                for item in batch:
+                    if isinstance(item, dict):
+                        # Operations up to the snapshot are written before it.
+                        journal.flush()
+                        os.fsync(journal.fileno())
+                        self.write_snapshot(item['sequence'], item['snapshot'])
+                        journal.truncate(0)
+                    elif item is StopIteration:
+                        stop = True
+                    else:
+                        journal.write(json.dumps(item, default=to_list) + '\n')
+                journal.flush()
+                os.fsync(journal.fileno())
+                if stop:
+                    return
+
+    def close(self, store):
+        """
+        Compact the journal, wait for the writer thread to save the
+        snapshot and mark a clean exit.
+        Args:
+            store: AnnotationStore instance.
+
+        Return:
+            None
+        """
+        if not self.writer:
+            return
+        self.compact(store)
+        self.operations.put(StopIteration)
+        self.writer.join()
+        self.writer = None
+        os.remove(self.lock_file)
@@ -1,4 +1,7 @@
-from PyQt5.QtGui import QIcon, QPixmap, QPainter, QPen
+from startup import profile_startup
+
+PROFILER = profile_startup()
+from PyQt5.QtGui import QIcon, QPixmap, QPainter, QPen, QRegion
 from PyQt5.QtWidgets import (
     QMainWindow,
     QApplication,
@@ -10,22 +13,37 @@ from PyQt5.QtWidgets import (
     QWidget,
     QLabel,
     QListWidget,
+    QListView,
     QFileDialog,
     QFrame,
     QLineEdit,
     QListWidgetItem,
     QDockWidget,
     QMessageBox,
+    QInputDialog,
+    QProgressDialog,
+)
+from PyQt5.QtCore import Qt, QPoint, QRect, QRectF, QSize, QTimer
+from settings import setup_toolbar
+from pixmap_cache import PixmapCache
+from annotations import AnnotationStore
+from prefetch import ImagePrefetcher
+from scanner import FolderScanner
+from models import CheckableListModel
+from geometry import (
+    as_boxes,
+    corners_to_ratios,
+    corners_to_xywh,
+    ratios_to_corners,
+    ratios_to_xywh,
+    valid_ratios,
 )
-from PyQt5.QtCore import Qt, QPoint, QRect
-from xml.etree.ElementTree import Element, SubElement
-from xml.etree import ElementTree
-from lxml import etree
-from settings import *
-import numpy as np
-import pandas as pd
-import imagesize
-import cv2
+from tiles import TileView, TileLoader, is_large, read_size
+from thumbnails import ThumbnailCache
+from tracing import TRACER, traced, slot, dump_trace
+from catalog import Catalog, CATALOG_FILE
+from journal import AnnotationJournal, JOURNAL_DIR
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import os
 
@@ -46,6 +64,10 @@ class RegularImageArea(QLabel):
         self.setFrameStyle(QFrame.StyledPanel)
         self.current_image = current_image
         self.main_window = main_window
+        self.boxes = as_boxes([])
+        self.tiles = None
+        self.pan_start = None
+        self.set_tiles()
 
     def get_image_names(self):
         """
@@ -53,11 +75,12 @@ class RegularImageArea(QLabel):
             Directory of the current image and the image name.
         """
         full_name = self.current_image.split('/')
-        return '/'.join(full_name[:-1]), full_name[-1].replace('temp-', '')
+        return '/'.join(full_name[:-1]), full_name[-1]
 
+    @traced()
     def paintEvent(self, event):
         """
-        Adjust image size to current window.
+        Adjust image size to current window and draw the bounding boxes overlay.
         Args:
             event: QPaintEvent object.
 
@@ -65,13 +88,87 @@ class RegularImageArea(QLabel):
             None
         """
         painter = QPainter(self)
+        self.draw_image(painter)
+
+    def draw_image(self, painter):
+        """
+        Draw the scaled image or its visible tiles and the bounding boxes.
+        Args:
+            painter: QPainter object.
+
+        Return:
+            None
+        """
         current_size = self.size()
         origin = QPoint(0, 0)
-        if self.current_image:
-            scaled_image = QPixmap(self.current_image).scaled(
-                current_size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation
+        if self.tiles:
+            self.draw_tiles(painter)
+            self.draw_overlay(painter)
+        elif self.current_image:
+            scaled_image = self.main_window.pixmap_cache.get(
+                self.current_image, current_size
             )
             painter.drawPixmap(origin, scaled_image)
+            self.draw_overlay(painter)
+
+    def draw_tiles(self, painter):
+        """
+        Draw the visible tiles of a large image, tiles that are not decoded
+        yet are replaced by the matching part of a cached coarser tile.
+        Args:
+            painter: QPainter object.
+
+        Return:
+            None
+        """
+        view, loader = self.tiles, self.main_window.tile_loader
+        visible = view.visible_tiles(self.width(), self.height())
+        overview = (view.levels - 1, 0, 0)
+        loader.tile(view, *overview)
+        for level, column, row in visible:
+            pixmap = loader.tile(view, level, column, row)
+            parent = 0
+            while pixmap is None and level + parent < view.levels - 1:
+                parent += 1
+                pixmap = loader.cached_tile(
+                    view, level + parent, column >> parent, row >> parent
+                )
+            if pixmap is None:
+                continue
+            x, y, w, h = view.tile_rect(level, column, row)
+            parent_x, parent_y, _, _ = view.tile_rect(
+                level + parent, column >> parent, row >> parent
+            )
+            scale = 2 ** (level + parent)
+            x1, y1, x2, y2 = view.to_widget([x, y, x + w, y + h]).tolist()
+            painter.drawPixmap(
+                QRectF(x1, y1, x2 - x1, y2 - y1),
+                pixmap,
+                QRectF(
+                    (x - parent_x) / scale, (y - parent_y) / scale, w / scale, h / scale
+                ),
+            )
+        loader.cancel(view, [*visible, overview])
+
+    def draw_overlay(self, painter):
+        """
+        Draw bounding boxes in self.boxes over the displayed image.
+        Args:
+            painter: QPainter object.
+
+        Return:
+            None
+        """
+        if not len(self.boxes):
+            return
+        pen = QPen(Qt.blue)
+        pen.setWidth(2)
+        painter.setPen(pen)
+        corners = ratios_to_corners(self.boxes, *self.image_size())
+        rectangles = corners_to_xywh(self.to_widget(corners))
+        painter.drawRects(
+            [QRect(*rectangle) for rectangle in rectangles.astype(int).tolist()]
+        )
 
     def switch_image(self, img):
         """
@@ -83,8 +180,127 @@ class RegularImageArea(QLabel):
             None
         """
         self.current_image = img
+        self.boxes = as_boxes([])
+        self.set_tiles()
         self.repaint()
 
+    def set_tiles(self):
+        """
+        Display the current image in tiles if it is large.
+
+        Return:
+            None
+        """
+        self.tiles = None
+        if self.current_image and is_large(self.current_image):
+            self.tiles = TileView(self.current_image, *read_size(self.current_image))
+            self.tiles.fit(self.width(), self.height())
+            self.main_window.tile_loader.open(self.tiles)
+
+    def image_size(self):
+        """
+        Return:
+            (width, height) of the space bounding boxes are relative to, the
+            full resolution of tiled images or the widget otherwise.
+        """
+        if self.tiles:
+            return self.tiles.width, self.tiles.height
+        return self.width(), self.height()
+
+    def to_image(self, corners):
+        """
+        Map widget coordinates to image_size() coordinates.
+        Args:
+            corners: Array of [[x1, y1, x2, y2], ...]
+
+        Return:
+            numpy array of the same shape.
+        """
+        if self.tiles:
+            return self.tiles.to_image(corners)
+        return as_boxes(corners)
+
+    def to_widget(self, corners):
+        """
+        Map image_size() coordinates to widget coordinates.
+        Args:
+            corners: Array of [[x1, y1, x2, y2], ...]
+
+        Return:
+            numpy array of the same shape.
+        """
+        if self.tiles:
+            return self.tiles.to_widget(corners)
+        return as_boxes(corners)
+
+    def resizeEvent(self, event):
+        """
+        Keep a tiled image fitted to the widget unless zoomed in.
+        Args:
+            event: QResizeEvent object.
+
+        Return:
+            None
+        """
+        if self.tiles and self.tiles.zoom <= self.tiles.min_zoom:
+            self.tiles.fit(self.width(), self.height())
+        super().resizeEvent(event)
+
+    def wheelEvent(self, event):
+        """
+        Zoom a tiled image around the cursor.
+        Args:
+            event: QWheelEvent object.
+
+        Return:
+            None
+        """
+        if not self.tiles:
+            return super().wheelEvent(event)
+        self.tiles.zoom_at(
+            event.pos().x(), event.pos().y(), 1.25 ** (event.angleDelta().y() / 120)
+        )
+        self.update()
+
+    def mousePressEvent(self, event):
+        """
+        Start panning a tiled image with the right button.
+        Args:
+            event: QMouseEvent object.
+
+        Return:
+            None
+        """
+        if self.tiles and event.button() == Qt.RightButton:
+            self.pan_start = event.pos()
+
+    def mouseMoveEvent(self, event):
+        """
+        Pan a tiled image.
+        Args:
+            event: QMouseEvent object.
+
+        Return:
+            None
+        """
+        if self.tiles and self.pan_start is not None:
+            delta = event.pos() - self.pan_start
+            self.pan_start = event.pos()
+            self.tiles.pan(delta.x(), delta.y())
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        """
+        Stop panning.
+        Args:
+            event: QMouseEvent object.
+
+        Return:
+            None
+        """
+        if event.button() == Qt.RightButton:
+            self.pan_start = None
+
     @staticmethod
     def calculate_ratios(x1, y1, x2, y2, width, height):
         """
@@ -94,8 +310,8 @@ class RegularImageArea(QLabel):
             y1: Start y coordinate.
             x2: End x coordinate.
             y2: End y coordinate.
-            width: Bounding box width.
-            height: Bounding box height.
+            width: Image display space width.
+            height: Image display space height.
 
         Return:
             bx: Relative center x coordinate.
@@ -103,13 +319,7 @@ class RegularImageArea(QLabel):
             bw: Relative box width.
             bh: Relative box height.
         """
-        box_width = abs(x2 - x1)
-        box_height = abs(y2 - y1)
-        bx = 1 - ((width - min(x1, x2) + (box_width / 2)) / width)
-        by = 1 - ((height - min(y1, y2) + (box_height / 2)) / height)
-        bw = box_width / width
-        bh = box_height / height
-        return bx, by, bw, bh
+        return tuple(corners_to_ratios([x1, y1, x2, y2], width, height)[0].tolist())
 
     @staticmethod
     def ratios_to_coordinates(bx, by, bw, bh, width, height):
@@ -129,32 +339,20 @@ class RegularImageArea(QLabel):
             w: Bounding box width.
             h: Bounding box height.
         """
-        w, h = bw * width, bh * height
-        x, y = bx * width + (w / 2), by * height + (h / 2)
-        return x, y, w, h
+        return tuple(ratios_to_xywh([bx, by, bw, bh], width, height)[0].tolist())
 
+    @traced()
     def draw_boxes(self, ratios):
         """
         Draw boxes over the current image using given ratios.
         Args:
-            ratios: A list of [[bx, by, bw, bh], ...]
+            ratios: Array of [[bx, by, bw, bh], ...]
 
         Return:
             None
         """
-        img_dir, img_name = self.get_image_names()
-        to_label = cv2.imread(self.current_image)
-        to_label = cv2.resize(to_label, (self.width(), self.height()))
-        for bx, by, bw, bh in ratios:
-            x, y, w, h = self.ratios_to_coordinates(
-                bx, by, bw, bh, self.width(), self.height()
-            )
-            to_label = cv2.rectangle(
-                to_label, (int(x), int(y)), (int(x + w), int(y + h)), (255, 0, 0), 2
-            )
-        temp = f'{img_dir}/temp-{img_name}'
-        cv2.imwrite(f'{img_dir}/temp-{img_name}', to_label)
-        self.switch_image(temp)
+        self.boxes = as_boxes(ratios).copy()
+        self.update()
 
 
 class ImageEditorArea(RegularImageArea):
@@ -175,22 +373,79 @@ class ImageEditorArea(RegularImageArea):
         self.end_point = QPoint()
         self.begin = QPoint()
         self.end = QPoint()
+        self.backing = None
+
+    def band_rect(self):
+        """
+        Return:
+            QRect of the box being drawn.
+        """
+        return QRect(self.begin, self.end).normalized()
+
+    @staticmethod
+    def band_region(rectangle):
+        """
+        Get the pixels covered by the outline of a box drawn with a 2px pen.
+        Args:
+            rectangle: QRect object.
 
+        Return:
+            QRegion object.
+        """
+        outer = QRegion(rectangle.adjusted(-2, -2, 3, 3))
+        if rectangle.width() < 6 or rectangle.height() < 6:
+            return outer
+        return outer.subtracted(QRegion(rectangle.adjusted(2, 2, -1, -1)))
+
+    def render_backing(self):
+        """
+        Draw the image and bounding boxes to a pixmap that is copied to
+        the damaged parts of the widget while a box is drawn.
+
+        Return:
+            None
+        """
+        ratio = self.devicePixelRatioF()
+        self.backing = QPixmap(self.size() * ratio)
+        self.backing.setDevicePixelRatio(ratio)
+        self.backing.fill(self.palette().color(self.backgroundRole()))
+        painter = QPainter(self.backing)
+        self.draw_image(painter)
+        painter.end()
+
+    @traced()
     def paintEvent(self, event):
         """
-        Adjust image size to current window and draw bounding box.
+        Adjust image size to current window and draw bounding box, while a
+        box is drawn only the damaged region is copied from the backing
+        pixmap.
         Args:
             event: QPaintEvent object.
 
         Return:
             None
         """
-        super().paintEvent(event)
-        qp = QPainter(self)
+        if self.backing is None:
+            super().paintEvent(event)
+            painter = QPainter(self)
+        else:
+            if event.rect() == self.rect() or self.backing.size() != (
+                self.size() * self.backing.devicePixelRatio()
+            ):
+                self.render_backing()
+            ratio = self.backing.devicePixelRatio()
+            painter = QPainter(self)
+            for rectangle in event.region().rects():
+                x, y, w, h = rectangle.getRect()
+                painter.drawPixmap(
+                    QRectF(rectangle),
+                    self.backing,
+                    QRectF(x * ratio, y * ratio, w * ratio, h * ratio),
+                )
         pen = QPen(Qt.blue)
         pen.setWidth(2)
-        qp.setPen(pen)
-        qp.drawRect(QRect(self.begin, self.end))
+        painter.setPen(pen)
+        painter.drawRect(QRect(self.begin, self.end))
 
     def mousePressEvent(self, event):
         """
@@ -201,10 +456,13 @@ class ImageEditorArea(RegularImageArea):
         Return:
             None
         """
+        if event.button() != Qt.LeftButton:
+            return super().mousePressEvent(event)
         self.start_point = event.pos()
         self.begin = event.pos()
         self.end = event.pos()
-        self.update()
+        self.render_backing()
+        self.update(self.band_region(self.band_rect()))
 
     def mouseMoveEvent(self, event):
         """
@@ -215,8 +473,13 @@ class ImageEditorArea(RegularImageArea):
         Return:
             None
         """
+        if not event.buttons() & Qt.LeftButton:
+            return super().mouseMoveEvent(event)
+        previous = self.band_rect()
         self.end = event.pos()
-        self.update()
+        self.update(
+            self.band_region(previous).united(self.band_region(self.band_rect()))
+        )
 
     def mouseReleaseEvent(self, event):
         """
@@ -227,6 +490,8 @@ class ImageEditorArea(RegularImageArea):
         Return:
             None
         """
+        if event.button() != Qt.LeftButton:
+            return super().mouseReleaseEvent(event)
         self.begin = event.pos()
         self.end = event.pos()
         self.end_point = event.pos()
@@ -237,17 +502,14 @@ class ImageEditorArea(RegularImageArea):
             self.end_point.y(),
         )
         self.main_window.statusBar().showMessage(f'Start: {x1}, {y1}, End: {x2}, {y2}')
+        self.backing = None
         self.update()
         if self.current_image:
-            bx, by, bw, bh = self.calculate_ratios(
-                x1, y1, x2, y2, self.width(), self.height()
-            )
-            self.update_session_data(x1, y1, x2, y2)
-            current_label_index = self.main_window.get_current_selection('slabels')
-            if current_label_index is None or current_label_index < 0:
-                return
-            self.draw_boxes([[bx, by, bw, bh]])
+            ratios = self.update_session_data(x1, y1, x2, y2)
+            if ratios is not None:
+                self.draw_boxes([*self.boxes, ratios])
 
+    @traced()
     def update_session_data(self, x1, y1, x2, y2):
         """
         Add a row to session_data containing calculated ratios.
@@ -258,20 +520,21 @@ class ImageEditorArea(RegularImageArea):
             y2: End y coordinate.
 
         Return:
-            None
+            The added (bx, by, bw, bh) or None if no box was added.
         """
         current_label_index = self.main_window.get_current_selection('slabels')
         if current_label_index is None or current_label_index < 0:
             return
-        window_width, window_height = self.width(), self.height()
+        corners = self.to_image([[x1, y1, x2, y2]])[0].tolist()
+        ratios = self.calculate_ratios(*corners, *self.image_size())
+        if not valid_ratios(ratios).all():
+            return
         object_name = (
             self.main_window.right_widgets['Session Labels']
             .item(current_label_index)
             .text()
         )
-        bx, by, bw, bh = self.calculate_ratios(
-            x1, y1, x2, y2, window_width, window_height
-        )
+        bx, by, bw, bh = ratios
         data = [
             [
                 self.get_image_names()[1],
@@ -283,13 +546,9 @@ class ImageEditorArea(RegularImageArea):
                 bh,
             ]
         ]
-        to_add = pd.DataFrame(data, columns=self.main_window.session_data.columns)
-        self.main_window.session_data = pd.concat(
-            [self.main_window.session_data, to_add], ignore_index=True
-        )
-        self.main_window.add_to_list(
-            f'{data}', self.main_window.right_widgets['Image Label List']
-        )
+        row = self.main_window.annotations.append(*data[0])
+        self.main_window.right_widgets['Image Label List'].model().append_rows([row])
+        return ratios
 
 
 class ImageLabeler(QMainWindow):
@@ -297,22 +556,47 @@ class ImageLabeler(QMainWindow):
     Image labeling main interface.
     """
 
-    def __init__(self, window_title='labelpix', current_image_area=RegularImageArea):
+    def __init__(
+        self,
+        window_title='labelpix',
+        current_image_area=RegularImageArea,
+        pixmap_cache_bytes=512 * 1024**2,
+        journal_dir=JOURNAL_DIR,
+        compaction_interval=300,
+        catalog_location=CATALOG_FILE,
+    ):
         """
         Initialize main interface and display.
         Args:
             window_title: Title of the window.
             current_image_area: RegularImageArea or ImageEditorArea object.
+            pixmap_cache_bytes: Memory budget of decoded/scaled images shared
+                by the image areas.
+            journal_dir: Folder of the crash recovery journal, None disables
+                journaling.
+            compaction_interval: Seconds between journal compactions.
+            catalog_location: Path to the image catalog database, or
+                ':memory:' for a catalog that is not saved.
         """
         super().__init__()
         self.current_image = None
+        self.pixmap_cache = PixmapCache(pixmap_cache_bytes)
+        self.prefetcher = ImagePrefetcher(self.pixmap_cache)
+        self.tile_loader = TileLoader(self.pixmap_cache)
+        self.tile_loader.ready.connect(self.update_tiles)
+        self.thumbnails = ThumbnailCache()
+        self.frame_extractor = None
+        self.folder_scanner = None
+        self.duplicate_finder = None
+        self.prelabeler = None
+        self.propagator = None
+        self.catalog = Catalog(catalog_location)
+        self.catalog_updates = ThreadPoolExecutor(1)
         self.label_file = None
         self.current_image_area = current_image_area
         self.images = []
         self.image_paths = {}
-        self.session_data = pd.DataFrame(
-            columns=['Image', 'Object Name', 'Object Index', 'bx', 'by', 'bw', 'bh']
-        )
+        self.annotations = AnnotationStore()
         self.window_title = window_title
         self.setWindowTitle(self.window_title)
         win_rectangle = self.frameGeometry()
@@ -327,19 +611,126 @@ class ImageLabeler(QMainWindow):
         self.top_right_widgets = {'Add Label': (QLineEdit(), self.add_session_label)}
         self.right_widgets = {
             'Session Labels': QListWidget(),
-            'Image Label List': QListWidget(),
-            'Photo List': QListWidget(),
+            'Image Label List': QListView(),
+            'Photo List': QListView(),
         }
+        self.right_widgets['Image Label List'].setModel(
+            CheckableListModel(display=self.describe_annotation)
+        )
+        self.right_widgets['Photo List'].setModel(
+            CheckableListModel(
+                self.images, lambda path: path.split('/')[-1], self.thumbnails.get
+            )
+        )
+        self.right_widgets['Photo List'].setIconSize(
+            QSize(self.thumbnails.size, self.thumbnails.size)
+        )
+        self.right_widgets['Photo List'].setUniformItemSizes(True)
+        self.thumbnails.ready.connect(
+            self.right_widgets['Photo List'].model().refresh_decorations
+        )
         self.left_widgets = {'Image': self.current_image_area('', self)}
         self.setStatusBar(QStatusBar(self))
+        self.trace_summary = QLabel()
+        self.trace_timer = QTimer(self)
+        self.trace_timer.timeout.connect(self.update_trace_summary)
+        if TRACER:
+            self.statusBar().addPermanentWidget(self.trace_summary)
+            self.trace_timer.start(1000)
         self.adjust_tool_bar()
         self.central_widget = QWidget(self)
         self.main_layout = QHBoxLayout()
         self.left_layout = QVBoxLayout()
         self.adjust_widgets()
         self.adjust_layouts()
+        self.journal = None
+        self.compaction_timer = QTimer(self)
+        self.compaction_timer.timeout.connect(self.compact_journal)
+        if journal_dir:
+            self.start_journal(journal_dir, compaction_interval)
         self.show()
 
+    def start_journal(self, journal_dir, compaction_interval):
+        """
+        Recover session data after an unclean exit and start journaling.
+        Args:
+            journal_dir: Folder of the journal.
+            compaction_interval: Seconds between journal compactions.
+
+        Return:
+            None
+        """
+        journal = AnnotationJournal(journal_dir)
+        if journal.locked_by_other():
+            self.statusBar().showMessage(
+                'Another labelpix session is running, crash recovery is disabled'
+            )
+            return
+        if journal.needs_recovery():
+            replayed = journal.recover(self.annotations)
+            if len(self.annotations):
+                self.load_session_labels(self.session_data)
+                self.statusBar().showMessage(
+                    f'Recovered {len(self.annotations)} labels from an unclean exit '
+                    f'({replayed} journal operations replayed)'
+                )
+        journal.start()
+        journal.compact(self.annotations)
+        self.annotations.journal = self.journal = journal
+        self.compaction_timer.start(compaction_interval * 1000)
+
+    def compact_journal(self):
+        """
+        Compact the journal into a snapshot if it has new operations.
+
+        Return:
+            None
+        """
+        if self.journal and self.journal.pending:
+            self.journal.compact(self.annotations)
+
+    def update_tiles(self, path):
+        """
+        Repaint the image area when tiles of the displayed image are decoded.
+        Args:
+            path: Path to image.
+
+        Return:
+            None
+        """
+        if self.left_widgets['Image'].current_image == path:
+            self.left_widgets['Image'].update()
+
+    @property
+    def session_data(self):
+        """
+        Return:
+            A DataFrame view of the current session bounding boxes.
+        """
+        return self.annotations.to_frame()
+
+    @session_data.setter
+    def session_data(self, data):
+        """
+        Replace the current session bounding boxes.
+        Args:
+            data: pandas DataFrame with the session data columns.
+
+        Return:
+            None
+        """
+        self.annotations.replace(data)
+
+    def update_trace_summary(self):
+        """
+        Show the latency percentiles of the slowest traced spans in the
+        status bar.
+
+        Return:
+            None
+        """
+        self.trace_summary.setText(TRACER.summary())
+
     def adjust_tool_bar(self):
         """
         Adjust the top tool bar and setup buttons/icons.
@@ -365,7 +756,7 @@ class ImageLabeler(QMainWindow):
                 action.setCheckable(True)
             if label == 'Delete':
                 action.setShortcut('Backspace')
-            action.triggered.connect(widget_method)
+            action.triggered.connect(slot(widget_method))
             self.tools.addAction(action)
             self.tools.addSeparator()
 
@@ -397,7 +788,7 @@ class ImageLabeler(QMainWindow):
                 widget.editingFinished.connect(widget_method)
         self.top_right_widgets['Add Label'][0].setPlaceholderText('Add Label')
         self.right_widgets['Photo List'].selectionModel().currentChanged.connect(
-            self.display_selection
+            slot(self.display_selection)
         )
         for text, widget in self.right_widgets.items():
             dock_widget = QDockWidget(text)
@@ -415,7 +806,7 @@ class ImageLabeler(QMainWindow):
             Image path or current row.
         """
         if display_list == 'photo':
-            current_selection = self.right_widgets['Photo List'].currentRow()
+            current_selection = self.right_widgets['Photo List'].currentIndex().row()
             if current_selection >= 0:
                 return self.images[current_selection]
             self.right_widgets['Photo List'].selectionModel().clear()
@@ -446,6 +837,47 @@ class ImageLabeler(QMainWindow):
         widget_list.addItem(item)
         widget_list.selectionModel().clear()
 
+    def add_images(self, paths):
+        """
+        Add a batch of images to the right photo list.
+        Args:
+            paths: A list of image paths.
+
+        Return:
+            None
+        """
+        duplicates = 0
+        for path in paths:
+            image_dir, photo_name = '/'.join(path.split('/')[:-1]), path.split('/')[-1]
+            if self.image_paths.get(photo_name, image_dir) != image_dir:
+                duplicates += 1
+            self.image_paths[photo_name] = image_dir
+        self.right_widgets['Photo List'].model().append_rows(paths)
+        self.catalog_updates.submit(self.catalog.refresh, list(paths))
+        if duplicates:
+            self.statusBar().showMessage(
+                f'{duplicates} photo(s) have the same name as photos from another '
+                f'folder, their labels are shared'
+            )
+
+    def describe_annotation(self, row):
+        """
+        Get the displayed text of a bounding box in the Image Label List.
+        Args:
+            row: Annotation row.
+
+        Return:
+            str : [[image, object name, object index, bx, by, bw, bh]] followed
+            by the confidence of proposed boxes.
+        """
+        score = self.annotations.scores[row]
+        if self.annotations.proposed[row]:
+            return f'{self.annotations.records([row])} proposed {score:.2f}'
+        if score == score:
+            return f'{self.annotations.records([row])} {score:.2f}'
+        return f'{self.annotations.records([row])}'
+
+    @traced()
     def display_selection(self):
         """
         Display image that is selected in the right Photo list.
@@ -453,21 +885,21 @@ class ImageLabeler(QMainWindow):
         Return:
             None
         """
-        ratios = []
-        self.right_widgets['Image Label List'].clear()
+        label_list = self.right_widgets['Image Label List'].model()
+        label_list.set_rows([])
         self.current_image = self.get_current_selection('photo')
         if not self.current_image:
             return
         self.left_widgets['Image'].switch_image(self.current_image)
+        self.prefetcher.prefetch(
+            self.images,
+            self.right_widgets['Photo List'].currentIndex().row(),
+            self.left_widgets['Image'].size(),
+        )
         image_dir, img_name = self.left_widgets['Image'].get_image_names()
-        for item in self.session_data.loc[
-            self.session_data['Image'] == img_name
-        ].values:
-            self.add_to_list(
-                f'{[[x for x in item]]}', self.right_widgets['Image Label List']
-            )
-            ratios.append([x for x in item][3:])
-        self.left_widgets['Image'].draw_boxes(ratios)
+        rows = self.annotations.rows(img_name)
+        label_list.set_rows(rows.tolist())
+        self.left_widgets['Image'].draw_boxes(self.annotations.ratios[rows])
 
     def upload_photos(self):
         """
@@ -478,17 +910,52 @@ class ImageLabeler(QMainWindow):
         """
         file_dialog = QFileDialog()
         file_names, _ = file_dialog.getOpenFileNames(self, 'Upload Photos')
-        for file_name in file_names:
-            image_dir, photo_name = (
-                '/'.join(file_name.split('/')[:-1]),
-                file_name.split('/')[-1],
-            )
-            self.add_to_list(photo_name, self.right_widgets['Photo List'])
-            self.images.append(file_name)
-            self.image_paths[photo_name] = image_dir
+        self.add_images(file_names)
+        self.right_widgets['Photo List'].selectionModel().clear()
 
     def upload_vid(self):
-        pass
+        """
+        Convert a video to .png frames and add them to the right photo list
+        while they are being written.
+
+        Return:
+            None
+        """
+        file_dialog = QFileDialog()
+        file_name, _ = file_dialog.getOpenFileName(self, 'Upload video')
+        if not file_name:
+            return
+        fps, ok = QInputDialog.getDouble(
+            self, 'Upload video', 'Frames per second to extract (0 = all frames)', 0, 0
+        )
+        if not ok:
+            return
+        from video import FrameExtractor
+
+        extractor = FrameExtractor(
+            file_name, f'{os.path.splitext(file_name)[0]}-frames', fps=fps or None
+        )
+        progress = QProgressDialog('Extracting frames', 'Cancel', 0, 0, self)
+        progress.setWindowTitle('Upload video')
+        progress.canceled.connect(extractor.cancel)
+        extractor.frames_ready.connect(self.add_images)
+        extractor.progress.connect(
+            lambda done, total: (progress.setMaximum(total), progress.setValue(done))
+        )
+        extractor.progress.connect(
+            lambda done, total: self.statusBar().showMessage(
+                f'Extracting frames: {done}/{total} read, {len(self.images)} photos'
+            )
+        )
+        extractor.finished.connect(progress.reset)
+        extractor.finished.connect(
+            lambda count: self.statusBar().showMessage(
+                f'Extracted {count} frames from {file_name}'
+            )
+        )
+        self.frame_extractor = extractor
+        progress.show()
+        extractor.start()
 
     def upload_folder(self):
         """
@@ -499,13 +966,227 @@ class ImageLabeler(QMainWindow):
         """
         file_dialog = QFileDialog()
         folder_name = file_dialog.getExistingDirectory()
-        if folder_name:
-            for file_name in os.listdir(folder_name):
-                if not file_name.startswith('.'):
-                    photo_name = file_name.split('/')[-1]
-                    self.add_to_list(photo_name, self.right_widgets['Photo List'])
-                    self.images.append(f'{folder_name}/{file_name}')
-                    self.image_paths[file_name] = folder_name
+        if not folder_name:
+            return
+        pattern, ok = QInputDialog.getText(
+            self,
+            'Upload Photo Folder',
+            'Image name pattern(s) separated by ; (prefix with **/ to include '
+            'subfolders)',
+            text='*',
+        )
+        if not ok:
+            return
+        recursive = pattern.startswith('**/')
+        if recursive:
+            pattern = pattern[3:]
+        patterns = [item.strip() for item in pattern.split(';') if item.strip()]
+        if self.folder_scanner:
+            self.folder_scanner.cancel()
+        scanner = FolderScanner(folder_name, recursive, patterns)
+        scanner.found.connect(self.add_images)
+        scanner.found.connect(
+            lambda paths: self.statusBar().showMessage(
+                f'Scanning {folder_name}: {len(self.images)} photos'
+            )
+        )
+        scanner.finished.connect(
+            lambda count: self.statusBar().showMessage(
+                f'Added {count} photos from {folder_name}'
+            )
+        )
+        self.folder_scanner = scanner
+        scanner.start()
+
+    def find_duplicates(self):
+        """
+        Check photos that are near-duplicates of earlier photos in the right
+        photo list, so they can be skipped or deleted.
+
+        Return:
+            None
+        """
+        if not self.images:
+            return
+        from dedupe import DuplicateFinder
+
+        if self.duplicate_finder:
+            self.duplicate_finder.cancel()
+        finder = DuplicateFinder(self.images, self.catalog)
+        finder.progress.connect(
+            lambda done, total: self.statusBar().showMessage(
+                f'Hashing photos: {done}/{total}'
+            )
+        )
+        finder.finished.connect(self.check_duplicates)
+        self.duplicate_finder = finder
+        finder.start()
+
+    def prelabel(self):
+        """
+        Propose bounding boxes for the photos in the right photo list with an
+        ONNX detector, proposals can be reviewed and deleted like drawn boxes.
+
+        Return:
+            None
+        """
+        if not self.images:
+            return
+        file_dialog = QFileDialog()
+        model, _ = file_dialog.getOpenFileName(
+            self, 'Pre-label', filter='ONNX models (*.onnx)'
+        )
+        if not model:
+            return
+        confidence, ok = QInputDialog.getDouble(
+            self, 'Pre-label', 'Confidence threshold', 0.5, 0.01, 1, 2
+        )
+        if not ok:
+            return
+        from prelabel import Detector, PreLabeler
+        import cv2
+
+        try:
+            detector = Detector(model, confidence=confidence)
+        except cv2.error as error:
+            QMessageBox.warning(self, 'Pre-label', f'Cannot load {model}: {error}')
+            return
+        if self.prelabeler:
+            self.prelabeler.cancel()
+        labeler = PreLabeler(self.images, detector)
+        labeler.proposals.connect(self.store_proposals)
+        labeler.progress.connect(
+            lambda done, total: self.statusBar().showMessage(
+                f'Pre-labeling: {done}/{total} photos'
+            )
+        )
+        labeler.finished.connect(
+            lambda stats: self.statusBar().showMessage(
+                stats['error']
+                or f'Proposed {stats["boxes"]} boxes for {stats["images"]} photos '
+                f'({stats["images_per_second"]:.1f} photos/s)'
+            )
+        )
+        self.prelabeler = labeler
+        labeler.start()
+
+    def propagate(self):
+        """
+        Track the bounding boxes of the current photo through the next photos
+        of the right photo list and add them as proposals.
+
+        Return:
+            None
+        """
+        if not self.current_image:
+            return
+        image_name = self.left_widgets['Image'].get_image_names()[1]
+        rows = self.annotations.rows(image_name)
+        if not len(rows):
+            self.statusBar().showMessage(f'{image_name} has no labels to propagate')
+            return
+        current_row = self.right_widgets['Photo List'].currentIndex().row()
+        count, ok = QInputDialog.getInt(
+            self,
+            'Propagate',
+            'Number of next photos',
+            10,
+            1,
+            max(1, len(self.images) - current_row - 1),
+        )
+        if not ok:
+            return
+        from propagate import BoxPropagator
+
+        if self.propagator:
+            self.propagator.cancel()
+        propagator = BoxPropagator(
+            self.current_image,
+            self.images[current_row + 1 : current_row + 1 + count],
+            self.annotations.ratios[rows],
+            [
+                self.annotations.label_names[code]
+                for code in self.annotations.label_codes[rows]
+            ],
+        )
+        propagator.proposals.connect(self.store_proposals)
+        propagator.progress.connect(
+            lambda done, total: self.statusBar().showMessage(
+                f'Propagating labels: {done}/{total} photos'
+            )
+        )
+        propagator.finished.connect(
+            lambda stats: self.statusBar().showMessage(
+                f'Propagated {stats["boxes"]} boxes through {stats["frames"]} photos '
+                f'({stats["frames_per_second"]:.1f} photos/s)'
+            )
+        )
+        self.propagator = propagator
+        propagator.start()
+
+    def store_proposals(self, proposals):
+        """
+        Add proposed bounding boxes to the session, unknown class names are
+        added to the session labels and boxes that are already in the
+        session are skipped.
+        Args:
+            proposals: A list of (path, ratios, scores, class names) per image.
+
+        Return:
+            None
+        """
+        from session_io import new_rows
+        import pandas as pd
+        import numpy as np
+
+        proposals = [proposal for proposal in proposals if len(proposal[2])]
+        if not proposals:
+            return
+        names = [name for *_, image_names in proposals for name in image_names]
+        for name in dict.fromkeys(names):
+            self.add_session_label(name)
+        labels = self.right_widgets['Session Labels']
+        label_indexes = {labels.item(i).text(): i for i in range(labels.count())}
+        ratios = np.concatenate([proposal[1] for proposal in proposals])
+        data = pd.DataFrame(
+            {
+                'Image': np.repeat(
+                    [path.split('/')[-1] for path, *_ in proposals],
+                    [len(proposal[2]) for proposal in proposals],
+                ),
+                'Object Name': names,
+                'Object Index': [label_indexes[name] for name in names],
+                'bx': ratios[:, 0],
+                'by': ratios[:, 1],
+                'bw': ratios[:, 2],
+                'bh': ratios[:, 3],
+                'Score': np.concatenate([proposal[2] for proposal in proposals]),
+                'Proposed': True,
+            }
+        )
+        self.annotations.extend(new_rows(self.session_data, data))
+        if self.current_image in {path for path, *_ in proposals}:
+            self.display_selection()
+
+    def check_duplicates(self, paths):
+        """
+        Check near-duplicate photos in the right photo list.
+        Args:
+            paths: A list of image paths.
+
+        Return:
+            None
+        """
+        self.duplicate_finder = None
+        model = self.right_widgets['Photo List'].model()
+        duplicates = set(paths)
+        model.check_rows(
+            [row for row, path in enumerate(self.images) if path in duplicates]
+        )
+        self.statusBar().showMessage(
+            f'Checked {len(paths)} near-duplicate photos, press Delete Selection(s) '
+            f'to remove them'
+        )
 
     def switch_editor(self, image_area):
         """
@@ -537,62 +1218,91 @@ class ImageLabeler(QMainWindow):
 
     def save_session_data(self, location):
         """
-        Save session data to csv/hdf.
+        Save session data to csv/hdf/parquet/feather.
         Args:
             location: Path to save session data file.
 
         Return:
             None
         """
-        if location.endswith('.csv'):
-            self.session_data.to_csv(location, index=False)
-        if location.endswith('h5'):
-            self.session_data.to_hdf(location, key='session_data', index=False)
+        from session_io import save_session
+
+        save_session(self.session_data, location)
 
     def read_session_data(self, location):
         """
-        Read session data from csv/hdf
+        Read session data from csv/hdf/parquet/feather/COCO json, boxes of
+        sessions saved before bx / by held box centers are converted.
         Args:
             location: Path to session data file.
 
         Return:
             data.
         """
-        data = self.session_data
-        if location.endswith('.csv'):
-            data = pd.read_csv(location)
-        if location.endswith('.h5'):
-            data = pd.read_hdf(location, 'session_data')
+        from session_io import convert_legacy_centers, read_session, session_version
+
+        data = read_session(location)
+        if data is None:
+            return self.session_data
+        if session_version(location) == 1:
+            data = convert_legacy_centers(data)
         return data
 
+    def reviewed_data(self):
+        """
+        Get session data without proposed boxes that were not accepted, so
+        they are not exported as ground truth.
+
+        Return:
+            pandas DataFrame with session data columns.
+        """
+        from session_io import unreviewed
+
+        data = self.session_data
+        return data[~unreviewed(data)]
+
+    @traced()
     def save_changes_table(self):
         """
-        Save the data in self.session_data to new/existing csv/hdf format.
+        Save the data in self.session_data to new/existing csv/hdf/parquet/feather
+        format or COCO json.
 
         Return:
             None
         """
         dialog = QFileDialog()
         location, _ = dialog.getSaveFileName(self, 'Save as')
+        if location.endswith('.json'):
+            self.save_changes_coco(location)
+            return
         self.label_file = location
         self.save_session_data(location)
         self.statusBar().showMessage(f'Labels Saved to {location}')
 
-    def clear_yolo_txt(self):
+    @traced()
+    def save_changes_coco(self, location):
         """
-        Delete txt files in working directories.
+        Save session data of the uploaded photos to a COCO json file.
+        Args:
+            location: Path to json file.
 
         Return:
             None
         """
-        working_directories = set(
-            ['/'.join(item.split('/')[:-1]) for item in self.images]
+        from coco import export_coco
+
+        data = self.reviewed_data()
+        data = data[data['Image'].isin(list(self.image_paths))]
+        paths = [f'{self.image_paths[image]}/{image}' for image in set(data['Image'])]
+        stats = export_coco(
+            data, self.image_paths, location, self.catalog.dimensions(paths)
+        )
+        self.statusBar().showMessage(
+            f'Saved {stats["boxes"]} boxes to {location} '
+            f'({stats["seconds"]:.2f} seconds)' + self.describe_skipped(stats)
         )
-        for working_directory in working_directories:
-            for file_name in os.listdir(working_directory):
-                if file_name.endswith('.txt'):
-                    os.remove(f'{working_directory}/{file_name}')
 
+    @traced()
     def save_changes_yolo(self):
         """
         Save session data to txt files in yolo format.
@@ -600,71 +1310,19 @@ class ImageLabeler(QMainWindow):
         Return:
             None
         """
-        if self.session_data.empty:
-            return
-        self.clear_yolo_txt()
-        txt_file_names = set()
-        for index, data in self.session_data.iterrows():
-            image_name, object_name, object_index, bx, by, bw, bh = data
-            image_path = self.image_paths[image_name]
-            txt_file_name = f'{image_path}/{image_name.split(".")[0]}.txt'
-            txt_file_names.add(txt_file_name)
-            with open(txt_file_name, 'a') as txt:
-                txt.write(f'{object_index!s} {bx!s} {by!s} {bw!s} {bh!s}\n')
-            self.statusBar().showMessage(f'Saved {len(txt_file_names)} txt files')
+        from exporters import export_yolo, remove_labels
 
-    @staticmethod
-    def generate_xml_file(full_path, image_size, obj_data, out_file):
-        """
-        Generate XML label file.
-        Args:
-            full_path: Path to image.
-            image_size: Size of the image.
-            obj_data: object coordinates and object name
-            out_file: output xml file.
-
-        Return:
-            None
-        """
-        path_contents = os.path.split(full_path)
-        folder_name, file_name = path_contents[-2], path_contents[-1]
-        w, h = image_size
-        top = Element('annotation')
-        folder = SubElement(top, 'folder')
-        folder.text = folder_name
-        image_name = SubElement(top, 'filename')
-        image_name.text = file_name
-        path_item = SubElement(top, 'path')
-        path_item.text = full_path
-        size = SubElement(top, 'size')
-        width = SubElement(size, 'width')
-        width.text = f'{w}'
-        height = SubElement(size, 'height')
-        height.text = f'{h}'
-        depth = SubElement(size, 'depth')
-        depth.text = f'{3}'
-        for item in obj_data:
-            x_min, y_min, x_max, y_max, object_name = item
-            object_item = SubElement(top, 'object')
-            name = SubElement(object_item, 'name')
-            name.text = object_name
-            box = SubElement(object_item, 'bndbox')
-            x0 = SubElement(box, 'xmin')
-            x0.text = f'{x_min}'
-            y0 = SubElement(box, 'ymin')
-            y0.text = f'{y_min}'
-            x1 = SubElement(box, 'xmax')
-            x1.text = f'{x_max}'
-            y1 = SubElement(box, 'ymax')
-            y1.text = f'{y_max}'
-        rough_string = ElementTree.tostring(top, 'utf8')
-        root = etree.fromstring(rough_string)
-        pretty = etree.tostring(root, pretty_print=True, encoding='utf-8').replace(
-            "  ".encode(), "\t".encode()
-        )
-        with open(out_file, 'wb') as output:
-            output.write(pretty)
+        data = self.reviewed_data()
+        if data.empty:
+            return
+        stats = export_yolo(data, self.image_paths, jobs=4)
+        remove_labels(self.images, set(data['Image']), '.txt')
+        self.statusBar().showMessage(
+            f'Saved {stats["files"]} txt files '
+            f'({stats["files_per_second"]:.0f} files/s)'
+        )
 
+    @traced()
     def save_changes_voc(self):
         """
         Save session data to xml voc format.
@@ -672,21 +1330,37 @@ class ImageLabeler(QMainWindow):
         Return:
             None
         """
-        groups = self.session_data.groupby('Image').apply(np.array)
-        for image, objects in groups.iteritems():
-            image_path = self.image_paths[image]
-            image_size = imagesize.get(os.path.join(image_path, image))
-            obj_data = []
-            for box in objects:
-                img, object_name, object_index, bx, by, bw, bh = box
-                x, y, w, h = self.left_widgets['Image'].ratios_to_coordinates(
-                    bx, by, bw, bh, *image_size
-                )
-                obj_data.append([x, y, x + w, y + h, object_name])
-            out = os.path.join(image_path, f'{image.split(".")[0]}.xml')
-            full_path = os.path.join(image_path, image)
-            self.generate_xml_file(full_path, image_size, obj_data, out)
-            obj_data.clear()
+        from exporters import export_voc
+
+        data = self.reviewed_data()
+        if data.empty:
+            return
+        paths = [f'{self.image_paths[image]}/{image}' for image in set(data['Image'])]
+        stats = export_voc(
+            data, self.image_paths, image_sizes=self.catalog.dimensions(paths)
+        )
+        self.statusBar().showMessage(
+            f'Saved {stats["files"]} xml files '
+            f'({stats["files_per_second"]:.0f} files/s)' + self.describe_skipped(stats)
+        )
+
+    @staticmethod
+    def describe_skipped(stats):
+        """
+        Describe images left out of an export.
+        Args:
+            stats: A dictionary of export statistics.
+
+        Return:
+            Status bar message suffix, empty if no images were skipped.
+        """
+        if not stats['skipped']:
+            return ''
+        return (
+            f', skipped {len(stats["skipped"])} photos of unknown size '
+            f'({", ".join(os.path.basename(path) for path in stats["skipped"][:3])}'
+            f'{", ..." if len(stats["skipped"]) > 3 else ""})'
+        )
 
     @staticmethod
     def get_list_selections(widget_list):
@@ -698,6 +1372,8 @@ class ImageLabeler(QMainWindow):
         Return:
             A list of checked indexes.
         """
+        if isinstance(widget_list.model(), CheckableListModel):
+            return widget_list.model().checked_rows()
         items = [widget_list.item(i) for i in range(widget_list.count())]
         checked_indexes = [
             checked_index
@@ -706,6 +1382,7 @@ class ImageLabeler(QMainWindow):
         ]
         return checked_indexes
 
+    @traced()
     def delete_list_selections(self, checked_indexes, widget_list):
         """
         Delete checked indexes in the given QWidgetList.
@@ -716,30 +1393,42 @@ class ImageLabeler(QMainWindow):
         Return:
             None
         """
-        if checked_indexes:
+        if not checked_indexes:
+            return
+        if widget_list is self.right_widgets['Session Labels']:
             for q_list_index in reversed(checked_indexes):
-                if widget_list is self.right_widgets['Photo List']:
-                    image_name = self.images[q_list_index].split('/')[-1]
-                    del self.images[q_list_index]
-                    del self.image_paths[image_name]
-                if widget_list is self.right_widgets['Image Label List']:
-                    current_row = eval(
-                        f'{self.right_widgets["Image Label List"].item(q_list_index).text()}'
-                    )[0]
-                    row_items = dict(zip(self.session_data.columns, current_row))
-                    current_boxes = self.session_data.loc[
-                        self.session_data['Image'] == current_row[0]
-                    ]
-                    for index, box in current_boxes[
-                        ['bx', 'by', 'bw', 'bh']
-                    ].iterrows():
-                        if (
-                            box['bx'] == row_items['bx']
-                            and box['by'] == row_items['by']
-                        ):
-                            self.session_data = self.session_data.drop(index)
-                            break
                 widget_list.takeItem(q_list_index)
+            return
+        model = widget_list.model()
+        values = [model.rows[i] for i in checked_indexes]
+        if widget_list is self.right_widgets['Photo List']:
+            for image in values:
+                self.image_paths.pop(image.split('/')[-1], None)
+        if widget_list is self.right_widgets['Image Label List']:
+            self.annotations.delete(values)
+        model.remove_rows(checked_indexes)
+        if widget_list is self.right_widgets['Image Label List'] and self.current_image:
+            image_area = self.left_widgets['Image']
+            rows = self.annotations.rows(image_area.get_image_names()[1])
+            image_area.draw_boxes(self.annotations.ratios[rows])
+
+    def accept_proposals(self):
+        """
+        Accept the checked proposed boxes in the Image Label List, or all
+        proposed boxes of the current photo if none are checked, so they are
+        included in yolo, voc and COCO exports.
+
+        Return:
+            None
+        """
+        if not self.current_image:
+            return
+        label_list = self.right_widgets['Image Label List'].model()
+        checked = self.get_list_selections(self.right_widgets['Image Label List'])
+        rows = [label_list.rows[i] for i in checked] or list(label_list.rows)
+        accepted = self.annotations.accept(rows)
+        label_list.set_rows(list(label_list.rows))
+        self.statusBar().showMessage(f'Accepted {accepted} proposed boxes')
 
     def delete_selections(self):
         """
@@ -763,9 +1452,10 @@ class ImageLabeler(QMainWindow):
         )
         self.delete_list_selections(checked_photos, self.right_widgets['Photo List'])
 
+    @traced()
     def upload_labels(self):
         """
-        Upload labels from csv or hdf.
+        Upload labels from csv, hdf, parquet, feather or COCO json.
 
         Return:
             None
@@ -773,9 +1463,26 @@ class ImageLabeler(QMainWindow):
         dialog = QFileDialog()
         file_name, _ = dialog.getOpenFileName(self, 'Load labels')
         self.label_file = file_name
+        from session_io import new_rows
+
         new_data = self.read_session_data(file_name)
+        self.load_session_labels(new_data)
+        self.annotations.extend(new_rows(self.session_data, new_data))
+        self.display_selection()
+        if file_name:
+            self.statusBar().showMessage(f'Labels loaded from {file_name}')
+
+    def load_session_labels(self, data):
+        """
+        Replace session labels with the labels of the given session data.
+        Args:
+            data: pandas DataFrame with session data columns.
+
+        Return:
+            None
+        """
         labels_to_add = (
-            new_data[['Object Name', 'Object Index']]
+            data[['Object Name', 'Object Index']]
             .drop_duplicates()
             .sort_values(by='Object Index')
             .values
@@ -783,11 +1490,6 @@ class ImageLabeler(QMainWindow):
         self.right_widgets['Session Labels'].clear()
         for label, index in labels_to_add:
             self.add_session_label(label)
-        self.session_data = pd.concat(
-            [self.session_data, new_data], ignore_index=True
-        ).drop_duplicates()
-        if file_name:
-            self.statusBar().showMessage(f'Labels loaded from {file_name}')
 
     def reset_labels(self):
         """
@@ -803,7 +1505,8 @@ class ImageLabeler(QMainWindow):
             'Are you sure, do you want to delete all current session labels?',
         )
         if answer == message.Yes:
-            self.session_data.drop(self.session_data.index, inplace=True)
+            self.annotations.clear()
+            self.display_selection()
             self.statusBar().showMessage(f'Session labels deleted successfully')
 
     def display_settings(self):
@@ -826,19 +1529,6 @@ class ImageLabeler(QMainWindow):
             self.add_to_list(new_label, labels)
             self.top_right_widgets['Add Label'][0].clear()
 
-    def remove_temps(self):
-        """
-        Remove temporary image files from working directories.
-
-        Return:
-            None
-        """
-        working_dirs = set(['/'.join(item.split('/')[:-1]) for item in self.images])
-        for working_dir in working_dirs:
-            for file_name in os.listdir(working_dir):
-                if 'temp-' in file_name:
-                    os.remove(f'{working_dir}/{file_name}')
-
     def closeEvent(self, event):
         """
         Save session data, clear cache, and close with or without saving.
@@ -848,11 +1538,36 @@ class ImageLabeler(QMainWindow):
         Return:
             None
         """
-        self.remove_temps()
+        if self.frame_extractor:
+            self.frame_extractor.cancel()
+        if self.folder_scanner:
+            self.folder_scanner.cancel()
+        if self.duplicate_finder:
+            self.duplicate_finder.cancel()
+        if self.prelabeler:
+            self.prelabeler.cancel()
+        if self.propagator:
+            self.propagator.cancel()
+        if self.journal:
+            self.journal.close(self.annotations)
+        self.prefetcher.shutdown()
+        self.tile_loader.shutdown()
+        self.thumbnails.shutdown()
+        self.catalog_updates.shutdown(cancel_futures=True)
+        self.catalog.close()
+        self.pixmap_cache.clear()
+        if TRACER:
+            self.trace_timer.stop()
+            print(f'Trace saved to {dump_trace()}', file=sys.stderr)
         event.accept()
 
 
 if __name__ == '__main__':
     test = QApplication(sys.argv)
+    if PROFILER:
+        PROFILER.mark('application')
     test_window = ImageLabeler()
+    if PROFILER:
+        PROFILER.mark('window')
+        PROFILER.watch(test, test_window)
     sys.exit(test.exec_())
@@ -0,0 +1,188 @@
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+import numpy as np
+
+
+class CheckableListModel(QAbstractListModel):
+    """
+    List model over a python list with check states kept in a bitset, items
+    are only rendered when a view requests them.
+    """
+
+    def __init__(self, rows=None, display=str, decoration=None):
+        """
+        Initialize model.
+        Args:
+            rows: A list of values shared with the caller, modified in place.
+            display: Function that converts a value to its displayed text.
+            decoration: Function that converts a value to its icon (QPixmap
+                or None), or None for no icons.
+        """
+        super().__init__()
+        self.rows = rows if rows is not None else []
+        self.display = display
+        self.decoration = decoration
+        self.checks = np.zeros((len(self.rows) + 7) // 8, np.uint8)
+        self.checked_count = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        """
+        Return:
+            Number of rows.
+        """
+        return 0 if parent.isValid() else len(self.rows)
+
+    def is_checked(self, row):
+        """
+        Args:
+            row: Row number.
+
+        Return:
+            True if the row is checked, False otherwise.
+        """
+        return bool(self.checks[row >> 3] >> (row & 7) & 1)
+
+    def data(self, index, role=Qt.DisplayRole):
+        """
+        Get item data of a row.
+        Args:
+            index: QModelIndex object.
+            role: Qt.ItemDataRole.
+
+        Return:
+            Displayed text, icon, check state or stored value.
+        """
+        if not index.isValid() or index.row() >= len(self.rows):
+            return
+        value = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return self.display(value)
+        if role == Qt.DecorationRole and self.decoration:
+            return self.decoration(value)
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if self.is_checked(index.row()) else Qt.Unchecked
+        if role == Qt.UserRole:
+            return value
+
+    def setData(self, index, value, role=Qt.EditRole):
+        """
+        Check or uncheck a row.
+        Args:
+            index: QModelIndex object.
+            value: Qt.CheckState.
+            role: Qt.ItemDataRole.
+
+        Return:
+            True if changed, False otherwise.
+        """
+        if role != Qt.CheckStateRole or not index.isValid():
+            return False
+        row, checked = index.row(), value == Qt.Checked
+        if self.is_checked(row) != checked:
+            self.checks[row >> 3] ^= np.uint8(1 << (row & 7))
+            self.checked_count += 1 if checked else -1
+            self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        return True
+
+    def flags(self, index):
+        """
+        Return:
+            Item flags of the given index.
+        """
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def checked_rows(self):
+        """
+        Return:
+            A list of checked rows.
+        """
+        if not self.checked_count:
+            return []
+        bits = np.unpackbits(self.checks, bitorder='little')[: len(self.rows)]
+        return np.flatnonzero(bits).tolist()
+
+    def check_rows(self, rows):
+        """
+        Check rows in bulk.
+        Args:
+            rows: A list of row numbers.
+
+        Return:
+            None
+        """
+        if not rows:
+            return
+        bits = np.unpackbits(self.checks, bitorder='little')
+        bits[rows] = 1
+        self.checks = np.packbits(bits, bitorder='little')
+        self.checked_count = int(np.count_nonzero(bits[: len(self.rows)]))
+        self.dataChanged.emit(
+            self.index(min(rows)), self.index(max(rows)), [Qt.CheckStateRole]
+        )
+
+    def append_rows(self, values):
+        """
+        Append values to the list.
+        Args:
+            values: A list of values.
+
+        Return:
+            None
+        """
+        if not values:
+            return
+        start = len(self.rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(values) - 1)
+        self.rows.extend(values)
+        size = (len(self.rows) + 7) // 8
+        if size > len(self.checks):
+            grown = np.zeros(max(size, 2 * len(self.checks)), np.uint8)
+            grown[: len(self.checks)] = self.checks
+            self.checks = grown
+        self.endInsertRows()
+
+    def remove_rows(self, rows):
+        """
+        Remove rows from the list.
+        Args:
+            rows: A list of row numbers.
+
+        Return:
+            None
+        """
+        if not rows:
+            return
+        keep = np.ones(len(self.rows), np.bool_)
+        keep[rows] = False
+        bits = np.unpackbits(self.checks, bitorder='little')[: len(self.rows)]
+        self.beginResetModel()
+        self.rows[:] = [value for value, kept in zip(self.rows, keep) if kept]
+        self.checks = np.packbits(bits[keep], bitorder='little')
+        self.checked_count = int(np.count_nonzero(bits[keep]))
+        self.endResetModel()
+
+    def refresh_decorations(self):
+        """
+        Notify views that icons changed, only visible rows are repainted.
+
+        Return:
+            None
+        """
+        if self.rows:
+            self.dataChanged.emit(
+                self.index(0), self.index(len(self.rows) - 1), [Qt.DecorationRole]
+            )
+
+    def set_rows(self, values):
+        """
+        Replace all values of the list.
+        Args:
+            values: A list of values.
+
+        Return:
+            None
+        """
+        self.beginResetModel()
+        self.rows[:] = values
+        self.checks = np.zeros((len(self.rows) + 7) // 8, np.uint8)
+        self.checked_count = 0
+        self.endResetModel()
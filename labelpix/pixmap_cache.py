@@ -0,0 +1,194 @@
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtCore import Qt
+from collections import OrderedDict
+import os
+
+
+class PixmapCache:
+    """
+    Shared LRU cache of decoded and scaled images within a memory budget.
+    """
+
+    def __init__(self, max_bytes=512 * 1024**2):
+        """
+        Initialize an empty cache.
+        Args:
+            max_bytes: Memory budget in bytes, least recently used pixmaps
+                are evicted once exceeded.
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.entries = OrderedDict()
+        self.scaled_keys = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def pixmap_bytes(pixmap):
+        """
+        Estimate memory used by a pixmap.
+        Args:
+            pixmap: QPixmap object.
+
+        Return:
+            Size in bytes.
+        """
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+    @staticmethod
+    def get_mtime(path):
+        """
+        Get modification time of a file.
+        Args:
+            path: Path to image.
+
+        Return:
+            mtime in nanoseconds or None if the file does not exist.
+        """
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return
+
+    def lookup(self, key):
+        """
+        Get a cached pixmap and mark it as recently used.
+        Args:
+            key: (path, mtime, size) tuple.
+
+        Return:
+            QPixmap or None.
+        """
+        pixmap = self.entries.get(key)
+        if pixmap is not None:
+            self.entries.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        """
+        Add a pixmap to the cache and evict least recently used ones if the
+        memory budget is exceeded.
+        Args:
+            key: (path, mtime, size) tuple, size is None for the full decode,
+                (width, height) for a scaled copy, only the last one of
+                which is kept, or (level, column, row) for a tile.
+            pixmap: QPixmap object.
+
+        Return:
+            None
+        """
+        path, mtime, size = key
+        if size is not None and len(size) == 2:
+            previous = self.scaled_keys.get(path)
+            if previous is not None and previous != key:
+                self.discard(previous)
+            self.scaled_keys[path] = key
+        self.discard(key)
+        self.entries[key] = pixmap
+        self.current_bytes += self.pixmap_bytes(pixmap)
+        while self.current_bytes > self.max_bytes and len(self.entries) > 1:
+            oldest = next(iter(self.entries))
+            if oldest == key:
+                break
+            self.discard(oldest)
+            self.evictions += 1
+
+    def discard(self, key):
+        """
+        Remove a cached pixmap if present.
+        Args:
+            key: (path, mtime, size) tuple.
+
+        Return:
+            None
+        """
+        pixmap = self.entries.pop(key, None)
+        if pixmap is None:
+            return
+        self.current_bytes -= self.pixmap_bytes(pixmap)
+        if self.scaled_keys.get(key[0]) == key:
+            del self.scaled_keys[key[0]]
+
+    def cached(self, path, size=None):
+        """
+        Check whether an image is cached without changing its recency.
+        Args:
+            path: Path to image.
+            size: QSize object or None for the full resolution image.
+
+        Return:
+            True if cached, False otherwise.
+        """
+        target = None if size is None else (size.width(), size.height())
+        return (path, self.get_mtime(path), target) in self.entries
+
+    def get(self, path, size=None):
+        """
+        Get a decoded image, optionally scaled to the given size.
+        Args:
+            path: Path to image.
+            size: QSize object or None for the full resolution image.
+
+        Return:
+            QPixmap (null if the image cannot be read).
+        """
+        mtime = self.get_mtime(path)
+        if mtime is None:
+            return QPixmap()
+        target = None if size is None else (size.width(), size.height())
+        scaled = self.lookup((path, mtime, target))
+        if scaled is not None:
+            self.hits += 1
+            return scaled
+        self.misses += 1
+        full = self.lookup((path, mtime, None)) if target else None
+        if full is None:
+            full = QPixmap(path)
+            if full.isNull():
+                return full
+            self.put((path, mtime, None), full)
+        if target is None:
+            return full
+        scaled = full.scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        self.put((path, mtime, target), scaled)
+        return scaled
+
+    def set_budget(self, max_bytes):
+        """
+        Change the memory budget and evict pixmaps accordingly.
+        Args:
+            max_bytes: New memory budget in bytes.
+
+        Return:
+            None
+        """
+        self.max_bytes = max_bytes
+        while self.current_bytes > self.max_bytes and self.entries:
+            self.discard(next(iter(self.entries)))
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Remove all cached pixmaps.
+
+        Return:
+            None
+        """
+        self.entries.clear()
+        self.scaled_keys.clear()
+        self.current_bytes = 0
+
+    def stats(self):
+        """
+        Return:
+            A dictionary of cache counters and memory usage.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+        }
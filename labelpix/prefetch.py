@@ -0,0 +1,135 @@
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+from concurrent.futures import ThreadPoolExecutor
+from tiles import is_large
+import os
+
+
+def decode_scaled(path, width, height):
+    """
+    Decode and scale an image (safe to call outside the GUI thread).
+    Args:
+        path: Path to image.
+        width: Target width.
+        height: Target height.
+
+    Return:
+        (path, mtime, QImage) or None if the image cannot be read or is
+        displayed in tiles.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return
+    if is_large(path):
+        return
+    image = QImage(path)
+    if image.isNull():
+        return
+    scaled = image.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    return path, mtime, scaled
+
+
+class ImagePrefetcher(QObject):
+    """
+    Decode and scale neighbouring images of the Photo List in worker threads
+    and add them to a PixmapCache.
+    """
+
+    decoded = pyqtSignal(object, object)
+
+    def __init__(self, cache, workers=2, ahead=4, behind=1):
+        """
+        Initialize worker pool.
+        Args:
+            cache: PixmapCache instance that receives the decoded images.
+            workers: Number of decoding threads.
+            ahead: Number of images to prefetch in the scroll direction.
+            behind: Number of images to prefetch in the opposite direction.
+        """
+        super().__init__()
+        self.cache = cache
+        self.ahead = ahead
+        self.behind = behind
+        self.executor = ThreadPoolExecutor(workers)
+        self.pending = {}
+        self.last_index = None
+        self.direction = 1
+        self.decoded.connect(self.store)
+
+    def get_targets(self, images, index):
+        """
+        Get paths to prefetch around the current index.
+        Args:
+            images: List of image paths.
+            index: Current index in images.
+
+        Return:
+            A list of paths ordered by priority.
+        """
+        if self.last_index is not None and index != self.last_index:
+            self.direction = 1 if index > self.last_index else -1
+        self.last_index = index
+        steps = [self.direction * step for step in range(1, self.ahead + 1)]
+        steps += [-self.direction * step for step in range(1, self.behind + 1)]
+        return [
+            images[index + step] for step in steps if 0 <= index + step < len(images)
+        ]
+
+    def prefetch(self, images, index, size):
+        """
+        Schedule decoding of images around the current one and cancel jobs
+        that are no longer needed.
+        Args:
+            images: List of image paths.
+            index: Current index in images.
+            size: QSize object, display size of the images.
+
+        Return:
+            None
+        """
+        targets = self.get_targets(images, index)
+        for path in set(self.pending) - set(targets):
+            self.pending.pop(path).cancel()
+        width, height = size.width(), size.height()
+        if width <= 0 or height <= 0:
+            return
+        for path in targets:
+            if path in self.pending or self.cache.cached(path, size):
+                continue
+            future = self.executor.submit(decode_scaled, path, width, height)
+            self.pending[path] = future
+            future.add_done_callback(
+                lambda done, path=path: self.decoded.emit(path, done)
+            )
+
+    def store(self, path, future):
+        """
+        Add a decoded image to the cache (called in the GUI thread).
+        Args:
+            path: Path to image.
+            future: Finished concurrent.futures.Future.
+
+        Return:
+            None
+        """
+        if self.pending.get(path) is not future:
+            return
+        del self.pending[path]
+        if future.cancelled() or future.exception() or not future.result():
+            return
+        path, mtime, scaled = future.result()
+        size = (scaled.width(), scaled.height())
+        self.cache.put((path, mtime, size), QPixmap.fromImage(scaled))
+
+    def shutdown(self):
+        """
+        Cancel pending jobs and stop the worker pool.
+
+        Return:
+            None
+        """
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=False)
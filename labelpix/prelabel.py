@@ -0,0 +1,363 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from geometry import corners_to_ratios, valid_ratios
+from decoding import read_reduced
+from queue import Queue, Empty, Full
+import numpy as np
+import threading
+import time
+import os
+
+
+def read_names(model):
+    """
+    Read class names of a model from a .names or .txt file next to it, one
+    name per line.
+    Args:
+        model: Path to .onnx model.
+
+    Return:
+        A list of class names or None if there is no names file.
+    """
+    prefix = os.path.splitext(model)[0]
+    for extension in ('.names', '.txt'):
+        if os.path.exists(prefix + extension):
+            with open(prefix + extension) as names:
+                return [line.strip() for line in names if line.strip()]
+
+
+def letterbox(image, size, fill=114):
+    """
+    Resize an image to fit a square input keeping its aspect ratio, and pad
+    the rest.
+    Args:
+        image: BGR image array.
+        size: Input width and height.
+        fill: Padding value.
+
+    Return:
+        (padded image, scale, x padding, y padding)
+    """
+    import cv2
+
+    height, width = image.shape[:2]
+    scale = min(size / width, size / height)
+    resized_width, resized_height = round(width * scale), round(height * scale)
+    if (resized_width, resized_height) != (width, height):
+        image = cv2.resize(
+            image, (resized_width, resized_height), interpolation=cv2.INTER_LINEAR
+        )
+    pad_x, pad_y = (size - resized_width) // 2, (size - resized_height) // 2
+    padded = np.full((size, size, 3), fill, np.uint8)
+    padded[pad_y : pad_y + resized_height, pad_x : pad_x + resized_width] = image
+    return padded, scale, pad_x, pad_y
+
+
+def decode_yolo(output, confidence=0.5, nms_threshold=0.45):
+    """
+    Convert YOLO detector output of one image to boxes after non-maximum
+    suppression. Both the (4 + classes, anchors) layout of YOLOv8 and the
+    (anchors, 5 + classes) layout with objectness of YOLOv5 are accepted.
+    Args:
+        output: Output array of one image.
+        confidence: Minimum confidence of kept boxes.
+        nms_threshold: Maximum IoU of kept boxes of the same class.
+
+    Return:
+        (corners in input pixels, scores, class ids) arrays.
+    """
+    import cv2
+
+    if output.shape[0] < output.shape[1]:
+        predictions = output.T
+        class_scores = predictions[:, 4:]
+    else:
+        predictions = output
+        class_scores = predictions[:, 5:] * predictions[:, 4:5]
+    class_ids = class_scores.argmax(1)
+    scores = class_scores[np.arange(len(class_ids)), class_ids]
+    kept = scores >= confidence
+    centers, scores, class_ids = predictions[kept, :4], scores[kept], class_ids[kept]
+    corners = np.c_[
+        centers[:, :2] - centers[:, 2:] / 2, centers[:, :2] + centers[:, 2:] / 2
+    ]
+    if not len(corners):
+        return corners, scores, class_ids
+    # Offset boxes by class so a single NMS pass never merges classes.
+    offsets = class_ids[:, None] * (corners.max() + 1)
+    xywh = (
+        np.c_[corners[:, :2], corners[:, 2:] - corners[:, :2]]
+        + np.c_[offsets, offsets, np.zeros_like(offsets), np.zeros_like(offsets)]
+    )
+    indexes = np.array(
+        cv2.dnn.NMSBoxes(xywh.tolist(), scores.tolist(), confidence, nms_threshold),
+        np.int64,
+    ).ravel()
+    return corners[indexes], scores[indexes], class_ids[indexes]
+
+
+class Detector:
+    """
+    ONNX object detector run on the CPU by OpenCV's dnn module.
+    """
+
+    def __init__(
+        self, model, input_size=640, confidence=0.5, nms_threshold=0.45, names=None
+    ):
+        """
+        Load a model.
+        Args:
+            model: Path to .onnx model with YOLO output.
+            input_size: Square model input size.
+            confidence: Minimum confidence of proposed boxes.
+            nms_threshold: Maximum IoU of proposed boxes of the same class.
+            names: A list of class names, defaults to a names file next to
+                the model or class-<id>.
+        """
+        import cv2
+
+        self.net = cv2.dnn.readNetFromONNX(model)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = input_size
+        self.confidence = confidence
+        self.nms_threshold = nms_threshold
+        self.names = names or read_names(model)
+        self.batched = True
+
+    def name(self, class_id):
+        """
+        Args:
+            class_id: Class index of the model.
+
+        Return:
+            Class name.
+        """
+        if self.names and class_id < len(self.names):
+            return self.names[class_id]
+        return f'class-{class_id}'
+
+    def forward(self, images):
+        """
+        Run the model on letterboxed images.
+        Args:
+            images: A list of input_size x input_size BGR images.
+
+        Return:
+            A list of output arrays, one per image.
+        """
+        import cv2
+
+        if self.batched and len(images) > 1:
+            blob = cv2.dnn.blobFromImages(images, 1 / 255, swapRB=True)
+            self.net.setInput(blob)
+            try:
+                output = self.net.forward()
+                if len(output) == len(images):
+                    return list(output)
+            except cv2.error:
+                pass
+            # Models exported with a fixed batch size of 1.
+            self.batched = False
+        outputs = []
+        for image in images:
+            self.net.setInput(cv2.dnn.blobFromImage(image, 1 / 255, swapRB=True))
+            outputs.append(self.net.forward()[0])
+        return outputs
+
+    def detect(self, items):
+        """
+        Detect objects in a batch of prepared images.
+        Args:
+            items: A list of (letterboxed image, scale, x padding, y padding,
+                width, height) as returned by prepare()
+
+        Return:
+            A list of (ratios, scores, class ids) arrays, one per image, boxes
+            that are empty after clipping to the image are dropped.
+        """
+        results = []
+        for output, (_, scale, pad_x, pad_y, width, height) in zip(
+            self.forward([item[0] for item in items]), items
+        ):
+            corners, scores, class_ids = decode_yolo(
+                output, self.confidence, self.nms_threshold
+            )
+            corners = (corners - [pad_x, pad_y, pad_x, pad_y]) / scale
+            ratios = corners_to_ratios(corners, width, height)
+            # Boxes in the padding have no size left after clipping.
+            valid = valid_ratios(ratios)
+            results.append((ratios[valid], scores[valid], class_ids[valid]))
+        return results
+
+    def prepare(self, path):
+        """
+        Decode an image at the lowest resolution that covers the model input
+        and letterbox it.
+        Args:
+            path: Path to image.
+
+        Return:
+            (letterboxed image, scale, x padding, y padding, width, height) or
+            None if the image cannot be read, width and height are those of
+            the decoded image.
+        """
+        image = read_reduced(path, self.input_size, side=max)
+        if image is None:
+            return
+        height, width = image.shape[:2]
+        return (*letterbox(image, self.input_size), width, height)
+
+
+class PreLabeler(QObject):
+    """
+    Propose bounding boxes for images with a Detector, images are decoded
+    and letterboxed by a pool of reader threads while batches run through
+    the model.
+    """
+
+    proposals = pyqtSignal(list)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(dict)
+
+    def __init__(self, paths, detector, batch_size=8, workers=4, queue_size=32):
+        """
+        Initialize pre-labeling settings.
+        Args:
+            paths: A list of image paths.
+            detector: Detector object.
+            batch_size: Number of images per model run.
+            workers: Number of reader threads.
+            queue_size: Maximum number of prepared images waiting for the
+                model.
+        """
+        super().__init__()
+        self.paths = list(paths)
+        self.detector = detector
+        self.batch_size = batch_size
+        self.workers = workers
+        self.tasks = Queue()
+        self.prepared = Queue(queue_size)
+        self.stop = threading.Event()
+
+    def start(self):
+        """
+        Start reader and inference threads.
+
+        Return:
+            None
+        """
+        for path in self.paths:
+            self.tasks.put(path)
+        readers = [
+            threading.Thread(target=self.read_images, daemon=True)
+            for _ in range(self.workers)
+        ]
+        for thread in readers:
+            thread.start()
+        threading.Thread(target=self.detect, args=(readers,), daemon=True).start()
+
+    def cancel(self):
+        """
+        Stop pre-labeling, proposals of finished batches are kept.
+
+        Return:
+            None
+        """
+        self.stop.set()
+
+    def read_images(self):
+        """
+        Prepare queued images for the model.
+
+        Return:
+            None
+        """
+        import cv2
+
+        while not self.stop.is_set():
+            try:
+                path = self.tasks.get_nowait()
+            except Empty:
+                break
+            try:
+                item = self.detector.prepare(path)
+            except (OSError, ValueError, cv2.error):
+                item = None
+            while not self.stop.is_set():
+                try:
+                    self.prepared.put((path, item), timeout=0.1)
+                    break
+                except Full:
+                    continue
+
+    def detect(self, readers):
+        """
+        Run batches of prepared images through the model and emit proposals
+        as (path, ratios, scores, class names) per image.
+        Args:
+            readers: Reader threads.
+
+        Return:
+            None
+        """
+        start_time = time.perf_counter()
+        done = boxes = 0
+        error = None
+        total = len(self.paths)
+        try:
+            while done < total and not self.stop.is_set():
+                batch, skipped = [], 0
+                while (
+                    len(batch) < self.batch_size and done + len(batch) + skipped < total
+                ):
+                    try:
+                        path, item = self.prepared.get(timeout=0.1)
+                    except Empty:
+                        if self.stop.is_set() or not any(
+                            reader.is_alive() for reader in readers
+                        ):
+                            break
+                        if batch:
+                            break
+                        continue
+                    if item is None:
+                        skipped += 1
+                    else:
+                        batch.append((path, item))
+                done += skipped
+                if not batch:
+                    if skipped:
+                        continue
+                    break
+                results = self.detector.detect([item for _, item in batch])
+                self.proposals.emit(
+                    [
+                        (
+                            path,
+                            ratios,
+                            scores,
+                            [self.detector.name(i) for i in class_ids.tolist()],
+                        )
+                        for (path, _), (ratios, scores, class_ids) in zip(
+                            batch, results
+                        )
+                    ]
+                )
+                done += len(batch)
+                boxes += sum(len(result[1]) for result in results)
+                self.progress.emit(done, total)
+        except Exception as exception:
+            # A failing model must not leave the GUI waiting for finished.
+            error = str(exception)
+            self.stop.set()
+        finally:
+            seconds = time.perf_counter() - start_time
+            self.finished.emit(
+                {
+                    'images': done,
+                    'boxes': boxes,
+                    'seconds': seconds,
+                    'images_per_second': done / seconds if seconds else 0.0,
+                    'error': error,
+                }
+            )
@@ -0,0 +1,301 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from geometry import corners_to_ratios, ratios_to_corners, corners_to_xywh
+from decoding import read_reduced
+from queue import Queue, Full, Empty
+import numpy as np
+import threading
+import time
+
+FLOW_PARAMETERS = {'winSize': (21, 21), 'maxLevel': 3}
+
+
+def read_frame(path, max_size=1280):
+    """
+    Decode an image at the lowest resolution that keeps it at least
+    max_size / 2 pixels wide.
+    Args:
+        path: Path to image.
+        max_size: Preferred maximum width or height.
+
+    Return:
+        (BGR image, grayscale image) or None if the image cannot be read.
+    """
+    import cv2
+
+    image = read_reduced(path, max_size, side=max)
+    if image is None:
+        return
+    return image, cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def track_points(previous, current, corners, grid=10, max_error=1.0):
+    """
+    Track a grid of points inside a box with pyramidal Lucas-Kanade optical
+    flow, keeping the points that are tracked back to where they started.
+    Args:
+        previous: Grayscale image the box belongs to.
+        current: Next grayscale image.
+        corners: [x1, y1, x2, y2] box in pixels.
+        grid: Number of points per row and column.
+        max_error: Maximum forward-backward error in pixels.
+
+    Return:
+        (start points, tracked points, fraction of points kept)
+    """
+    import cv2
+
+    x1, y1, x2, y2 = corners
+    xs, ys = np.meshgrid(np.linspace(x1, x2, grid), np.linspace(y1, y2, grid))
+    points = np.stack([xs.ravel(), ys.ravel()], 1).astype(np.float32)[:, None]
+    forward, forward_status, _ = cv2.calcOpticalFlowPyrLK(
+        previous, current, points, None, **FLOW_PARAMETERS
+    )
+    backward, backward_status, _ = cv2.calcOpticalFlowPyrLK(
+        current, previous, forward, None, **FLOW_PARAMETERS
+    )
+    error = np.linalg.norm((points - backward)[:, 0], axis=1)
+    kept = (forward_status[:, 0] == 1) & (backward_status[:, 0] == 1)
+    kept &= error < max_error
+    return points[kept, 0], forward[kept, 0], kept.mean()
+
+
+def move_box(corners, points, moved):
+    """
+    Move a box by the median displacement of its points and scale it by the
+    median change of distances between them.
+    Args:
+        corners: [x1, y1, x2, y2] box in pixels.
+        points: Start points.
+        moved: Tracked points.
+
+    Return:
+        Moved [x1, y1, x2, y2] box.
+    """
+    dx, dy = np.median(moved - points, 0)
+    scale = 1.0
+    if len(points) > 1:
+        first, second = np.triu_indices(len(points), 1)
+        before = np.linalg.norm(points[first] - points[second], axis=1)
+        after = np.linalg.norm(moved[first] - moved[second], axis=1)
+        valid = before > 1e-3
+        if valid.any():
+            scale = float(np.median(after[valid] / before[valid]))
+    x1, y1, x2, y2 = corners
+    center_x, center_y = (x1 + x2) / 2 + dx, (y1 + y2) / 2 + dy
+    half_width, half_height = (x2 - x1) * scale / 2, (y2 - y1) * scale / 2
+    return np.array(
+        [
+            center_x - half_width,
+            center_y - half_height,
+            center_x + half_width,
+            center_y + half_height,
+        ]
+    )
+
+
+def create_tracker():
+    """
+    Create an OpenCV MIL tracker.
+
+    Return:
+        Tracker or None if the OpenCV build has no MIL tracker.
+    """
+    import cv2
+
+    for module in (cv2, getattr(cv2, 'legacy', None)):
+        if module is not None and hasattr(module, 'TrackerMIL_create'):
+            return module.TrackerMIL_create()
+
+
+class BoxPropagator(QObject):
+    """
+    Track bounding boxes of an image through the following images in a
+    background thread, while a reader thread decodes a bounded number of
+    frames ahead. A track stops when its forward-backward optical flow
+    confidence drops below a threshold, tracked boxes are proposed in one
+    batch when all tracks stop.
+    """
+
+    proposals = pyqtSignal(list)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(dict)
+
+    def __init__(
+        self,
+        source,
+        paths,
+        ratios,
+        names,
+        use_tracker=True,
+        min_confidence=0.5,
+        lookahead=8,
+    ):
+        """
+        Initialize propagation settings.
+        Args:
+            source: Path to the image the boxes belong to.
+            paths: Paths to the following images in order.
+            ratios: Array of [[bx, by, bw, bh], ...] boxes of the source image.
+            names: A list of label names of the boxes.
+            use_tracker: If True, boxes are tracked with OpenCV MIL trackers
+                when available, otherwise with optical flow only.
+            min_confidence: Minimum fraction of a box's flow points that
+                survive the forward-backward check.
+            lookahead: Maximum number of decoded frames waiting to be
+                tracked.
+        """
+        super().__init__()
+        self.source = source
+        self.paths = list(paths)
+        self.ratios = np.asarray(ratios, np.float64).reshape(-1, 4)
+        self.names = list(names)
+        self.use_tracker = use_tracker
+        self.min_confidence = min_confidence
+        self.frames = Queue(lookahead)
+        self.stop = threading.Event()
+
+    def start(self):
+        """
+        Start reader and tracking threads.
+
+        Return:
+            None
+        """
+        threading.Thread(target=self.read_frames, daemon=True).start()
+        threading.Thread(target=self.track, daemon=True).start()
+
+    def cancel(self):
+        """
+        Stop propagation, boxes of tracked frames are kept.
+
+        Return:
+            None
+        """
+        self.stop.set()
+
+    def read_frames(self):
+        """
+        Decode the source and following images in order.
+
+        Return:
+            None
+        """
+        import cv2
+
+        for path in [self.source, *self.paths]:
+            try:
+                frame = read_frame(path)
+            except (OSError, ValueError, cv2.error):
+                frame = None
+            while not self.stop.is_set():
+                try:
+                    self.frames.put((path, frame), timeout=0.1)
+                    break
+                except Full:
+                    continue
+            if frame is None or self.stop.is_set():
+                break
+
+    def next_frame(self):
+        """
+        Return:
+            (path, (BGR image, grayscale image)) or None if propagation was
+            cancelled or the next image cannot be read.
+        """
+        while not self.stop.is_set():
+            try:
+                path, frame = self.frames.get(timeout=0.1)
+            except Empty:
+                continue
+            return (path, frame) if frame is not None else None
+
+    def track(self):
+        """
+        Track boxes frame by frame and emit them at once as (path, ratios,
+        scores, names) proposals when tracking stops.
+
+        Return:
+            None
+        """
+        start_time = time.perf_counter()
+        frames = boxes = 0
+        proposals = []
+        item = self.next_frame()
+        if item is not None:
+            _, (image, previous) = item
+            height, width = previous.shape
+            corners = ratios_to_corners(self.ratios, width, height)
+            tracks = list(range(len(corners)))
+            trackers = [None] * len(corners)
+            if self.use_tracker:
+                for index, box in enumerate(corners_to_xywh(corners).tolist()):
+                    tracker = create_tracker()
+                    if tracker is not None:
+                        tracker.init(image, tuple(round(value) for value in box))
+                    trackers[index] = tracker
+            while tracks and frames < len(self.paths):
+                item = self.next_frame()
+                if item is None:
+                    break
+                path, (image, current) = item
+                if current.shape != previous.shape:
+                    break
+                kept, scores = [], []
+                for index in tracks:
+                    box, confidence = self.track_box(
+                        trackers[index], image, previous, current, corners[index]
+                    )
+                    if confidence < self.min_confidence:
+                        continue
+                    corners[index] = box
+                    kept.append(index)
+                    scores.append(confidence)
+                tracks, previous = kept, current
+                frames += 1
+                boxes += len(tracks)
+                if tracks:
+                    proposals.append(
+                        (
+                            path,
+                            corners_to_ratios(corners[tracks], width, height),
+                            np.array(scores),
+                            [self.names[index] for index in tracks],
+                        )
+                    )
+                self.progress.emit(frames, len(self.paths))
+        self.stop.set()
+        if proposals:
+            self.proposals.emit(proposals)
+        seconds = time.perf_counter() - start_time
+        self.finished.emit(
+            {
+                'frames': frames,
+                'boxes': boxes,
+                'seconds': seconds,
+                'frames_per_second': frames / seconds if seconds else 0.0,
+            }
+        )
+
+    def track_box(self, tracker, image, previous, current, corners):
+        """
+        Move a box to the next frame.
+        Args:
+            tracker: Initialized OpenCV tracker or None for optical flow only.
+            image: Next BGR image.
+            previous: Grayscale image the box belongs to.
+            current: Next grayscale image.
+            corners: [x1, y1, x2, y2] box in pixels.
+
+        Return:
+            (moved box, confidence)
+        """
+        points, moved, confidence = track_points(previous, current, corners)
+        if tracker is not None:
+            found, box = tracker.update(image)
+            if not found:
+                return corners, 0.0
+            x, y, w, h = box
+            return np.array([x, y, x + w, y + h], np.float64), confidence
+        if not len(points):
+            return corners, 0.0
+        return move_box(corners, points, moved), confidence
@@ -0,0 +1,120 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from fnmatch import fnmatch
+import threading
+import os
+
+IMAGE_EXTENSIONS = (
+    '.bmp',
+    '.gif',
+    '.jpeg',
+    '.jpg',
+    '.pbm',
+    '.pgm',
+    '.png',
+    '.ppm',
+    '.tif',
+    '.tiff',
+    '.webp',
+)
+
+
+def scan_images(folder, recursive=False, patterns=None, extensions=IMAGE_EXTENSIONS):
+    """
+    Find images in a folder.
+    Args:
+        folder: Path to folder.
+        recursive: If True, subfolders are scanned as well.
+        patterns: A list of glob patterns matched against file names, or None.
+        extensions: Allowed file extensions (lower case), or None for any file.
+
+    Yield:
+        Image paths sorted by name within each folder.
+    """
+    folders = [folder]
+    while folders:
+        current = folders.pop()
+        try:
+            with os.scandir(current) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subfolders = []
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    subfolders.append(entry.path)
+                continue
+            if extensions and not entry.name.lower().endswith(extensions):
+                continue
+            if patterns and not any(
+                fnmatch(entry.name, pattern) for pattern in patterns
+            ):
+                continue
+            yield entry.path
+        folders.extend(reversed(subfolders))
+
+
+class FolderScanner(QObject):
+    """
+    Scan a folder for images in a background thread and emit them in chunks.
+    """
+
+    found = pyqtSignal(list)
+    finished = pyqtSignal(int)
+
+    def __init__(self, folder, recursive=False, patterns=None, chunk_size=2000):
+        """
+        Initialize scan settings.
+        Args:
+            folder: Path to folder.
+            recursive: If True, subfolders are scanned as well.
+            patterns: A list of glob patterns matched against file names, or None.
+            chunk_size: Number of paths emitted per found signal.
+        """
+        super().__init__()
+        self.folder = folder
+        self.recursive = recursive
+        self.patterns = patterns
+        self.chunk_size = chunk_size
+        self.stop = threading.Event()
+
+    def start(self):
+        """
+        Start scanning in a background thread.
+
+        Return:
+            None
+        """
+        threading.Thread(target=self.scan, daemon=True).start()
+
+    def cancel(self):
+        """
+        Stop scanning.
+
+        Return:
+            None
+        """
+        self.stop.set()
+
+    def scan(self):
+        """
+        Emit found images in chunks.
+
+        Return:
+            None
+        """
+        chunk, total = [], 0
+        for path in scan_images(self.folder, self.recursive, self.patterns):
+            if self.stop.is_set():
+                break
+            chunk.append(path)
+            if len(chunk) == self.chunk_size:
+                self.found.emit(chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            self.found.emit(chunk)
+            total += len(chunk)
+        self.finished.emit(total)
@@ -0,0 +1,264 @@
+from annotations import COLUMNS
+import pandas as pd
+import numpy as np
+import tempfile
+import time
+import sys
+import os
+
+SESSION_FORMATS = ('.csv', '.h5', '.parquet', '.feather', '.arrow')
+CATEGORICAL_COLUMNS = ['Image', 'Object Name']
+# Version 2 stores box centers in bx / by, version 1 sessions hold
+# (x_min - w / 2) / W and (y_min - h / 2) / H instead.
+SESSION_VERSION = 2
+VERSION_KEY = 'labelpix_version'
+
+
+def set_categorical(data, categorical):
+    """
+    Convert Image and Object Name columns to / from pandas Categorical.
+    Args:
+        data: pandas DataFrame with session data columns.
+        categorical: If True, convert to Categorical, otherwise to objects.
+
+    Return:
+        pandas DataFrame.
+    """
+    dtype = 'category' if categorical else object
+    return data.astype({column: dtype for column in CATEGORICAL_COLUMNS})
+
+
+def with_version(table):
+    """
+    Add the session version to the schema metadata of an arrow table.
+    Args:
+        table: pyarrow Table.
+
+    Return:
+        pyarrow Table.
+    """
+    metadata = {**(table.schema.metadata or {}), VERSION_KEY: str(SESSION_VERSION)}
+    return table.replace_schema_metadata(metadata)
+
+
+def save_session(data, location):
+    """
+    Save session data to csv, hdf, parquet or feather (arrow ipc) selected by
+    the file suffix, hdf, parquet and feather files are marked with
+    SESSION_VERSION.
+    Args:
+        data: pandas DataFrame with session data columns.
+        location: Path to save session data file.
+
+    Return:
+        None
+    """
+    if location.endswith('.csv'):
+        data.to_csv(location, index=False)
+    if location.endswith('h5'):
+        with pd.HDFStore(location, 'w') as store:
+            store.put('session_data', set_categorical(data, False), index=False)
+            store.get_storer('session_data').attrs[VERSION_KEY] = SESSION_VERSION
+    if location.endswith(('.parquet', '.feather', '.arrow')):
+        import pyarrow as pa
+
+        table = with_version(
+            pa.Table.from_pandas(set_categorical(data, True), preserve_index=False)
+        )
+        if location.endswith('.parquet'):
+            from pyarrow import parquet
+
+            parquet.write_table(table, location)
+        else:
+            from pyarrow import feather
+
+            feather.write_feather(table, location)
+
+
+def session_version(location):
+    """
+    Get the version of a saved session.
+    Args:
+        location: Path to session data file.
+
+    Return:
+        SESSION_VERSION or 1 for hdf, parquet and feather files, None for
+        csv and COCO json files, which have no place for a marker.
+    """
+    if location.endswith('.h5'):
+        with pd.HDFStore(location, 'r') as store:
+            attributes = store.get_storer('session_data').attrs
+            return int(getattr(attributes, VERSION_KEY, 1))
+    if location.endswith(('.parquet', '.feather', '.arrow')):
+        import pyarrow as pa
+        from pyarrow import parquet
+
+        if location.endswith('.parquet'):
+            schema = parquet.read_schema(location)
+        else:
+            schema = pa.ipc.open_file(pa.memory_map(location)).schema
+        return int((schema.metadata or {}).get(VERSION_KEY.encode(), 1))
+
+
+def convert_legacy_centers(data):
+    """
+    Convert bx / by of version 1 sessions to box centers.
+    Args:
+        data: pandas DataFrame with session data columns.
+
+    Return:
+        pandas DataFrame.
+    """
+    return data.assign(bx=data['bx'] + data['bw'], by=data['by'] + data['bh'])
+
+
+def optional_columns(names, columns, optional):
+    """
+    Get the columns to read from a session file.
+    Args:
+        names: Columns of the file.
+        columns: Required columns.
+        optional: Columns that are read if the file has them.
+
+    Return:
+        A list of columns.
+    """
+    missing = [column for column in columns if column not in names]
+    if missing:
+        raise ValueError(f'Session data has no {", ".join(missing)} columns')
+    return [*columns, *[column for column in optional if column in names]]
+
+
+def read_session(location, columns=None):
+    """
+    Read session data from csv, hdf, parquet, feather (arrow ipc) or COCO
+    json, parquet and feather files are memory-mapped and only the requested
+    columns are read.
+    Args:
+        location: Path to session data file.
+        columns: A list of columns to read, defaults to all session columns
+            and the Score and Proposed columns of detector proposals if
+            saved.
+
+    Return:
+        pandas DataFrame or None if the format is not supported.
+    """
+    optional = [] if columns else ['Score', 'Proposed']
+    columns = columns or COLUMNS
+    if location.endswith('.csv'):
+        wanted = {*columns, *optional}
+        data = pd.read_csv(
+            location,
+            usecols=lambda column: column in wanted,
+            dtype={column: 'category' for column in CATEGORICAL_COLUMNS},
+            float_precision='round_trip',
+        )
+        return data[optional_columns(data.columns, columns, optional)]
+    if location.endswith('.h5'):
+        data = pd.read_hdf(location, 'session_data')
+        return data[optional_columns(data.columns, columns, optional)]
+    if location.endswith('.parquet'):
+        from pyarrow import parquet
+
+        names = parquet.read_schema(location).names
+        return parquet.read_table(
+            location,
+            columns=optional_columns(names, columns, optional),
+            memory_map=True,
+        ).to_pandas()
+    if location.endswith(('.feather', '.arrow')):
+        from pyarrow import feather
+
+        table = feather.read_table(location, memory_map=True)
+        return table.select(
+            optional_columns(table.column_names, columns, optional)
+        ).to_pandas()
+    if location.endswith('.json'):
+        from coco import read_coco
+
+        return read_coco(location)[columns]
+
+
+def unreviewed(data):
+    """
+    Check proposed bounding boxes that were not accepted.
+    Args:
+        data: pandas DataFrame with session data columns.
+
+    Return:
+        Boolean numpy array, True for proposed boxes, sessions saved before
+        the Proposed column was added mark them with a score.
+    """
+    if 'Proposed' in data:
+        return data['Proposed'].values.astype(np.bool_)
+    if 'Score' in data:
+        return data['Score'].notna().values
+    return np.zeros(len(data), np.bool_)
+
+
+def row_hashes(data):
+    """
+    Hash session data rows.
+    Args:
+        data: pandas DataFrame with session data columns.
+
+    Return:
+        numpy array of uint64 row hashes.
+    """
+    return pd.util.hash_pandas_object(data[COLUMNS], index=False).values
+
+
+def new_rows(current, new):
+    """
+    Get rows of new session data that are neither in the current session nor
+    repeated within the new data.
+    Args:
+        current: pandas DataFrame with session data columns.
+        new: pandas DataFrame with session data columns.
+
+    Return:
+        pandas DataFrame.
+    """
+    hashes = row_hashes(new)
+    unique = ~pd.Series(hashes).duplicated().values
+    if len(current):
+        unique &= ~np.isin(hashes, row_hashes(current))
+    return new[unique]
+
+
+def compare_formats(data, directory=None, formats=SESSION_FORMATS):
+    """
+    Measure save / load times and file sizes of session data formats.
+    Args:
+        data: pandas DataFrame with session data columns.
+        directory: Folder for the temporary files, defaults to the system one.
+        formats: File suffixes to compare.
+
+    Return:
+        dict of suffix -> {'save_seconds', 'load_seconds', 'bytes'}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(dir=directory) as temp:
+        for suffix in formats:
+            location = os.path.join(temp, f'session{suffix}')
+            try:
+                start_time = time.perf_counter()
+                save_session(data, location)
+                saved = time.perf_counter()
+                read_session(location)
+                loaded = time.perf_counter()
+            except ImportError as error:
+                results[suffix] = {'error': f'{error}'}
+                continue
+            results[suffix] = {
+                'save_seconds': saved - start_time,
+                'load_seconds': loaded - saved,
+                'bytes': os.path.getsize(location),
+            }
+    return results
+
+
+if __name__ == '__main__':
+    session = read_session(sys.argv[1])
+    for suffix, result in compare_formats(session).items():
+        print(suffix, result)
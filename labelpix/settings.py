@@ -1,3 +1,8 @@
+import os
+
+DATA_DIR = os.path.join(os.path.expanduser('~'), '.labelpix')
+
+
 def setup_toolbar(qt_obj):
     tools = {}
     names = [
@@ -8,6 +13,10 @@ def setup_toolbar(qt_obj):
         'Save Voc',
         'Upload Photo Folder',
         'Upload video',
+        'Find Duplicates',
+        'Pre-label',
+        'Propagate',
+        'Accept Proposals',
         'Edit Mode',
         'Delete Selection(s)',
         'Reset',
@@ -22,6 +31,10 @@ def setup_toolbar(qt_obj):
         'voc.png',
         'upload_folder5.png',
         'upload_vid3.png',
+        'duplicates.png',
+        'draw_rectangle2.png',
+        'draw_rectangle.png',
+        'accept.png',
         'draw_rectangle3.png',
         'delete.png',
         'reset4.png',
@@ -36,22 +49,31 @@ def setup_toolbar(qt_obj):
         qt_obj.save_changes_voc,
         qt_obj.upload_folder,
         qt_obj.upload_vid,
+        qt_obj.find_duplicates,
+        qt_obj.prelabel,
+        qt_obj.propagate,
+        qt_obj.accept_proposals,
         qt_obj.edit_mode,
         qt_obj.delete_selections,
         qt_obj.reset_labels,
         qt_obj.display_settings,
         qt_obj.display_help,
     ]
-    keys = 'OLSYPFVRDJAH'
+    keys = 'OLSYPFVUMGCRDJAH'
     tips = [
         'Select photos from a folder and add them to the photo list',
-        'Upload labels from csv, hdf',
-        'Save changes to csv or hdf',
+        'Upload labels from csv, hdf, parquet, feather or COCO json',
+        'Save changes to csv, hdf, parquet, feather or COCO json',
         'Save changes to txt files with Yolo format',
         'Save changes to xml files in Pascal voc format',
         'Open a folder from the last saved point or open a new one containing '
         'photos and add them to the photo list',
         'Add a video and convert it to .png frames and add them to the photo list',
+        'Check near-duplicate photos in the photo list',
+        'Propose bounding boxes for the photo list with an ONNX detector',
+        'Track the boxes of the current photo through the next photos',
+        'Accept checked proposed boxes, or all of the current photo, so they '
+        'are saved to Yolo, Voc and COCO files',
         'Activate editor mode',
         'Delete all selections(checked items)',
         'Delete all labels in the current working folder',
@@ -68,6 +90,10 @@ def setup_toolbar(qt_obj):
         False,
         False,
         False,
+        False,
+        False,
+        False,
+        False,
         True,
         False,
         False,
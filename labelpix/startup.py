@@ -0,0 +1,132 @@
+import builtins
+import time
+import sys
+
+PROFILE_FLAG = '--profile-startup'
+
+
+class StartupProfiler:
+    """
+    Measure module import times by wrapping builtins.__import__, and the
+    time until the first window paint.
+    """
+
+    def __init__(self):
+        """
+        Start measuring from now.
+        """
+        self.start_time = time.perf_counter()
+        self.original_import = builtins.__import__
+        self.imports = []
+        self.depth = 0
+        self.marks = {}
+        self.watched = []
+
+    def __call__(self, name, globals=None, locals=None, fromlist=(), level=0):
+        """
+        Import a module and record the time of first imports.
+
+        Return:
+            Imported module.
+        """
+        if level or name in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+        start_time = time.perf_counter()
+        self.depth += 1
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            self.depth -= 1
+            self.imports.append((name, self.depth, time.perf_counter() - start_time))
+
+    def install(self):
+        """
+        Start timing imports.
+
+        Return:
+            self
+        """
+        builtins.__import__ = self
+        return self
+
+    def uninstall(self):
+        """
+        Stop timing imports.
+
+        Return:
+            None
+        """
+        builtins.__import__ = self.original_import
+
+    def mark(self, name):
+        """
+        Record the elapsed time of a startup stage.
+        Args:
+            name: Stage name.
+
+        Return:
+            None
+        """
+        self.marks[name] = time.perf_counter() - self.start_time
+
+    def watch(self, application, widget):
+        """
+        Record the first paint of a widget, then report and quit.
+        Args:
+            application: QApplication instance.
+            widget: Widget whose first paint ends startup.
+
+        Return:
+            None
+        """
+        from PyQt5.QtCore import QObject, QEvent, QTimer
+
+        profiler = self
+
+        class PaintFilter(QObject):
+            def eventFilter(self, watched, event):
+                if event.type() == QEvent.Paint and 'first paint' not in profiler.marks:
+                    profiler.mark('first paint')
+                    QTimer.singleShot(0, application.quit)
+                return False
+
+        paint_filter = PaintFilter(widget)
+        widget.installEventFilter(paint_filter)
+        self.watched.append(paint_filter)
+        application.aboutToQuit.connect(self.report)
+
+    def report(self, top=15, output=sys.stdout):
+        """
+        Print startup stages and the slowest top level imports.
+        Args:
+            top: Number of imports to print.
+            output: Text file object.
+
+        Return:
+            None
+        """
+        self.uninstall()
+        direct = [item for item in self.imports if item[1] == 0]
+        print(
+            f'imports: {sum(seconds for _, _, seconds in direct) * 1000:.1f} ms '
+            f'({len(self.imports)} modules)',
+            file=output,
+        )
+        for name, seconds in self.marks.items():
+            print(f'{name}: {seconds * 1000:.1f} ms', file=output)
+        print('slowest imports (cumulative):', file=output)
+        for name, depth, seconds in sorted(
+            self.imports, key=lambda item: item[2], reverse=True
+        )[:top]:
+            print(f'  {seconds * 1000:8.1f} ms  {"  " * depth}{name}', file=output)
+
+
+def profile_startup():
+    """
+    Start a StartupProfiler if the profile flag is in the command line.
+
+    Return:
+        StartupProfiler or None.
+    """
+    if PROFILE_FLAG in sys.argv:
+        return StartupProfiler().install()
@@ -0,0 +1,217 @@
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from concurrent.futures import ProcessPoolExecutor
+from pixmap_cache import PixmapCache
+from decoding import read_reduced
+from settings import DATA_DIR
+import multiprocessing
+import hashlib
+import os
+
+THUMBNAIL_DIR = os.path.join(DATA_DIR, 'thumbnails')
+THUMBNAIL_SIZE = 64
+
+
+def thumbnail_path(path, mtime, size=THUMBNAIL_SIZE, directory=THUMBNAIL_DIR):
+    """
+    Get the cache location of a thumbnail, named by the hash of the image
+    path, modification time and thumbnail size.
+    Args:
+        path: Path to image.
+        mtime: Image modification time in nanoseconds.
+        size: Maximum thumbnail width and height.
+        directory: Folder of the thumbnail cache.
+
+    Return:
+        Path to thumbnail.
+    """
+    key = hashlib.sha1(f'{os.path.abspath(path)}:{mtime}:{size}'.encode()).hexdigest()
+    return os.path.join(directory, key[:2], f'{key[2:]}.jpg')
+
+
+def make_thumbnail(path, output, size=THUMBNAIL_SIZE):
+    """
+    Decode an image at the lowest sufficient resolution and save a
+    thumbnail that fits in size x size.
+    Args:
+        path: Path to image.
+        output: Path to thumbnail.
+        size: Maximum thumbnail width and height.
+
+    Return:
+        True if the thumbnail was saved, False otherwise.
+    """
+    import cv2
+
+    image = read_reduced(path, size)
+    if image is None:
+        return False
+    height, width = image.shape[:2]
+    scale = size / max(width, height)
+    if scale < 1:
+        image = cv2.resize(
+            image,
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    temp = f'{output}.{os.getpid()}.jpg'
+    cv2.imwrite(temp, image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    os.replace(temp, output)
+    return True
+
+
+def make_thumbnails(tasks):
+    """
+    Save thumbnails of a batch of images (process pool worker).
+    Args:
+        tasks: A list of (image path, thumbnail path, size)
+
+    Return:
+        A list of image paths whose thumbnails were saved.
+    """
+    import cv2
+
+    done = []
+    for path, output, size in tasks:
+        try:
+            if make_thumbnail(path, output, size):
+                done.append(path)
+        except (OSError, ValueError, cv2.error):
+            pass
+    return done
+
+
+class ThumbnailCache(QObject):
+    """
+    Thumbnails of images stored on disk by content address and kept in
+    memory for the visible rows, missing ones are generated in batches in
+    a process pool.
+    """
+
+    ready = pyqtSignal(list)
+    finished = pyqtSignal(object)
+
+    def __init__(
+        self,
+        size=THUMBNAIL_SIZE,
+        directory=THUMBNAIL_DIR,
+        workers=None,
+        batch_size=16,
+        max_bytes=32 * 1024**2,
+    ):
+        """
+        Initialize the cache.
+        Args:
+            size: Maximum thumbnail width and height.
+            directory: Folder of the thumbnail cache.
+            workers: Number of worker processes, defaults to the number of
+                CPUs.
+            batch_size: Number of thumbnails generated per task.
+            max_bytes: Memory budget of decoded thumbnails.
+        """
+        super().__init__()
+        self.size = size
+        self.directory = directory
+        self.workers = workers or os.cpu_count()
+        self.batch_size = batch_size
+        self.memory = PixmapCache(max_bytes)
+        self.executor = None
+        self.requested = {}
+        self.pending = {}
+        self.in_flight = set()
+        self.failed = set()
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.timeout.connect(self.flush)
+        self.finished.connect(self.store)
+
+    def get(self, path):
+        """
+        Get the thumbnail of an image, a missing one is scheduled for
+        generation (called in the GUI thread).
+        Args:
+            path: Path to image.
+
+        Return:
+            QPixmap or None if the thumbnail is not available yet.
+        """
+        mtime = self.memory.get_mtime(path)
+        if mtime is None:
+            return
+        key = (path, mtime, None)
+        pixmap = self.memory.lookup(key)
+        if pixmap is not None:
+            return pixmap
+        output = thumbnail_path(path, mtime, self.size, self.directory)
+        if os.path.exists(output):
+            pixmap = QPixmap(output)
+            if not pixmap.isNull():
+                self.memory.put(key, pixmap)
+                return pixmap
+        if key not in self.failed and path not in self.in_flight:
+            self.requested[path] = (path, output, self.size)
+            self.flush_timer.start(0)
+
+    def flush(self):
+        """
+        Submit the most recently requested thumbnails and cancel the ones
+        that were scrolled past before being started.
+
+        Return:
+            None
+        """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        tasks = list(self.requested.values())[-self.batch_size * self.workers * 2 :]
+        self.requested.clear()
+        requested = {path for path, _, _ in tasks}
+        for future, paths in list(self.pending.items()):
+            if not requested & set(paths) and future.cancel():
+                del self.pending[future]
+                self.in_flight.difference_update(paths)
+        for i in range(0, len(tasks), self.batch_size):
+            batch = tasks[i : i + self.batch_size]
+            future = self.executor.submit(make_thumbnails, batch)
+            self.pending[future] = [path for path, _, _ in batch]
+            self.in_flight.update(self.pending[future])
+            future.add_done_callback(self.finished.emit)
+
+    def store(self, future):
+        """
+        Handle a finished batch (called in the GUI thread).
+        Args:
+            future: Finished concurrent.futures.Future.
+
+        Return:
+            None
+        """
+        paths = self.pending.pop(future, None)
+        if paths is None:
+            return
+        self.in_flight.difference_update(paths)
+        if future.cancelled():
+            return
+        done = [] if future.exception() else future.result()
+        for path in set(paths) - set(done):
+            self.failed.add((path, self.memory.get_mtime(path), None))
+        if done:
+            self.ready.emit(done)
+
+    def shutdown(self):
+        """
+        Cancel pending batches and stop the worker pool.
+
+        Return:
+            None
+        """
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.in_flight.clear()
+        self.requested.clear()
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.memory.clear()
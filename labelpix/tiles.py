@@ -0,0 +1,444 @@
+from PyQt5.QtGui import QImage, QImageReader, QImageIOHandler, QPixmap
+from PyQt5.QtCore import QObject, QRect, QSize, pyqtSignal
+from concurrent.futures import ThreadPoolExecutor
+from settings import DATA_DIR
+import numpy as np
+import hashlib
+import math
+import os
+
+TILE_DIR = os.path.join(DATA_DIR, 'tiles')
+TILE_SIZE = 512
+TILED_PIXELS = 64 * 1024**2
+
+
+def read_size(path):
+    """
+    Get image dimensions from the image header.
+    Args:
+        path: Path to image.
+
+    Return:
+        (width, height), (-1, -1) if the image cannot be read.
+    """
+    size = QImageReader(path).size()
+    return size.width(), size.height()
+
+
+def is_large(path):
+    """
+    Check whether an image should be displayed in tiles.
+    Args:
+        path: Path to image.
+
+    Return:
+        True if the image has more than TILED_PIXELS pixels.
+    """
+    width, height = read_size(path)
+    return width * height > TILED_PIXELS
+
+
+def reads_regions(path):
+    """
+    Check whether image regions can be decoded at reduced resolution
+    without decoding the whole image (ex: jpeg).
+    Args:
+        path: Path to image.
+
+    Return:
+        True if regions are decoded natively.
+    """
+    reader = QImageReader(path)
+    return reader.supportsOption(QImageIOHandler.ClipRect) and reader.supportsOption(
+        QImageIOHandler.ScaledSize
+    )
+
+
+def read_region(path, rect, width, height):
+    """
+    Decode an image region at reduced resolution (safe to call outside the
+    GUI thread).
+    Args:
+        path: Path to image.
+        rect: (x, y, w, h) region in full resolution pixels.
+        width: Decoded region width.
+        height: Decoded region height.
+
+    Return:
+        QImage (null if the image cannot be read).
+    """
+    reader = QImageReader(path)
+    reader.setClipRect(QRect(*rect))
+    reader.setScaledSize(QSize(width, height))
+    return reader.read()
+
+
+def pyramid_dir(path, mtime, tile_dir=TILE_DIR):
+    """
+    Get the folder of the tile pyramid of an image version.
+    Args:
+        path: Path to image.
+        mtime: Image modification time in nanoseconds.
+        tile_dir: Folder of tile pyramids.
+
+    Return:
+        Path to folder.
+    """
+    key = hashlib.sha1(f'{os.path.abspath(path)}:{mtime}'.encode()).hexdigest()
+    return os.path.join(tile_dir, key)
+
+
+def build_pyramid(path, directory, tile_size=TILE_SIZE):
+    """
+    Decode an image once and save its tiles at every level of detail,
+    level n is 2 ** n times smaller than the image.
+    Args:
+        path: Path to image.
+        directory: Output folder.
+        tile_size: Tile width and height.
+
+    Return:
+        Number of levels or 0 if the image cannot be read.
+    """
+    import cv2
+
+    image = cv2.imread(path, cv2.IMREAD_COLOR)
+    if image is None:
+        return 0
+    level = 0
+    while True:
+        level_dir = os.path.join(directory, f'{level}')
+        os.makedirs(level_dir, exist_ok=True)
+        height, width = image.shape[:2]
+        for row in range(math.ceil(height / tile_size)):
+            for column in range(math.ceil(width / tile_size)):
+                tile = image[
+                    row * tile_size : (row + 1) * tile_size,
+                    column * tile_size : (column + 1) * tile_size,
+                ]
+                cv2.imwrite(
+                    os.path.join(level_dir, f'{column}-{row}.jpg'),
+                    tile,
+                    [cv2.IMWRITE_JPEG_QUALITY, 95],
+                )
+        level += 1
+        if max(width, height) <= tile_size:
+            break
+        image = cv2.resize(
+            image,
+            (math.ceil(width / 2), math.ceil(height / 2)),
+            interpolation=cv2.INTER_AREA,
+        )
+    with open(os.path.join(directory, 'levels'), 'w') as levels:
+        levels.write(f'{level}')
+    return level
+
+
+class TileView:
+    """
+    Zoom and pan state of a tiled image and the mapping between widget and
+    full resolution image coordinates.
+    """
+
+    def __init__(self, path, width, height, tile_size=TILE_SIZE, max_zoom=8.0):
+        """
+        Initialize the view.
+        Args:
+            path: Path to image.
+            width: Full resolution image width.
+            height: Full resolution image height.
+            tile_size: Tile width and height.
+            max_zoom: Maximum number of widget pixels per image pixel.
+        """
+        self.path = path
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.max_zoom = max_zoom
+        self.levels = max(0, math.ceil(math.log2(max(width, height) / tile_size))) + 1
+        self.zoom = 1.0
+        self.min_zoom = 1.0
+        self.origin = np.zeros(2)
+
+    def fit(self, view_width, view_height):
+        """
+        Zoom out to show the whole image centered in the widget.
+        Args:
+            view_width: Widget width.
+            view_height: Widget height.
+
+        Return:
+            None
+        """
+        self.zoom = self.min_zoom = min(
+            view_width / self.width, view_height / self.height
+        )
+        self.origin = (
+            np.array([self.width, self.height])
+            - np.array([view_width, view_height]) / self.zoom
+        ) / 2
+
+    def zoom_at(self, x, y, factor):
+        """
+        Zoom around a widget point.
+        Args:
+            x: Widget x coordinate.
+            y: Widget y coordinate.
+            factor: Zoom multiplier.
+
+        Return:
+            None
+        """
+        anchor = self.origin + np.array([x, y]) / self.zoom
+        self.zoom = min(max(self.zoom * factor, self.min_zoom), self.max_zoom)
+        self.origin = anchor - np.array([x, y]) / self.zoom
+
+    def pan(self, dx, dy):
+        """
+        Move the view.
+        Args:
+            dx: Widget x distance.
+            dy: Widget y distance.
+
+        Return:
+            None
+        """
+        self.origin = self.origin - np.array([dx, dy]) / self.zoom
+
+    def to_image(self, corners):
+        """
+        Map widget coordinates to full resolution image coordinates.
+        Args:
+            corners: Array of [[x1, y1, x2, y2], ...]
+
+        Return:
+            numpy array of the same shape.
+        """
+        return np.tile(self.origin, 2) + np.asarray(corners, np.float64) / self.zoom
+
+    def to_widget(self, corners):
+        """
+        Map full resolution image coordinates to widget coordinates.
+        Args:
+            corners: Array of [[x1, y1, x2, y2], ...]
+
+        Return:
+            numpy array of the same shape.
+        """
+        return (np.asarray(corners, np.float64) - np.tile(self.origin, 2)) * self.zoom
+
+    def level(self):
+        """
+        Return:
+            The coarsest level of detail that has at least one tile pixel
+            per widget pixel.
+        """
+        level = math.floor(math.log2(1 / self.zoom)) if self.zoom < 1 else 0
+        return min(level, self.levels - 1)
+
+    def tile_rect(self, level, column, row):
+        """
+        Get the image region of a tile.
+        Args:
+            level: Level of detail.
+            column: Tile column.
+            row: Tile row.
+
+        Return:
+            (x, y, w, h) in full resolution pixels, clipped to the image.
+        """
+        span = self.tile_size * 2**level
+        x, y = column * span, row * span
+        return x, y, min(span, self.width - x), min(span, self.height - y)
+
+    def visible_tiles(self, view_width, view_height):
+        """
+        Get the tiles that cover the widget at the current level of detail.
+        Args:
+            view_width: Widget width.
+            view_height: Widget height.
+
+        Return:
+            A list of (level, column, row)
+        """
+        level = self.level()
+        span = self.tile_size * 2**level
+        x1, y1, x2, y2 = self.to_image([0, 0, view_width, view_height])
+        x1, x2 = max(x1, 0), min(x2, self.width)
+        y1, y2 = max(y1, 0), min(y2, self.height)
+        return [
+            (level, column, row)
+            for row in range(int(y1 // span), math.ceil(y2 / span))
+            for column in range(int(x1 // span), math.ceil(x2 / span))
+        ]
+
+
+class TileLoader(QObject):
+    """
+    Decode tiles of large images in worker threads and add them to a
+    PixmapCache. Regions of formats that support it (ex: jpeg) are decoded
+    directly at reduced resolution, other images are converted once to a
+    tile pyramid on disk.
+    """
+
+    loaded = pyqtSignal(object, object)
+    built = pyqtSignal(object, object)
+    ready = pyqtSignal(str)
+
+    def __init__(self, cache, workers=2, tile_dir=TILE_DIR):
+        """
+        Initialize worker pool.
+        Args:
+            cache: PixmapCache instance that receives the decoded tiles.
+            workers: Number of decoding threads.
+            tile_dir: Folder of tile pyramids.
+        """
+        super().__init__()
+        self.cache = cache
+        self.tile_dir = tile_dir
+        self.executor = ThreadPoolExecutor(workers)
+        self.sources = {}
+        self.pending = {}
+        self.loaded.connect(self.store)
+        self.built.connect(self.finish_pyramid)
+
+    def open(self, view):
+        """
+        Prepare tile decoding of an image and request its coarsest tile.
+        Args:
+            view: TileView instance.
+
+        Return:
+            None
+        """
+        path = view.path
+        mtime = self.cache.get_mtime(path)
+        if path in self.sources and self.sources[path][0] == mtime:
+            return
+        if reads_regions(path):
+            self.sources[path] = (mtime, None)
+            self.tile(view, view.levels - 1, 0, 0)
+            return
+        directory = pyramid_dir(path, mtime, self.tile_dir)
+        if os.path.exists(os.path.join(directory, 'levels')):
+            self.sources[path] = (mtime, directory)
+            return
+        self.sources[path] = (mtime, False)
+        future = self.executor.submit(build_pyramid, path, directory, view.tile_size)
+        future.add_done_callback(
+            lambda done: self.built.emit((path, mtime, directory), done)
+        )
+
+    def finish_pyramid(self, source, future):
+        """
+        Mark a tile pyramid as ready (called in the GUI thread).
+        Args:
+            source: (path, mtime, pyramid folder)
+            future: Finished concurrent.futures.Future.
+
+        Return:
+            None
+        """
+        path, mtime, directory = source
+        if self.sources.get(path) != (mtime, False):
+            return
+        if future.cancelled() or future.exception() or not future.result():
+            del self.sources[path]
+            return
+        self.sources[path] = (mtime, directory)
+        self.ready.emit(path)
+
+    def cached_tile(self, view, level, column, row):
+        """
+        Get a tile if it is cached.
+        Args:
+            view: TileView instance.
+            level: Level of detail.
+            column: Tile column.
+            row: Tile row.
+
+        Return:
+            QPixmap or None.
+        """
+        mtime, _ = self.sources.get(view.path, (None, None))
+        return self.cache.lookup((view.path, mtime, (level, column, row)))
+
+    def tile(self, view, level, column, row):
+        """
+        Get a tile and schedule its decoding if it is not cached.
+        Args:
+            view: TileView instance.
+            level: Level of detail.
+            column: Tile column.
+            row: Tile row.
+
+        Return:
+            QPixmap or None if the tile is not decoded yet.
+        """
+        pixmap = self.cached_tile(view, level, column, row)
+        if pixmap is not None or view.path not in self.sources:
+            return pixmap
+        mtime, directory = self.sources[view.path]
+        key = (view.path, mtime, (level, column, row))
+        if key in self.pending or directory is False:
+            return
+        if directory:
+            future = self.executor.submit(
+                QImage, os.path.join(directory, f'{level}', f'{column}-{row}.jpg')
+            )
+        else:
+            x, y, w, h = view.tile_rect(level, column, row)
+            future = self.executor.submit(
+                read_region,
+                view.path,
+                (x, y, w, h),
+                max(1, math.ceil(w / 2**level)),
+                max(1, math.ceil(h / 2**level)),
+            )
+        self.pending[key] = future
+        future.add_done_callback(lambda done: self.loaded.emit(key, done))
+
+    def cancel(self, view=None, tiles=()):
+        """
+        Cancel pending tiles that are no longer visible.
+        Args:
+            view: TileView instance or None to cancel all tiles.
+            tiles: A list of (level, column, row) of view to keep loading.
+
+        Return:
+            None
+        """
+        keep = set()
+        if view is not None:
+            mtime, _ = self.sources.get(view.path, (None, None))
+            keep = {(view.path, mtime, tile) for tile in tiles}
+        for key in set(self.pending) - keep:
+            self.pending.pop(key).cancel()
+
+    def store(self, key, future):
+        """
+        Add a decoded tile to the cache (called in the GUI thread).
+        Args:
+            key: (path, mtime, (level, column, row))
+            future: Finished concurrent.futures.Future.
+
+        Return:
+            None
+        """
+        if self.pending.get(key) is not future:
+            return
+        del self.pending[key]
+        if future.cancelled() or future.exception() or future.result().isNull():
+            return
+        self.cache.put(key, QPixmap.fromImage(future.result()))
+        self.ready.emit(key[0])
+
+    def shutdown(self):
+        """
+        Cancel pending jobs and stop the worker pool.
+
+        Return:
+            None
+        """
+        self.cancel()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,248 @@
+from settings import DATA_DIR
+from collections import deque
+from bisect import bisect_left
+import functools
+import inspect
+import threading
+import json
+import time
+import os
+
+TRACE_VARIABLE = 'LABELPIX_TRACE'
+TRACE_DIR = os.path.join(DATA_DIR, 'traces')
+BIN_EDGES = [10 ** (exponent / 20) for exponent in range(-120, 41)]
+
+
+class LatencyHistogram:
+    """
+    Latency counts in logarithmic bins (20 per decade from 1 microsecond to
+    100 seconds), percentiles are accurate to about 12%.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty histogram.
+        """
+        self.counts = [0] * (len(BIN_EDGES) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, seconds):
+        """
+        Record a duration.
+        Args:
+            seconds: Duration in seconds.
+
+        Return:
+            None
+        """
+        self.counts[bisect_left(BIN_EDGES, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    def percentile(self, percent):
+        """
+        Get the upper bound of a latency percentile.
+        Args:
+            percent: Percentile in [0, 100]
+
+        Return:
+            Duration in seconds.
+        """
+        if not self.count:
+            return 0.0
+        target, seen = self.count * percent / 100, 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return min(BIN_EDGES[min(index, len(BIN_EDGES) - 1)], self.maximum)
+        return self.maximum
+
+
+class Tracer:
+    """
+    Record spans of traced functions as latency histograms and Chrome trace
+    events.
+    """
+
+    def __init__(self, max_events=1_000_000):
+        """
+        Initialize the tracer.
+        Args:
+            max_events: Maximum number of kept trace events, older ones are
+                dropped.
+        """
+        self.start_time = time.perf_counter()
+        self.events = deque(maxlen=max_events)
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, start_time, end_time):
+        """
+        Record a finished span.
+        Args:
+            name: Span name.
+            start_time: time.perf_counter() at the start of the span.
+            end_time: time.perf_counter() at the end of the span.
+
+        Return:
+            None
+        """
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.add(end_time - start_time)
+            self.events.append((name, start_time, end_time, threading.get_ident()))
+
+    def summary(self, top=4):
+        """
+        Get a one line summary of the slowest spans by p95.
+        Args:
+            top: Number of spans in the summary.
+
+        Return:
+            str: name p50/p95/p99 ms, ...
+        """
+        with self.lock:
+            stats = [
+                (name, [histogram.percentile(p) for p in (50, 95, 99)])
+                for name, histogram in self.histograms.items()
+            ]
+        stats.sort(key=lambda item: item[1][1], reverse=True)
+        return '  '.join(
+            f'{name} {"/".join(f"{seconds * 1000:.1f}" for seconds in percentiles)}'
+            for name, percentiles in stats[:top]
+        ) + ('  (p50/p95/p99 ms)' if stats else '')
+
+    def stats(self):
+        """
+        Return:
+            dict of span name -> count, mean, p50, p95, p99 and max in
+            milliseconds.
+        """
+        with self.lock:
+            return {
+                name: {
+                    'count': histogram.count,
+                    'mean': histogram.total / histogram.count * 1000,
+                    'p50': histogram.percentile(50) * 1000,
+                    'p95': histogram.percentile(95) * 1000,
+                    'p99': histogram.percentile(99) * 1000,
+                    'max': histogram.maximum * 1000,
+                }
+                for name, histogram in self.histograms.items()
+            }
+
+    def dump(self, location=None):
+        """
+        Save recorded spans as a Chrome trace (chrome://tracing, Perfetto).
+        Args:
+            location: Path to json file, defaults to a timestamped file in
+                TRACE_DIR.
+
+        Return:
+            Path to json file.
+        """
+        if location is None:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            location = os.path.join(
+                TRACE_DIR, f'trace-{time.strftime("%Y%m%d-%H%M%S")}.json'
+            )
+        pid = os.getpid()
+        with self.lock:
+            events = [
+                {
+                    'name': name,
+                    'ph': 'X',
+                    'ts': (start_time - self.start_time) * 1e6,
+                    'dur': (end_time - start_time) * 1e6,
+                    'pid': pid,
+                    'tid': thread,
+                }
+                for name, start_time, end_time, thread in self.events
+            ]
+        with open(location, 'w') as trace_file:
+            json.dump(
+                {
+                    'traceEvents': events,
+                    'displayTimeUnit': 'ms',
+                    'otherData': {'latency_ms': self.stats()},
+                },
+                trace_file,
+            )
+        return location
+
+
+TRACE_SETTING = os.environ.get(TRACE_VARIABLE, '')
+TRACER = Tracer() if TRACE_SETTING not in ('', '0') else None
+
+
+def traced(name=None):
+    """
+    Decorate a function to record its calls as spans, the function is
+    returned unchanged if tracing is disabled.
+    Args:
+        name: Span name, defaults to the qualified function name.
+
+    Return:
+        Decorator.
+    """
+
+    def decorator(function):
+        if TRACER is None:
+            return function
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                TRACER.record(span_name, start_time, time.perf_counter())
+
+        return wrapper
+
+    return decorator
+
+
+def slot(method):
+    """
+    Adapt a traced method to a Qt signal. Qt drops signal arguments that a
+    slot does not accept, which it cannot tell from a (*args, **kwargs)
+    wrapper, so they are dropped here instead.
+    Args:
+        method: Bound method to connect.
+
+    Return:
+        Callable that accepts any signal arguments, or the method itself if
+        tracing is disabled.
+    """
+    if TRACER is None:
+        return method
+    code = inspect.unwrap(method).__code__
+    if code.co_flags & inspect.CO_VARARGS:
+        return method
+    argument_count = code.co_argcount - 1
+
+    @functools.wraps(method)
+    def receiver(*args):
+        return method(*args[:argument_count])
+
+    return receiver
+
+
+def dump_trace():
+    """
+    Save the Chrome trace to the path in LABELPIX_TRACE if it is a json
+    file, otherwise to TRACE_DIR.
+
+    Return:
+        Path to json file or None if tracing is disabled.
+    """
+    if TRACER is None:
+        return
+    return TRACER.dump(TRACE_SETTING if TRACE_SETTING.endswith('.json') else None)
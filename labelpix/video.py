@@ -0,0 +1,197 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from queue import Queue, Empty, Full
+import threading
+import cv2
+import os
+
+
+class FrameExtractor(QObject):
+    """
+    Convert a video to .png frames using a reader thread and a pool of
+    encoder threads connected by a bounded queue.
+    """
+
+    frames_ready = pyqtSignal(list)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(int)
+
+    def __init__(
+        self,
+        video,
+        output_dir,
+        stride=1,
+        fps=None,
+        workers=4,
+        queue_size=32,
+        batch_size=64,
+    ):
+        """
+        Initialize extraction settings.
+        Args:
+            video: Path to video file.
+            output_dir: Folder where the frames are written.
+            stride: Keep every n-th frame.
+            fps: Target frames per second, overrides stride if given.
+            workers: Number of encoder threads.
+            queue_size: Maximum number of decoded frames waiting to be encoded.
+            batch_size: Number of frame paths emitted per frames_ready signal.
+        """
+        super().__init__()
+        self.video = video
+        self.output_dir = output_dir
+        self.stride = max(1, int(stride))
+        self.fps = fps
+        self.workers = workers
+        self.batch_size = batch_size
+        self.frames = Queue(queue_size)
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.written = {}
+        self.next_sequence = 0
+        self.total_written = 0
+        self.prefix = os.path.splitext(os.path.basename(video))[0]
+
+    def start(self):
+        """
+        Start reader and encoder threads.
+
+        Return:
+            None
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        reader = threading.Thread(target=self.read_frames, daemon=True)
+        encoders = [
+            threading.Thread(target=self.encode_frames, daemon=True)
+            for _ in range(self.workers)
+        ]
+        for thread in [reader, *encoders]:
+            thread.start()
+        threading.Thread(
+            target=self.wait_for, args=([reader, *encoders],), daemon=True
+        ).start()
+
+    def cancel(self):
+        """
+        Stop extraction, frames already written are still delivered.
+
+        Return:
+            None
+        """
+        self.stop.set()
+
+    def put(self, item):
+        """
+        Add an item to the frame queue, waiting while it is full.
+        Args:
+            item: (sequence, frame index, frame) or None.
+
+        Return:
+            True if added, False if extraction was cancelled.
+        """
+        while not self.stop.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def read_frames(self):
+        """
+        Decode the kept frames and queue them for encoding.
+
+        Return:
+            None
+        """
+        capture = cv2.VideoCapture(self.video)
+        total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        stride = self.stride
+        if self.fps:
+            source_fps = capture.get(cv2.CAP_PROP_FPS) or self.fps
+            stride = max(1, round(source_fps / self.fps))
+        frame_index = sequence = 0
+        while not self.stop.is_set() and capture.grab():
+            if frame_index % stride == 0:
+                retrieved, frame = capture.retrieve()
+                if retrieved:
+                    if not self.put((sequence, frame_index, frame)):
+                        break
+                    sequence += 1
+            frame_index += 1
+            if frame_index % self.batch_size == 0:
+                self.progress.emit(frame_index, max(total, frame_index))
+        capture.release()
+        self.progress.emit(frame_index, frame_index)
+        for _ in range(self.workers):
+            self.put(None)
+
+    def encode_frames(self):
+        """
+        Write queued frames to .png files.
+
+        Return:
+            None
+        """
+        while True:
+            try:
+                item = self.frames.get(timeout=0.1)
+            except Empty:
+                if self.stop.is_set():
+                    return
+                continue
+            if item is None or self.stop.is_set():
+                return
+            sequence, frame_index, frame = item
+            path = os.path.join(self.output_dir, f'{self.prefix}-{frame_index:06d}.png')
+            cv2.imwrite(path, frame)
+            self.frame_written(sequence, path)
+
+    def frame_written(self, sequence, path):
+        """
+        Emit written frames in their video order once a batch is complete.
+        Args:
+            sequence: Order of the frame among the extracted frames.
+            path: Path to the written frame.
+
+        Return:
+            None
+        """
+        with self.lock:
+            self.written[sequence] = path
+            if len(self.written) >= self.batch_size:
+                self.emit_ready()
+
+    def emit_ready(self):
+        """
+        Emit the contiguous run of written frames (called with self.lock held).
+
+        Return:
+            None
+        """
+        batch = []
+        while self.next_sequence in self.written:
+            batch.append(self.written.pop(self.next_sequence))
+            self.next_sequence += 1
+        if batch:
+            self.total_written += len(batch)
+            self.frames_ready.emit(batch)
+
+    def wait_for(self, threads):
+        """
+        Emit remaining frames and the finished signal after all threads exit.
+        Args:
+            threads: Reader and encoder threads.
+
+        Return:
+            None
+        """
+        for thread in threads:
+            thread.join()
+        with self.lock:
+            self.emit_ready()
+            if self.written:
+                remaining = [self.written[key] for key in sorted(self.written)]
+                self.written.clear()
+                self.total_written += len(remaining)
+                self.frames_ready.emit(remaining)
+        self.finished.emit(self.total_written)
@@ -0,0 +1,82 @@
+import sys
+import os
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'labelpix')
+)
+
+from annotations import COLUMNS, AnnotationStore
+import pandas as pd
+import numpy as np
+
+
+def proposals(image, scores):
+    count = len(scores)
+    return pd.DataFrame(
+        {
+            'Image': [image] * count,
+            'Object Name': ['car'] * count,
+            'Object Index': [0] * count,
+            'bx': np.linspace(0.2, 0.8, count),
+            'by': [0.5] * count,
+            'bw': [0.1] * count,
+            'bh': [0.2] * count,
+            'Score': scores,
+        }
+    )
+
+
+def test_rows_survive_growth_and_deletes():
+    store = AnnotationStore(2)
+    first = store.append('a.png', 'person', 1, 0.5, 0.5, 0.2, 0.2)
+    rows = store.extend(proposals('b.png', [0.9, 0.8, 0.7]))
+    second = store.append('a.png', 'car', 0, 0.25, 0.25, 0.1, 0.1)
+    assert rows.tolist() == [1, 2, 3]
+    assert store.delete([first, 2, 2, 99]) == 2
+    assert len(store) == 3
+    assert store.rows('a.png').tolist() == [second]
+    assert store.rows('b.png').tolist() == [1, 3]
+    assert store.records([second]) == [['a.png', 'car', 0, 0.25, 0.25, 0.1, 0.1]]
+    assert store.to_frame().index.tolist() == [1, 3, second]
+
+
+def test_drawn_boxes_have_no_score_column():
+    store = AnnotationStore()
+    store.append('a.png', 'person', 1, 0.5, 0.5, 0.2, 0.2)
+    assert store.to_frame().columns.tolist() == COLUMNS
+    store.extend(proposals('b.png', [0.9]))
+    assert store.to_frame().columns.tolist() == [*COLUMNS, 'Score', 'Proposed']
+
+
+def test_accept_keeps_scores():
+    store = AnnotationStore()
+    drawn = store.append('a.png', 'person', 1, 0.5, 0.5, 0.2, 0.2)
+    rows = store.extend(proposals('a.png', [0.9, 0.8]))
+    assert store.accept([drawn, rows[0]]) == 1
+    assert store.accept([rows[0]]) == 0
+    data = store.to_frame()
+    assert data['Proposed'].tolist() == [False, False, True]
+    np.testing.assert_array_equal(data['Score'], [np.nan, 0.9, 0.8])
+
+
+def test_snapshot_restores_rows():
+    store = AnnotationStore()
+    store.extend(proposals('a.png', [0.9, 0.8, 0.7]))
+    store.append('b.png', 'person', 1, 0.5, 0.5, 0.2, 0.2)
+    store.delete([1])
+    store.accept([2])
+    restored = AnnotationStore()
+    restored.restore(store.snapshot())
+    pd.testing.assert_frame_equal(restored.to_frame(), store.to_frame())
+    assert restored.rows('a.png').tolist() == [0, 2]
+    assert restored.append('c.png', 'car', 0, 0.5, 0.5, 0.1, 0.1) == 4
+
+
+def test_categorical_frame():
+    store = AnnotationStore()
+    store.extend(proposals('a.png', [0.9, 0.8]))
+    store.append('b.png', 'person', 1, 0.5, 0.5, 0.2, 0.2)
+    store.delete(store.rows('a.png'))
+    data = store.to_frame(categorical=True)
+    assert list(data['Image'].cat.categories) == ['b.png']
+    assert list(data['Object Name'].cat.categories) == ['person']
@@ -0,0 +1,58 @@
+import sys
+import os
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'labelpix')
+)
+
+import numpy as np
+import pytest
+import time
+
+pytest.importorskip('PyQt5')
+
+from dedupe import hamming, near_duplicates
+
+
+def test_chain_does_not_merge():
+    # Each hash is 1 bit from the previous one, the ends are 30 bits apart.
+    hashes = np.array([(1 << bits) - 1 for bits in range(31)], np.uint64)
+    clusters = near_duplicates(hashes, 4)
+    assert (hamming(hashes, hashes[clusters]) <= 4).all()
+    assert len(np.unique(clusters)) == 7
+
+
+@pytest.mark.parametrize('batch_size', [7, 4096])
+def test_clusters_match_brute_force(batch_size):
+    generator = np.random.default_rng(0)
+    bases = generator.integers(0, 2**63, 5, dtype=np.uint64)
+    hashes = bases[generator.integers(0, 5, 100)]
+    for _ in range(2):
+        hashes ^= np.uint64(1) << generator.integers(0, 64, 100).astype(np.uint64)
+    expected = np.full(len(hashes), -1)
+    for i, value in enumerate(hashes.tolist()):
+        if expected[i] < 0:
+            close = hamming(hashes, np.full_like(hashes, value)) <= 4
+            expected[close & (expected < 0)] = i
+    assert (near_duplicates(hashes, 4, batch_size) == expected).all()
+
+
+def dense_cluster(generator, count):
+    hashes = np.full(count, generator.integers(0, 2**63), np.uint64)
+    for _ in range(2):
+        hashes ^= np.uint64(1) << generator.integers(0, 64, count).astype(np.uint64)
+    return hashes
+
+
+def test_dense_cluster_scales_linearly():
+    generator = np.random.default_rng(0)
+    seconds = []
+    for count in (20_000, 200_000):
+        hashes = dense_cluster(generator, count)
+        start_time = time.perf_counter()
+        clusters = near_duplicates(hashes, 4)
+        seconds.append(time.perf_counter() - start_time)
+        # Every hash is within 2 bits of the same center.
+        assert (clusters == 0).all()
+    # All pairs of 200k hashes would take 100 times longer than of 20k.
+    assert seconds[1] < 5 * seconds[0] + 1
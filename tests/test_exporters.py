@@ -0,0 +1,72 @@
+import sys
+import os
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'labelpix')
+)
+
+from exporters import export_voc
+from coco import export_coco, read_coco
+import pandas as pd
+import numpy as np
+import pytest
+import json
+
+cv2 = pytest.importorskip('cv2')
+
+
+@pytest.fixture
+def session(tmp_path):
+    cv2.imwrite(str(tmp_path / 'good.png'), np.zeros((20, 40, 3), np.uint8))
+    (tmp_path / 'bad.png').write_bytes(b'not an image')
+    data = pd.DataFrame(
+        {
+            'Image': ['good.png', 'bad.png', 'good.png'],
+            'Object Name': ['car', 'car', 'person'],
+            'Object Index': [0, 0, 1],
+            'bx': [0.5, 0.5, 0.25],
+            'by': [0.5, 0.5, 0.25],
+            'bw': [0.2, 0.2, 0.1],
+            'bh': [0.2, 0.2, 0.1],
+        }
+    )
+    return data, {'good.png': str(tmp_path), 'bad.png': str(tmp_path)}
+
+
+def test_voc_skips_unknown_sizes(session, tmp_path):
+    data, image_paths = session
+    stats = export_voc(data, image_paths, jobs=1)
+    assert (stats['files'], stats['boxes']) == (1, 2)
+    assert stats['skipped'] == [f'{tmp_path}/bad.png']
+    assert (tmp_path / 'good.xml').exists()
+    assert not (tmp_path / 'bad.xml').exists()
+
+
+def test_coco_skips_unknown_sizes(session, tmp_path):
+    data, image_paths = session
+    stats = export_coco(data, image_paths, str(tmp_path / 'labels.json'))
+    assert stats['boxes'] == 2
+    assert stats['skipped'] == [f'{tmp_path}/bad.png']
+    exported = read_coco(str(tmp_path / 'labels.json'))
+    assert sorted(exported['Image'].unique()) == ['good.png']
+    assert len(exported) == 2
+
+
+def test_coco_categories_are_remapped(tmp_path):
+    location = tmp_path / 'sparse.json'
+    location.write_text(
+        json.dumps(
+            {
+                'images': [{'id': 5, 'file_name': 'a.png', 'width': 40, 'height': 20}],
+                'annotations': [
+                    {'id': 1, 'image_id': 5, 'category_id': 3, 'bbox': [0, 0, 4, 2]},
+                    {'id': 2, 'image_id': 5, 'category_id': 7, 'bbox': [4, 2, 8, 4]},
+                    {'id': 3, 'image_id': 5, 'category_id': 9, 'bbox': [8, 4, 4, 2]},
+                ],
+                'categories': [{'id': 7, 'name': 'person'}, {'id': 3, 'name': 'car'}],
+            }
+        )
+    )
+    data = read_coco(str(location))
+    assert data['Object Name'].tolist() == ['car', 'person', '9']
+    assert data['Object Index'].tolist() == [1, 0, 2]
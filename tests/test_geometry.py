@@ -0,0 +1,62 @@
+import sys
+import os
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'labelpix')
+)
+
+from geometry import (
+    corners_to_ratios,
+    corners_to_xywh,
+    get_scale,
+    ratios_to_corners,
+    ratios_to_xywh,
+    valid_ratios,
+    xywh_to_corners,
+    xywh_to_ratios,
+)
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def random_boxes():
+    generator = np.random.default_rng(0)
+    boxes = 1000
+    width = generator.integers(1, 5000, boxes)
+    height = generator.integers(1, 5000, boxes)
+    corners = np.sort(generator.uniform(0, 1, (boxes, 2, 2)), 1).reshape(boxes, 4)
+    return corners * get_scale(width, height), width, height
+
+
+def test_round_trips(random_boxes):
+    corners, width, height = random_boxes
+    ratios = corners_to_ratios(corners, width, height)
+    assert valid_ratios(ratios).all()
+    assert np.allclose(ratios_to_corners(ratios, width, height), corners)
+    assert np.allclose(
+        corners_to_ratios(corners[:, [2, 3, 0, 1]], width, height), ratios
+    )
+    xywh = ratios_to_xywh(ratios, width, height)
+    assert np.allclose(xywh_to_ratios(xywh, width, height), ratios)
+    assert np.allclose(xywh_to_corners(corners_to_xywh(corners)), corners)
+
+
+def test_known_values():
+    assert np.allclose(
+        corners_to_ratios([[10, 20, 30, 60]], 100, 100), [[0.2, 0.4, 0.2, 0.4]]
+    )
+    assert np.allclose(
+        ratios_to_corners([[0.05, 0.5, 0.3, 0.2]], 100, 10), [[0, 4, 20, 6]]
+    )
+
+
+def test_invalid_ratios():
+    assert not valid_ratios([[0.5, 0.5, 0, 0.1], [np.nan, 0.5, 0.1, 0.1]]).any()
+
+
+def test_invalid_image_size():
+    with pytest.raises(ValueError):
+        get_scale(-1, -1)
+    with pytest.raises(ValueError):
+        ratios_to_corners([[0.5, 0.5, 0.1, 0.1]], 0, 100)
@@ -0,0 +1,106 @@
+import sys
+import os
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'labelpix')
+)
+
+import pandas as pd
+import numpy as np
+import pytest
+
+pytest.importorskip('PyQt5')
+
+from annotations import AnnotationStore
+from journal import AnnotationJournal
+
+
+def proposals(image, count):
+    return pd.DataFrame(
+        {
+            'Image': [image] * count,
+            'Object Name': ['car'] * count,
+            'Object Index': [0] * count,
+            'bx': np.linspace(0.1, 0.9, count),
+            'by': [0.5] * count,
+            'bw': [0.1] * count,
+            'bh': [0.2] * count,
+            'Score': np.linspace(0.5, 0.9, count),
+        }
+    )
+
+
+def journaled_store(directory):
+    store = AnnotationStore(4)
+    journal = AnnotationJournal(str(directory), interval=0.01)
+    journal.start()
+    journal.compact(store)
+    store.journal = journal
+    return store, journal
+
+
+def crash(journal):
+    # Stop the writer after its last batch without compacting or unlocking.
+    journal.operations.put(StopIteration)
+    journal.writer.join()
+
+
+def recovered(directory):
+    journal = AnnotationJournal(str(directory))
+    assert journal.needs_recovery()
+    store = AnnotationStore()
+    journal.recover(store)
+    return store
+
+
+def edit(store):
+    store.append('a.png', 'person', 1, 0.5, 0.5, 0.2, 0.2)
+    store.extend(proposals('b.png', 5))
+    store.delete([0, 2])
+    store.accept([3])
+    store.append('c.png', 'car', 0, 0.25, 0.25, 0.1, 0.1)
+
+
+def assert_same(store, expected):
+    pd.testing.assert_frame_equal(store.to_frame(), expected.to_frame())
+    assert store.rows('b.png').tolist() == expected.rows('b.png').tolist()
+
+
+def test_replay_after_crash(tmp_path):
+    store, journal = journaled_store(tmp_path)
+    edit(store)
+    crash(journal)
+    assert_same(recovered(tmp_path), store)
+
+
+def test_replay_after_clear(tmp_path):
+    store, journal = journaled_store(tmp_path)
+    edit(store)
+    store.clear()
+    store.extend(proposals('d.png', 3))
+    crash(journal)
+    assert_same(recovered(tmp_path), store)
+
+
+def test_snapshot_and_journal_tail(tmp_path):
+    store, journal = journaled_store(tmp_path)
+    edit(store)
+    journal.compact(store)
+    store.delete(store.rows('b.png')[:2])
+    store.extend(proposals('a.png', 2))
+    crash(journal)
+    with np.load(journal.snapshot_file) as snapshot:
+        assert int(snapshot['sequence']) == 5
+    with open(journal.journal_file) as lines:
+        assert len(lines.readlines()) == 2
+    assert_same(recovered(tmp_path), store)
+
+
+def test_close_is_clean(tmp_path):
+    store, journal = journaled_store(tmp_path)
+    edit(store)
+    journal.close(store)
+    assert not AnnotationJournal(str(tmp_path)).needs_recovery()
+    restored = AnnotationStore()
+    AnnotationJournal(str(tmp_path)).recover(restored)
+    assert_same(restored, store)
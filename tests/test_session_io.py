@@ -0,0 +1,107 @@
+import sys
+import os
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'labelpix')
+)
+
+from session_io import (
+    SESSION_VERSION,
+    convert_legacy_centers,
+    new_rows,
+    read_session,
+    row_hashes,
+    save_session,
+    session_version,
+    unreviewed,
+)
+import pandas as pd
+import numpy as np
+import pytest
+
+pytest.importorskip('pyarrow')
+
+
+def session_frame():
+    return pd.DataFrame(
+        {
+            'Image': ['a.png', 'a.png', 'b.png'],
+            'Object Name': ['car', 'person', 'car'],
+            'Object Index': [0, 1, 0],
+            'bx': [0.5, 0.25, 0.75],
+            'by': [0.5, 0.25, 0.75],
+            'bw': [0.2, 0.1, 0.3],
+            'bh': [0.4, 0.1, 0.3],
+        }
+    )
+
+
+@pytest.mark.parametrize('suffix', ['.h5', '.parquet', '.feather'])
+def test_saved_sessions_are_versioned(tmp_path, suffix):
+    if suffix == '.h5':
+        pytest.importorskip('tables')
+    location = str(tmp_path / f'session{suffix}')
+    save_session(session_frame(), location)
+    assert session_version(location) == SESSION_VERSION
+
+
+def test_unmarked_sessions_are_legacy(tmp_path):
+    data = session_frame()
+    data.to_parquet(tmp_path / 'old.parquet', index=False)
+    data.to_csv(tmp_path / 'old.csv', index=False)
+    assert session_version(str(tmp_path / 'old.parquet')) == 1
+    assert session_version(str(tmp_path / 'old.csv')) is None
+
+
+def test_convert_legacy_centers():
+    # Old sessions stored (x_min - w / 2) / W, the center is x_min + w / 2.
+    x_min, y_min = np.array([0.4, 0.2, 0.6]), np.array([0.3, 0.2, 0.6])
+    data = session_frame()
+    data['bx'] = x_min - data['bw'] / 2
+    data['by'] = y_min - data['bh'] / 2
+    converted = convert_legacy_centers(data)
+    np.testing.assert_allclose(converted['bx'], x_min + data['bw'] / 2)
+    np.testing.assert_allclose(converted['by'], y_min + data['bh'] / 2)
+
+
+def test_row_hashes_ignore_dtypes_and_extra_columns():
+    data = session_frame()
+    categorical = data.astype({'Image': 'category', 'Object Index': np.int32})
+    categorical['Score'] = 0.5
+    assert (row_hashes(data) == row_hashes(categorical)).all()
+    assert len(np.unique(row_hashes(data))) == len(data)
+
+
+def test_new_rows():
+    current = session_frame()
+    new = pd.concat([current.iloc[1:], session_frame().assign(bx=0.1)])
+    new = pd.concat([new, new.iloc[-1:]])
+    added = new_rows(current, new)
+    assert added['bx'].tolist() == [0.1, 0.1, 0.1]
+    assert added['Object Name'].tolist() == ['car', 'person', 'car']
+    assert len(new_rows(current.iloc[:0], current)) == len(current)
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.h5', '.parquet', '.feather'])
+def test_score_is_optional(tmp_path, suffix):
+    if suffix == '.h5':
+        pytest.importorskip('tables')
+    plain = str(tmp_path / f'plain{suffix}')
+    save_session(session_frame(), plain)
+    data = read_session(plain)
+    assert data.columns.tolist() == session_frame().columns.tolist()
+    assert not unreviewed(data).any()
+    scored = str(tmp_path / f'scored{suffix}')
+    save_session(
+        session_frame().assign(Score=[np.nan, 0.9, 0.8], Proposed=[False, True, False]),
+        scored,
+    )
+    data = read_session(scored)
+    np.testing.assert_array_equal(data['Score'], [np.nan, 0.9, 0.8])
+    assert unreviewed(data).tolist() == [False, True, False]
+    assert read_session(scored, ['Image', 'bx']).columns.tolist() == ['Image', 'bx']
+
+
+def test_unreviewed_without_proposed_column():
+    data = session_frame().assign(Score=[np.nan, 0.9, np.nan])
+    assert unreviewed(data).tolist() == [False, True, False]